@@ -2,7 +2,6 @@ import streamlit as st
 import pandas as pd
 import firebase_admin
 from firebase_admin import credentials, firestore, initialize_app
-import io
 from io import StringIO
 from datetime import datetime, timedelta
 import time
@@ -11,7 +10,16 @@ from PIL import Image
 import os
 import base64
 import json
-from pymongo import MongoClient
+
+import ledger_store
+import ledger_reports
+import ledger_schema
+import ledger_statements
+import mongo_db
+import mongo_migrations
+import user_directory
+import photo_store
+from pymongo.errors import DuplicateKeyError
 
 
 #Page title
@@ -61,13 +69,23 @@ except Exception:
     db_name = st.secrets["mongodb"]["db"]
     
 
-# Initialize the MongoDB app
-client = MongoClient(uri)
-db = client[db_name]  # DB group name
+# Shared MongoDB client: created (and pinged) once per process, not on every rerun
+db = mongo_db.get_db(uri, db_name)  # DB group name
 dist_collection = db["Dist"]     # Collection name
 users_collection = db["users"]
 device_collection = db["devices"]
 log_collection = db["logs"]
+# Declared indexes (mongo_migrations), applied once per process
+mongo_migrations.apply_once(db)
+
+# Start the ledger snapshot service with the app, so its background refresh
+# thread is warm before the first ledger page is opened. Every new snapshot is
+# split into per-assignee partitions right away for the Standard users' pages,
+# and reconciled against the balance file.
+ledger_store.get_store().add_listener(
+    "partitions", lambda snap: ledger_reports.warm_partitions(snap, dist_collection)
+)
+ledger_store.get_store().add_listener("reconciliation", ledger_reports.reconciliation)
 
 # Initialize Firestore
 #db = firestore.client()
@@ -190,16 +208,13 @@ def login():
                         log_event("LOGIN", "Login Fail {username}")        
                         
                 elif login_type == "🤝Partners":
-                    if username.isdigit():
-                        # do 1: username is all digits, treat as int
-                        user_data = dist_collection.find_one({"id": int(username), "pwd": password})
-                        if not user_data:
-                            user_data = dist_collection.find_one({"id": username, "pwd": password})  
+                    # ids are stored in one canonical form (mongo_migrations), so one indexed lookup
+                    user_data = dist_collection.find_one({"id": mongo_migrations.canonical_dist_id(username), "pwd": password})
+                    if not user_data and not mongo_migrations.is_applied(mongo_migrations.DIST_IDS_VERSION):
+                        # ids not normalised yet: also try them as typed and as an int
+                        legacy_ids = [username, int(username)] if username.isdigit() else [username]
+                        user_data = dist_collection.find_one({"id": {"$in": legacy_ids}, "pwd": password})
 
-                    else:
-                        # do 2: username has non-digit chars
-                        user_data = dist_collection.find_one({"id": username, "pwd": password})
-                                        
                     if user_data:                    
                         st.session_state.logged_in = True
                         st.session_state.username = user_data.get("name", username)
@@ -579,6 +594,8 @@ def show_sidebar():
                     st.session_state.selected_page = "Distributors"
                 if st.button("📒 Distributors Ledgers"):
                     st.session_state.selected_page = "Distributors Ledgers"
+                if st.button("📈 Reports"):
+                    st.session_state.selected_page = "Reports"
                 if st.button("🚚 Logistics"):
                     st.session_state.selected_page = "Logistics"
 
@@ -730,16 +747,9 @@ def users_page():
             submitted = st.form_submit_button("Submit")
 
             if submitted:
-                all_users = list(users_collection.find())
-                name_exists = any(user.get("name") == name for user in all_users)
-                max_id = max([user.get("id", 0) for user in all_users], default=0)
-
-                image_b64 = ""
-                if image_file:
-                    img = Image.open(image_file)
-                    buffered = io.BytesIO()
-                    img.save(buffered, format="PNG")
-                    image_b64 = base64.b64encode(buffered.getvalue()).decode()
+                name_exists = users_collection.find_one({"name": name}, {"_id": 1}) is not None
+                last_user = users_collection.find_one({}, {"_id": 0, "id": 1}, sort=[("id", -1)]) or {}
+                max_id = last_user.get("id", 0)
 
                 if name_exists:
                     st.error(f"⚠️ User name '{name}' already exists. Please choose another name.")
@@ -747,7 +757,8 @@ def users_page():
                     new_id = max_id + 1
                     user_data = {
                         "id": new_id,
-                        "image_b64": image_b64,
+                        # GridFS reference (photo + thumbnail), not the image itself
+                        "photo": photo_store.save_photo(db, image_file) if image_file else None,
                         "name": name,
                         "type": user_type,
                         "pass": password,
@@ -765,12 +776,19 @@ def users_page():
                         "doc_url": doc_url,
                         "Closing_Date": Closing_Date_in.strftime("%d-%m-%Y")
                     }
-                    users_collection.insert_one(user_data)
-                    st.success(f"✅ User '{name}' added with ID {new_id}.")
+                    try:
+                        users_collection.insert_one(user_data)
+                        user_directory.invalidate_users()
+                        st.success(f"✅ User '{name}' added with ID {new_id}.")
+                    except DuplicateKeyError:
+                        # added by someone else since the check above (unique index on name)
+                        photo_store.release_photo(db, user_data["photo"])
+                        st.error(f"⚠️ User name '{name}' already exists. Please choose another name.")
 
     elif user_option == "View User":
         st.subheader("📋 View Users Database")
-        all_users = list(users_collection.find())
+        # summary fields only; details and photos are read when a user is opened
+        all_users = user_directory.user_summaries(users_collection)
 
         brand_options = sorted(set(user.get("Brand", "N/A") for user in all_users if user.get("Brand")))
         col_brand, col_type=st.columns(2,border=True)
@@ -782,16 +800,21 @@ def users_page():
         
         tab1, tab2, tab3 = st.tabs(["🟢 Active Users", "🔴 Inactive Users", "❔ No Status Users"])
 
-        def show_users(users_list):
-            for data in users_list:
+        def show_users(users_list, key):
+            for summary in users_list:
                 with st.container(border=True):
                     
-                    with st.expander(f" **{data.get('full_name', 'N/A')}**  &nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp; 💼 Brand: **{data.get('Brand', 'N/A')}**",icon="👤"):
+                    expander = st.expander(f" **{summary.get('full_name', 'N/A')}**  &nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp; 💼 Brand: **{summary.get('Brand', 'N/A')}**",icon="👤",
+                                           key=f"{key}_{summary.get('name')}", on_change="rerun")
+                    with expander:
+                        if not expander.open:
+                            continue
+                        data = user_directory.user_details(users_collection, summary.get("name"))
                         cols = st.columns([1, 3])
                         with cols[0]:
-                            if data.get("image_b64"):
-                                img_bytes = base64.b64decode(data["image_b64"])
-                                st.image(img_bytes, width=80)
+                            photo = user_directory.user_photo(users_collection, summary.get("name"))
+                            if photo:
+                                st.image(photo, width=80)
                             else:
                                 st.write("❌ No Image")
 
@@ -843,7 +866,7 @@ def users_page():
                 """, unsafe_allow_html=True)
                 
 
-                show_users(active_users)
+                show_users(active_users, key="user_active")
             else:
                 st.info("No active users found.")
 
@@ -851,7 +874,7 @@ def users_page():
             inactive_users = [u for u in all_users if u.get("status", "").lower() == "inactive" and u.get("Brand") in selected_brands and u.get("type") == selected_type]
             if inactive_users:
                 st.write(f"🎯 {len(inactive_users)} `inactive user(s) matched with selected brands.`")
-                show_users(inactive_users)
+                show_users(inactive_users, key="user_inactive")
             else:
                 st.info("No inactive users found.")
 
@@ -859,25 +882,28 @@ def users_page():
             no_status_users = [u for u in all_users if not u.get("status") or not u.get("Brand")]
             if no_status_users:
                 st.write(f"🎯 {len(no_status_users)} ` user(s) found without STATUS or BRAND selected.`")
-                show_users(no_status_users)
+                show_users(no_status_users, key="user_no_status")
             else:
                 st.info("All users have status set.")
 
     elif user_option == "Delete User":
         st.subheader("🗑️ Delete User")
-        all_users = list(users_collection.find())
+        all_users = user_directory.user_summaries(users_collection)
         usernames = [u.get("name") for u in all_users]
         to_delete = st.selectbox("Select user to delete", usernames)
         if st.button("Delete",type="primary"):
-            users_collection.delete_one({"name": to_delete})
+            deleted = users_collection.find_one_and_delete({"name": to_delete}, {"photo": 1}) or {}
+            photo_store.release_photo(db, deleted.get("photo"))
+            user_directory.invalidate_users()
             st.success(f"Deleted user {to_delete}.")
 
     elif user_option == "Update User":
         st.subheader("✏️ Update User")
-        all_users = list(users_collection.find())
+        all_users = user_directory.user_summaries(users_collection)
         usernames = [u.get("name") for u in all_users]
         selected_user = st.selectbox("Select User to Update", usernames)
-        user_data = users_collection.find_one({"name": selected_user})
+        user_data = user_directory.user_details(users_collection, selected_user, with_password=True)
+        photo = user_directory.user_photo(users_collection, selected_user)
         image_file = st.file_uploader("Upload New Image (optional)", type=["png", "jpg", "jpeg"])
 
         with st.form("update_user_form"):
@@ -886,8 +912,8 @@ def users_page():
                 if image_file:
                     image = Image.open(image_file)
                     st.image(image, caption="Preview", width=150)
-                elif user_data.get("image_b64"):
-                    st.image(base64.b64decode(user_data["image_b64"]), width=150)
+                elif photo:
+                    st.image(photo, width=150)
                 else:
                     st.write("❌ No image available")
 
@@ -917,18 +943,10 @@ def users_page():
             submitted = st.form_submit_button("Update User")
 
             if submitted:
-                image_b64 = user_data.get("image_b64", "")
-                if image_file:
-                    img = Image.open(image_file)
-                    buffered = io.BytesIO()
-                    img.save(buffered, format="PNG")
-                    image_b64 = base64.b64encode(buffered.getvalue()).decode()
-
                 updated_data = {
                     "name": name,
                     "type": user_type,
                     "pass": password,
-                    "image_b64": image_b64,
                     "full_name": full_name,
                     "doj": doj,
                     "dob": dob,
@@ -943,8 +961,21 @@ def users_page():
                     "doc_url": doc_url,
                     "Closing_Date": Closing_Date
                 }
-                users_collection.update_one({"name": selected_user}, {"$set": updated_data})
-                st.success(f"✅ User '{name}' updated successfully.")
+                # the photo reference only changes when a new one is uploaded
+                if image_file:
+                    updated_data["photo"] = photo_store.save_photo(db, image_file)
+                try:
+                    users_collection.update_one({"name": selected_user}, {"$set": updated_data})
+                except DuplicateKeyError:
+                    # renamed to a name another user has (unique index on name)
+                    if image_file:
+                        photo_store.release_photo(db, updated_data["photo"])
+                    st.error(f"⚠️ User name '{name}' already exists. Please choose another name.")
+                else:
+                    if image_file:
+                        photo_store.release_photo(db, user_data.get("photo"))
+                    user_directory.invalidate_users()
+                    st.success(f"✅ User '{name}' updated successfully.")
  #-----------------------------------------Distributors placeholder
 
 def distributors_page():
@@ -1035,7 +1066,7 @@ def distributors_page():
 
         doc = {
             "location": location,
-            "id": id,
+            "id": mongo_migrations.canonical_dist_id(id),
             "pwd": pwd,
             "name": name,
             "address": address,
@@ -1049,6 +1080,7 @@ def distributors_page():
         if st.button("Add"):
             if all([id, pwd, name, location, company, brand]):
                 dist_collection.insert_one(doc)
+                ledger_reports.invalidate_dist()
                 st.success("Distributor added.")
             else:
                 col_left, col_right = st.columns(2)
@@ -1087,7 +1119,8 @@ def distributors_page():
         file = st.file_uploader("Upload CSV", type="csv")
 
         if file:
-            df = pd.read_csv(file, encoding='utf-8')
+            # ids as text, so a column with blanks is not read as floats ("123.0")
+            df = pd.read_csv(file, encoding='utf-8', dtype={"id": str})
 
             if all(col in df.columns for col in required_cols):
                 bulk_data = []
@@ -1095,10 +1128,12 @@ def distributors_page():
                     # Clean and prepare each row
                     doc = {k: str(v).strip() if pd.notna(v) else "" for k, v in row.to_dict().items()}
                     doc["location"] = doc.get("location", "").upper()  # make location UPPERCASE
+                    doc["id"] = mongo_migrations.canonical_dist_id(doc["id"])
                     bulk_data.append(doc)
 
                 if bulk_data:
                     dist_collection.insert_many(bulk_data)
+                    ledger_reports.invalidate_dist()
                     st.success("Bulk upload complete.")
                 else:
                     st.warning("No valid data found in the uploaded CSV.")
@@ -1119,7 +1154,7 @@ def distributors_page():
                 st.divider()
                 col_left, col_mid,col_right = st.columns(3)
                 with col_left:
-                    id = st.text_input("ID", selected_data["id"])
+                    id = st.text_input("ID", str(selected_data.get("id", "")))
                     pwd = st.text_input("Password", selected_data["pwd"], type="password")
                     location = st.text_input("Location", selected_data["location"]).strip().upper()
                 with col_mid:
@@ -1142,7 +1177,7 @@ def distributors_page():
                 if st.button("Update"):
                     # Build the update document
                     update_fields = {
-                        "id": id,
+                        "id": mongo_migrations.canonical_dist_id(id),
                         "pwd": pwd,
                         "name": name,
                         "location": location,
@@ -1159,6 +1194,7 @@ def distributors_page():
                         {"name": name},     # Make sure doc_id is the _id of the document
                         {"$set": update_fields}
                     )
+                    ledger_reports.invalidate_dist()
 
                     if result.modified_count:
                         st.success("Distributor updated successfully.")
@@ -1175,12 +1211,251 @@ def distributors_page():
             selected = st.selectbox("Select Distributor to Delete", dist_name, index=None, placeholder="- Select Name -")
             if st.button("Delete",type="primary"):
                 dist_collection.delete_one({"name": selected})
+                ledger_reports.invalidate_dist()
             
                 st.success(f"Distributor deleted : '**{selected}**' ")
         else: 
             st.info("No distributors to delete.")
 
 
+# ---------------------------------------------------------------Money / Dates----------------------
+# The ledger snapshot keeps amounts as int64 paise and dates as day numbers;
+# they are turned into rupees / dates only here, for the values being rendered.
+def inr(paise):
+    return f"{paise / 100:,.2f}"
+
+
+def format_balance(values):
+    # signed paise (Cr positive, Dr negative) -> "1,234.00 Dr" / "1,234.00 Cr"
+    return [f"{abs(v) / 100:,.2f} {'Dr' if v < 0 else 'Cr'}" for v in values]
+
+
+def month_labels(months):
+    # month numbers (ledger_schema.days_to_months) -> "Apr-25"
+    return ledger_schema.months_to_dates(months).strftime('%b-%y')
+
+
+def render_amounts(frame, columns, blank_zero=False):
+    # paise columns -> rupees
+    frame = frame.copy()
+    for col in columns:
+        rupees = frame[col] / 100
+        frame[col] = rupees.where(frame[col] != 0) if blank_zero else rupees
+    return frame
+
+
+def render_rows(rows):
+    # visible ledger rows: dd-mm-yy dates, rupee amounts (zero left blank like an empty Tally column)
+    rows = render_amounts(rows, [col for col in ('DrAmt', 'CrAmt') if col in rows.columns], blank_zero=True)
+    rows['Date'] = ledger_schema.days_to_dates(rows['Date']).strftime('%d-%m-%y')
+    return rows
+
+
+# ---------------------------------------------------------------Ledger Balance----------------------
+# Brand / location selections are lookups on the cached Dist x balances join
+# (ledger_reports.dist_balances); Standard users only see their assigned ledgers.
+def show_brand_balances(snap, key, assigned_to=None):
+    dist_bal = ledger_reports.dist_balances(snap, dist_collection)
+
+    colb, colc = st.columns(2, border=True)
+    with colb:
+        # --- UI Filters: Company (Brand) ---
+        brand_list = dist_bal.brands(assigned_to)
+        selected_brand = st.selectbox("Select Brand :", brand_list, index=None, placeholder="- Select brand - ", key=f"{key}_brand")
+    with colc:
+        filter_location_check = st.checkbox("Filter location", key=f"{key}_filter_location")
+        selected_location = None
+        if filter_location_check and selected_brand:
+            # --- UI Filters: Location ---
+            location_list = dist_bal.locations(selected_brand, assigned_to)
+            selected_location = st.selectbox("Select Location :", location_list, index=None, placeholder="- Select location - ", key=f"{key}_location")
+
+    search_button = st.button("🔍 Search", key=f"{key}_search")
+    if search_button:
+        st.divider()
+
+        if filter_location_check and not selected_location:
+            # location filter on but no location picked yet: nothing matches
+            df_bal_filtered = dist_bal.balances(None)
+        else:
+            df_bal_filtered = dist_bal.balances(selected_brand, selected_location, assigned_to)
+        is_dr = df_bal_filtered["BalancePaise"] < 0
+
+        # --- Split into Dr and Cr based on sign ---
+        df_dr = df_bal_filtered[is_dr][["Ledger Name", "Closing Balance"]].reset_index(drop=True)
+        df_cr = df_bal_filtered[~is_dr][["Ledger Name", "Closing Balance"]].reset_index(drop=True)
+
+        # --- Totals ---
+        total_cr = df_bal_filtered["Cr"].sum()
+        total_dr = df_bal_filtered["Dr"].sum()
+
+        # --- Display in two columns ---
+        col1, col2 = st.columns(2, border=True)
+
+        with col1:
+            st.markdown("### 💚 Cr. Balance")
+            st.dataframe(df_cr)
+            st.success(f"**Total Cr: ₹ {inr(total_cr)}**")
+
+        with col2:
+            st.markdown("### 🔴 Dr. Balance (Outstanding)")
+            st.dataframe(df_dr)
+            st.error(f"**Total Dr: ₹ {inr(total_dr)}**")
+
+    with st.expander("📊 Brand / Location Subtotals"):
+        by_brand, by_location = st.tabs(["By Brand", "By Brand & Location"])
+        with by_brand:
+            subtotals = dist_bal.subtotals(by=("brand",), assigned_to=assigned_to)
+            st.dataframe(render_amounts(subtotals, ["Dr", "Cr"]), use_container_width=True, hide_index=True)
+        with by_location:
+            subtotals = dist_bal.subtotals(assigned_to=assigned_to)
+            st.dataframe(render_amounts(subtotals, ["Dr", "Cr"]), use_container_width=True, hide_index=True)
+
+
+# ---------------------------------------------------------------Paged Tables----------------------
+# Only the selected page of a date-ordered block of snapshot rows is materialised
+# and sent to the browser. `key` keeps the widgets of each table apart.
+def _jump_to_date(snap, positions, key):
+    jump = st.session_state.get(f"{key}_jump")
+    if jump is None:
+        return
+    page_size = st.session_state[f"{key}_size"]
+    pages = max(1, -(-len(positions) // page_size))
+    row = snap.first_on_or_after(positions, jump)
+    st.session_state[f"{key}_page"] = min(row // page_size + 1, pages)
+
+
+def show_paged_rows(snap, positions, key, columns, running_balance=False):
+    total = len(positions)
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        page_size = st.selectbox("📏 Rows per page", ledger_store.PAGE_SIZES, index=1, key=f"{key}_size")
+    pages = max(1, -(-total // page_size))
+    # range or page size changed since the last run
+    if st.session_state.get(f"{key}_page", 1) > pages:
+        st.session_state[f"{key}_page"] = pages
+    with col2:
+        page = st.number_input(f"📄 Page (of {pages:,})", min_value=1, max_value=pages, step=1, key=f"{key}_page")
+    with col3:
+        st.date_input("⏩ Jump to Date", value=None, key=f"{key}_jump",
+                      on_change=_jump_to_date, args=(snap, positions, key))
+
+    start = (page - 1) * page_size
+    rows = snap.rows(positions[start:start + page_size], running_balance)
+    rows = render_rows(rows[columns + ['Balance'] if running_balance else columns])
+    if running_balance:
+        rows['Balance'] = format_balance(rows['Balance'])
+    st.dataframe(rows, use_container_width=True, hide_index=True)
+    st.caption(f"Rows {start + 1:,}–{start + len(rows):,} of {total:,}")
+
+
+def show_ledger_details(snap, selected_ledger, from_date, to_date, key, title="📑 Ledger Details"):
+    # Ledger block + date range straight from the per-ledger index
+    positions = snap.index.positions(selected_ledger, from_date, to_date)
+    columns = [col for col in snap.ledger.columns if col != 'LedgerName']
+
+    st.subheader(title)
+    if len(positions) == 0:
+        st.warning("⚠️ No matching entries found.")
+    else:
+        opening, closing = snap.opening_closing(selected_ledger, from_date, to_date)
+        total_dr, total_cr, _ = snap.daily.totals(from_date, to_date, ledgers=[selected_ledger])
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Opening Balance", f"₹ {format_balance([opening])[0]}")
+        col2.metric("Dr / Cr in Range", f"₹ {total_dr / 100:,.0f} / {total_cr / 100:,.0f}")
+        col3.metric("Closing Balance", f"₹ {format_balance([closing])[0]}")
+        show_paged_rows(snap, positions, key, columns, running_balance=True)
+
+
+# ---------------------------------------------------------------Daybook----------------------
+# Totals and the per-type summary come from the snapshot's daily aggregates;
+# raw vouchers are materialised only for the page being shown.
+def show_daybook(snap, from_date, to_date, types, key, ledgers=None):
+    total_dr, total_cr, count = snap.daily.totals(from_date, to_date, types, ledgers)
+    if count == 0:
+        st.warning("⚠️ No matching entries found.")
+        return
+
+    positions = snap.daybook_positions(from_date, to_date, types, ledgers)
+    display_cols = ['Date', 'LedgerName', 'Ledger', 'Type', 'VoucherNo', 'DrAmt', 'CrAmt']
+
+    st.subheader("📄 Daybook Entries")
+    show_paged_rows(snap, positions, key, display_cols)
+
+    st.subheader("📊 Summary by Type")
+    summary = snap.daily.summary(from_date, to_date, types, ledgers)
+    summary = render_amounts(summary, ["DrAmt", "CrAmt"]).rename(columns={"Count": "Vouchers"})
+    st.dataframe(summary, use_container_width=True, hide_index=True)
+
+    st.success(f"**Total Dr: ₹ {inr(total_dr)} | Total Cr: ₹ {inr(total_cr)}**")
+
+
+# ---------------------------------------------------------------Voucher Search----------------------
+# Voucher no. / ledger / type words looked up in the snapshot's search index;
+# every word matches by prefix ("sa 12" finds SA/123 of any ledger).
+def show_voucher_search(snap, key):
+    query = st.text_input("🔎 Search vouchers", key=f"{key}_query",
+                          placeholder="Voucher no., ledger or type, e.g. SA/1204 or dist receipt")
+    if not query.strip():
+        return
+
+    positions = snap.search(query)
+    if len(positions) == 0:
+        st.warning("⚠️ No matching entries found.")
+        return
+
+    display_cols = [col for col in ['Date', 'LedgerName', 'Ledger', 'Type', 'VoucherNo', 'DrAmt', 'CrAmt', 'Narration']
+                    if col in snap.ledger.columns]
+    st.subheader(f"📄 {len(positions):,} matching entries")
+    show_paged_rows(snap, positions, key, display_cols)
+
+
+# ---------------------------------------------------------------Bulk Statements----------------------
+# Statements of account for every distributor of a brand (and location), laid
+# out on a process pool by ledger_statements and zipped for one download.
+def show_bulk_statements(snap, key):
+    dist_bal = ledger_reports.dist_balances(snap, dist_collection)
+
+    col1, col2 = st.columns(2, border=True)
+    with col1:
+        selected_brand = st.selectbox("Select Brand :", dist_bal.brands(), index=None, placeholder="- Select brand - ", key=f"{key}_brand")
+    with col2:
+        location_list = dist_bal.locations(selected_brand) if selected_brand else []
+        selected_location = st.selectbox("Select Location :", location_list, index=None, placeholder="- All locations - ", key=f"{key}_location")
+
+    # default: the previous calendar month
+    first_of_month = datetime.today().replace(day=1)
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        from_date = st.date_input("🗓️ From Date", (first_of_month - timedelta(days=1)).replace(day=1), key=f"{key}_from")
+    with col2:
+        to_date = st.date_input("🗓️ To Date", first_of_month - timedelta(days=1), key=f"{key}_to")
+    with col3:
+        formats = st.multiselect("📄 Format", ledger_statements.FORMATS, default=ledger_statements.FORMATS[:1], key=f"{key}_formats")
+
+    names = dist_bal.select(selected_brand, selected_location)["name"].dropna().tolist()
+    st.caption(f"{len(names):,} distributors selected")
+
+    if st.button("🧾 Generate Statements", key=f"{key}_generate", disabled=not (names and formats)):
+        bar = st.progress(0.0, text="Starting…")
+
+        def progress(done, total, elapsed):
+            rate = done / elapsed if elapsed else 0.0
+            bar.progress(done / total, text=f"{done:,} / {total:,} statements · {rate:.1f} per second")
+
+        data, stats = ledger_statements.build_statement_zip(snap, names, from_date, to_date, formats, progress=progress)
+        scope = f"{selected_brand}_{selected_location}" if selected_location else selected_brand
+        filename = f"statements_{ledger_statements.file_stem(scope)}_{from_date:%Y%m%d}-{to_date:%Y%m%d}.zip"
+        # kept for the rerun triggered by the download button
+        st.session_state[f"{key}_zip"] = (filename, data, stats)
+
+    if f"{key}_zip" in st.session_state:
+        filename, data, stats = st.session_state[f"{key}_zip"]
+        st.success(f"✅ {stats['statements']:,} statements ({stats['files']:,} files, {stats['bytes'] / 1e6:,.1f} MB) "
+                   f"in {stats['seconds']:.1f}s · {stats['per_second']:.1f} per second")
+        st.download_button("📥 Download Statements (.zip)", data, filename, "application/zip", key=f"{key}_download")
+
+
 # ---------------------------------------------------------------Distributors Ledgers Page----------------------
 def distributors_ledgers_page():
 
@@ -1217,208 +1492,225 @@ def distributors_ledgers_page():
     
 
 
-    # Google Drive file IDs
-    file_id = '1Qt_dcHn8YNeVL6s7m7647YssIoukdNoB'
-    bal_file_id = '1F39ERDJAiRTOYnNTnThtF-sIl_-zX3j5'
-
-    # Construct direct download URLs
-    csv_url = f'https://drive.google.com/uc?id={file_id}'
-    bal_csv_url = f'https://drive.google.com/uc?id={bal_file_id}'
-
-    # Load CSVs
-    df = pd.read_csv(csv_url)
-    bal_df = pd.read_csv(bal_csv_url)
+    # Load the shared ledger snapshot (downloaded once per refresh interval)
+    try:
+        snap = ledger_store.get_snapshot()
+    except Exception as e:
+        st.error(f"❌ Could not load ledger data: {e}")
+        return
 
-    tab1, tab2, tab3=st.tabs(["💰 Ledger Balance", "📖 Daybook", "📘 Ledger & Voucher"])
+    tab1, tab2, tab3, tab4, tab5, tab6, tab7=st.tabs(["💰 Ledger Balance", "📖 Daybook", "📘 Ledger & Voucher", "⏳ Ageing", "🔎 Search", "🧾 Statements", "🧮 Reconciliation"])
 
     with tab1:
         st.info("Tab Selected : 💰 Ledger Balance")
         #st.write("🔍 Select ")
 
-        colb, colc = st.columns(2, border=True)
-        with colb:
-            # --- UI Filters: Company ---
-            brand_cursor = dist_collection.find({}, {"_id": 0, "brand": 1})
-            brand_list = sorted({doc["brand"] for doc in brand_cursor if "brand" in doc and doc["brand"]})
-            selected_brand = st.selectbox("Select Brand :", brand_list, index=None, placeholder="- Select brand - ")
-        with colc:
-            filter_location_check=st.checkbox("Filter location")
-
-            if filter_location_check:
-                # --- UI Filters: Location ---
-                location_cursor=dist_collection.find({"brand":selected_brand},{"_id":0, "location":1})
-                location_list = sorted({doc["location"] for doc in location_cursor if "location" in doc and doc["location"]})
-                selected_location=st.selectbox("Select Location :", location_list, index=None, placeholder="- Select location - ")
-                if selected_location:
-                    filtered_ledgers = dist_collection.find({"brand": selected_brand, "location": selected_location}, {"_id": 0, "name": 1})
-                    final_ledgers = [doc["name"] for doc in filtered_ledgers if "name" in doc]
-                else:
-                    final_ledgers = []
-            else:
-                # --- UI Filters: Brand ---
-                    if selected_brand:
-                        filtered_ledgers = dist_collection.find({"brand": selected_brand}, {"_id": 0, "name": 1})
-                        final_ledgers = [doc["name"] for doc in filtered_ledgers if "name" in doc]
-                    else:
-                        final_ledgers = []
+        show_brand_balances(snap, key="dl_balance")
 
-        search_button=st.button("🔍 Search")
-        if search_button:
-            st.divider()
-        
-            # --- Load balance CSV from Google Drive ---
-            csv_url = "https://drive.google.com/uc?id=1F39ERDJAiRTOYnNTnThtF-sIl_-zX3j5"
-            df_bal = pd.read_csv(csv_url)
+    with tab2:
+        st.info("Tab Selected : 📖 Daybook")
 
-            # --- Filter matching ledgers ---
-            df_bal_filtered = df_bal[df_bal["Ledger Name"].isin(final_ledgers)]
+        # Ledger Type filter (types seen in the daybook aggregates)
+        type_options = snap.daily.types
+        selected_types = st.multiselect("📌 Select Ledger Type(s)", type_options, default=type_options)
 
-            # --- Clean Closing Balance ---
-            df_bal_filtered["Closing Balance"] = df_bal_filtered["Closing Balance"].astype(str)
+        # Date range
+        today = datetime.today()
+        default_from = today - timedelta(days=1)
+        default_to = today
 
-            def parse_balance(val):
-                val = val.replace("Cr", "").replace("Dr", "").replace(",", "").strip()
-                try:
-                    return float(val)
-                except:
-                    return 0.0
+        col1, col2 = st.columns(2)
+        with col1:
+            from_date = st.date_input("🗓️ From Date", default_from)
+        with col2:
+            to_date = st.date_input("🗓️ To Date", default_to)
 
-            df_bal_filtered["BalanceValue"] = df_bal_filtered["Closing Balance"].apply(parse_balance)
+        st.markdown(f"🗓️ Showing entries from **{from_date.strftime('%d-%m-%y')}** to **{to_date.strftime('%d-%m-%y')}**")
 
-            # --- Split into Dr and Cr based on sign ---
-            df_dr = df_bal_filtered[df_bal_filtered["BalanceValue"] < 0][["Ledger Name", "Closing Balance"]].reset_index(drop=True)
-            df_cr = df_bal_filtered[df_bal_filtered["BalanceValue"] >= 0][["Ledger Name", "Closing Balance"]].reset_index(drop=True)
+        show_daybook(snap, from_date, to_date, selected_types, key="dl_daybook")
 
-            # --- Totals ---
-            total_cr = df_bal_filtered[df_bal_filtered["BalanceValue"] >= 0]["BalanceValue"].sum()
-            total_dr = df_bal_filtered[df_bal_filtered["BalanceValue"] < 0]["BalanceValue"].sum()
+    with tab3:
+        st.info("Tab Selected : 📘 Ledger & Voucher")
+        # UI block for ledger selection
 
-            # --- Display in two columns ---
-            col1, col2 = st.columns(2, border=True)
+        # Get unique ledger names
+        ledger_options = snap.ledger_names()
+        selected_ledger = st.selectbox("🔍 Select Ledger", ledger_options,index=None, placeholder="- Select Ledger - ")
 
-            with col1:
-                st.markdown("### 💚 Cr. Balance")
-                st.dataframe(df_cr)
-                st.success(f"**Total Cr: ₹ {total_cr:,.2f}**")
+        # Default date range: last 2 months
+        today = datetime.today()
+        default_from_date = today - timedelta(days=60)
+        default_to_date = today
 
-            with col2:
-                st.markdown("### 🔴 Dr. Balance (Oustanding)")
-                st.dataframe(df_dr)
-                st.error(f"**Total Dr: ₹ {abs(total_dr):,.2f}**")
+        # Date inputs (shown to user)
+        col1, col2=st.columns(2)
+        with col1:
+            from_date = st.date_input("🗓️From Date", default_from_date)
+        with col2:
+            to_date = st.date_input("🗓️To Date", default_to_date)
+        st.markdown(f"🗓️ Showing ledger from **{from_date.strftime('%d-%m-%y')}** to **{to_date.strftime('%d-%m-%y')}**")
+        st.divider()
 
-    with tab2:
-        st.info("Tab Selected : 📖 Daybook")
+        show_ledger_details(snap, selected_ledger, from_date, to_date, key="dl_ledger")
 
-        required_columns = {'Date', 'LedgerName', 'Ledger', 'Type', 'VoucherNo', 'DrAmt', 'CrAmt'}
-        if required_columns.issubset(df.columns):
-            # Convert 'Date' to datetime
-            df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
+        # Show closing balance
+        closing_balance = snap.closing_balance(selected_ledger)
+        if closing_balance is not None:
+            st.markdown(f"💰 **Closing Balance**")
+            if closing_balance < 0:
+                st.error(f"Closing Balance for **{selected_ledger}** is:   ₹ {inr(closing_balance)} Dr.")
+            else:
+                st.success(f"Closing Balance for **{selected_ledger}** is:   ₹ {inr(closing_balance)} Cr.")
+        else:
+            st.warning("No balance information found for the selected ledger.")
 
-            # Ledger Type filter (from 'Type' column)
-            type_options = sorted(df['Type'].dropna().unique())
-            selected_types = st.multiselect("📌 Select Ledger Type(s)", type_options, default=type_options)
+    with tab4:
+        st.info("Tab Selected : ⏳ Ageing")
 
-            # Date range
-            today = datetime.today()
-            default_from = today - timedelta(days=1)
-            default_to = today
+        as_of = st.date_input("🗓️ Ageing as of", datetime.today())
+        ageing = ledger_reports.receivables_ageing(snap, as_of)
 
-            col1, col2 = st.columns(2)
-            with col1:
-                from_date = st.date_input("🗓️ From Date", default_from)
-            with col2:
-                to_date = st.date_input("🗓️ To Date", default_to)
+        # distributor ledgers only (not bank, GST, scheme ...), with their details for the filters
+        dist_df, _ = ledger_reports.dist_frame(dist_collection)
+        dist_df = dist_df[["name", "brand", "location", "assigned_to"]]
+        ageing = ageing.merge(dist_df.drop_duplicates("name"), how="inner", left_on="Ledger Name", right_on="name").drop(columns=["name"])
 
-            st.markdown(f"🗓️ Showing entries from **{from_date.strftime('%d-%m-%y')}** to **{to_date.strftime('%d-%m-%y')}**")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            selected_brands = st.multiselect("Brand", sorted(dist_df["brand"].dropna().unique()))
+        with col2:
+            selected_locations = st.multiselect("Location", sorted(dist_df["location"].dropna().unique()))
+        with col3:
+            selected_assignees = st.multiselect("Assigned To", sorted(dist_df["assigned_to"].dropna().unique()))
 
-            # Filter data
-            filtered_df = df[
-                (df['Date'] >= pd.to_datetime(from_date)) &
-                (df['Date'] <= pd.to_datetime(to_date)) &
-                (df['Type'].isin(selected_types))
-            ]
+        if selected_brands:
+            ageing = ageing[ageing["brand"].isin(selected_brands)]
+        if selected_locations:
+            ageing = ageing[ageing["location"].isin(selected_locations)]
+        if selected_assignees:
+            ageing = ageing[ageing["assigned_to"].isin(selected_assignees)]
+
+        if ageing.empty:
+            st.warning("⚠️ No outstanding receivables found.")
+        else:
+            bucket_cols = ledger_reports.AGEING_BUCKETS + ["Total"]
+            cols = st.columns(len(bucket_cols))
+            for col, bucket in zip(cols, bucket_cols):
+                col.metric(f"{bucket} days" if bucket != "Total" else "Total", f"₹ {ageing[bucket].sum() / 100:,.0f}")
+            st.dataframe(render_amounts(ageing, bucket_cols), use_container_width=True, hide_index=True)
+            st.caption(f"Outstanding Dr balances of distributors on {as_of:%d-%m-%Y}, credits matched against the oldest debits first.")
 
-            if not filtered_df.empty:
-                # Format date
-                filtered_df['Date'] = filtered_df['Date'].dt.strftime('%d-%m-%y')
+    with tab5:
+        st.info("Tab Selected : 🔎 Search")
 
-                # Reorder columns
-                display_cols = ['Date', 'LedgerName', 'Ledger', 'Type', 'VoucherNo', 'DrAmt', 'CrAmt']
-                filtered_df = filtered_df[display_cols]
+        show_voucher_search(snap, key="dl_search")
 
-                # Show table
-                st.subheader("📄 Daybook Entries")
-                st.dataframe(filtered_df, use_container_width=True, hide_index=True)
+    with tab6:
+        st.info("Tab Selected : 🧾 Statements")
 
-                # Totals
-                total_dr = filtered_df['DrAmt'].sum()
-                total_cr = filtered_df['CrAmt'].sum()
-                st.success(f"**Total Dr: ₹ {total_dr:,.2f} | Total Cr: ₹ {total_cr:,.2f}**")
-            else:
-                st.warning("⚠️ No matching entries found.")
-        else:
-            st.error("❌ Required columns not found. Expected: Date, LedgerName, Ledger, Type, VoucherNo, DrAmt, CrAmt")
+        show_bulk_statements(snap, key="dl_statements")
 
-    with tab3:
-        st.info("Tab Selected : 📘 Ledger & Voucher")
-        # UI block for ledger selection
+    with tab7:
+        st.info("Tab Selected : 🧮 Reconciliation")
 
-        if 'LedgerName' in df.columns and 'Date' in df.columns:
-            # Convert 'Date' column to datetime if not already
-            df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
+        table, mismatches, summary = ledger_reports.reconciliation(snap)
+        amount_cols = ["DrAmt", "CrAmt", "Ledger Net", "Closing Balance", "Difference"]
 
-            # Get unique ledger names
-            ledger_options = df['LedgerName'].dropna().unique()
-            selected_ledger = st.selectbox("🔍 Select Ledger", sorted(ledger_options),index=None, placeholder="- Select Ledger - ")
+        cols = st.columns(len(summary) + 1)
+        cols[0].metric("Ledgers checked", f"{len(table):,}", delta=f"{len(mismatches):,} mismatched", delta_color="inverse")
+        for col, row in zip(cols[1:], summary.itertuples()):
+            col.metric(row.Status, f"{row.Ledgers:,}", delta=f"₹ {row.Difference / 100:,.0f}", delta_color="off")
 
-            # Default date range: last 2 months
-            today = datetime.today()
-            default_from_date = today - timedelta(days=60)
-            default_to_date = today
+        if mismatches.empty:
+            st.success("✅ Every ledger's vouchers add up to its closing balance.")
+        else:
+            statuses = st.multiselect("Status", ledger_reports.RECONCILE_STATUSES, default=ledger_reports.RECONCILE_STATUSES)
+            shown = mismatches[mismatches["Status"].isin(statuses)]
+            st.dataframe(render_amounts(shown, amount_cols), use_container_width=True, hide_index=True)
+            st.caption("Ledger Net is Cr - Dr of the vouchers in the export; Difference is Closing Balance - Ledger Net (Cr positive).")
 
-            # Date inputs (shown to user)
-            col1, col2=st.columns(2)
-            with col1:
-                from_date = st.date_input("🗓️From Date", default_from_date)
-            with col2:
-                to_date = st.date_input("🗓️To Date", default_to_date)
-            st.markdown(f"🗓️ Showing ledger from **{from_date.strftime('%d-%m-%y')}** to **{to_date.strftime('%d-%m-%y')}**")
-            st.divider()
 
-            # Filter dataframe
-            filtered_df = df[
-                (df['LedgerName'] == selected_ledger) &
-                (df['Date'] >= pd.to_datetime(from_date)) &
-                (df['Date'] <= pd.to_datetime(to_date))
-            ].drop(columns=['LedgerName'])
 
-            # 👉 Format 'Date' for display as dd-mm-yy
-            if 'Date' in filtered_df.columns:
-                filtered_df['Date'] = filtered_df['Date'].dt.strftime('%d-%m-%y')
 
-            st.subheader("📑 Ledger Details")
-            st.dataframe(filtered_df, use_container_width=True, hide_index=True)
 
-        else:
-            st.error("❌ 'LedgerName' or 'Date' column not found in the main ledger data.")
+# ---------------------------------------------------------------Reports Page----------------------
+# Month x brand x location x type totals from ledger_reports.monthly_cube;
+# every filter / pivot below works on that small table, never on the vouchers.
+def reports_page():
+    if st.session_state.get("user_role") not in ["Admin", "Back Office"]:
+        st.error("Access denied.")
+        return
 
-        # Show closing balance
-        if 'Ledger Name' in bal_df.columns:
-            filtered_bal_df = bal_df[bal_df['Ledger Name'] == selected_ledger]
-            if not filtered_bal_df.empty:
-                closing_balance = filtered_bal_df['Closing Balance'].values[0]
-                st.markdown(f"💰 **Closing Balance**")
-                if closing_balance < 0:
-                    st.error(f"Closing Balance for **{selected_ledger}** is:   ₹ {closing_balance:,.2f} Dr.")
-                else:
-                    st.success(f"Closing Balance for **{selected_ledger}** is:   ₹ {closing_balance:,.2f} Cr.")
-            else:
-                st.warning("No balance information found for the selected ledger.")
-        else:
-            st.error("❌ 'Ledger Name' column not found in the balance data.")
+    st.markdown(
+        """
+        <h5 style='
+        background-color:#125078; 
+        padding:10px; 
+        border-radius:10px; 
+        color:white;
+        box-shadow: 4px 4px 12px rgba(1, 0, 0, 1.2);
+        text-align: center;'>
+        📈 Monthly Billing & Collections
+            </h5>
+        <br>
+        """,
+        unsafe_allow_html=True
+    )
 
+    try:
+        snap = ledger_store.get_snapshot()
+    except Exception as e:
+        st.error(f"❌ Could not load ledger data: {e}")
+        return
 
+    cube = ledger_reports.monthly_cube(snap, dist_collection)
+    months = cube.months()
+    if not months:
+        st.warning("⚠️ No vouchers in the ledger yet.")
+        return
+    labels = dict(zip(months, month_labels(months)))
 
+    # --- Slice ---
+    from_month, to_month = st.select_slider("🗓️ Months", options=months, value=(months[max(0, len(months) - 12)], months[-1]),
+                                            format_func=labels.get, key="rp_months")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        brands = st.multiselect("Brand", cube.values("Brand"), key="rp_brands")
+    with col2:
+        locations = st.multiselect("Location", cube.values("Location"), key="rp_locations")
+    with col3:
+        types = st.multiselect("Type", cube.values("Type"), key="rp_types")
+    rows = cube.slice(from_month, to_month, brands, locations, types)
+
+    # Billing = Dr to the parties, collections = Cr
+    total_dr, total_cr, count = (int(rows[col].sum()) for col in ledger_reports.CUBE_MEASURES)
+    col1, col2, col3 = st.columns(3, border=True)
+    col1.metric("Billing (Dr)", f"₹ {total_dr / 100:,.0f}")
+    col2.metric("Collections (Cr)", f"₹ {total_cr / 100:,.0f}")
+    col3.metric("Vouchers", f"{count:,}")
+
+    by_month = rows.groupby("Month")[["DrAmt", "CrAmt"]].sum() / 100
+    by_month.index = [labels[m] for m in by_month.index]
+    by_month = by_month.rename(columns={"DrAmt": "Billing (Dr)", "CrAmt": "Collections (Cr)"})
+    st.subheader("📊 Billing vs Collections by Month")
+    st.bar_chart(by_month, stack=False)
+
+    # --- Pivot ---
+    st.subheader("🧮 Pivot")
+    col1, col2 = st.columns(2)
+    with col1:
+        dimension = st.selectbox("Rows", ["Brand", "Location", "Type"], key="rp_dimension")
+    with col2:
+        measure = st.selectbox("Value", ["DrAmt", "CrAmt", "Net", "Count"], key="rp_measure",
+                               format_func={"DrAmt": "Billing (Dr)", "CrAmt": "Collections (Cr)", "Net": "Net (Cr - Dr)", "Count": "Vouchers"}.get)
+    pivot = ledger_reports.MonthlyCube.pivot(rows, dimension, measure)
+    if measure != "Count":
+        pivot = pivot / 100
+    pivot.columns = [labels[m] for m in pivot.columns]
+    pivot["Total"] = pivot.sum(axis=1)
+    st.dataframe(pivot.sort_values("Total", ascending=False), use_container_width=True)
+    st.line_chart(pivot.drop(columns="Total").T)
+    st.caption("Amounts in ₹. Ledgers without a Dist record are grouped under (unassigned).")
 
 
 # ---------------------------------------------------------------Order Page----------------------
@@ -1447,7 +1739,12 @@ def order_page():
 
 # func for add device
 def add_device(data):
-    db.collection("device").add(data)
+    # False when the brand / type / model already exists (unique index)
+    try:
+        device_collection.insert_one(data)
+        return True
+    except DuplicateKeyError:
+        return False
 
 #---------------------------------------------------------------------------
 # --- Function to get unique brand/type values to delete device---
@@ -1580,14 +1877,13 @@ def devices_page():
                         "type": selected_type,
                         "model": model,
                     }
-                    device_collection.insert_one(new_device)
-                    st.toast("Device added successfully!")
-                    st.rerun()
+                    if add_device(new_device):
+                        st.toast("Device added successfully!")
+                        st.rerun()
+                    else:
+                        st.warning(f"⚠️ {selected_brand} {selected_type} '{model}' already exists.")
 
         #----------------
-    
-    def add_device(data):
-        device_collection.insert_one(data)
 
     with tab_add_bulk:
         st.subheader("📦 Bulk Add Devices")
@@ -1610,11 +1906,15 @@ def devices_page():
 
                 if required_columns.issubset(df.columns):
                     with st.spinner("Adding devices..."):
+                        skipped = 0
                         for _, row in df.iterrows():
                             data = row.to_dict()
-                            add_device(data)
+                            if not add_device(data):
+                                skipped += 1
 
                     st.success("✅ Devices added successfully.")
+                    if skipped:
+                        st.warning(f"⚠️ {skipped} device(s) already existed and were skipped.")
                     st.dataframe(df)
                     st.session_state.bulk_upload_done = True
                 else:
@@ -1882,73 +2182,46 @@ def ledger_page():
     )
 
     
-    # Google Drive file IDs
-    file_id = '1Qt_dcHn8YNeVL6s7m7647YssIoukdNoB'
-    bal_file_id = '1F39ERDJAiRTOYnNTnThtF-sIl_-zX3j5'
-
-    # Construct direct download URLs
-    csv_url = f'https://drive.google.com/uc?id={file_id}'
-    bal_csv_url = f'https://drive.google.com/uc?id={bal_file_id}'
-
-    # Load CSVs
-    df = pd.read_csv(csv_url)
-    bal_df = pd.read_csv(bal_csv_url)
+    # Load the shared ledger snapshot (downloaded once per refresh interval)
+    try:
+        snap = ledger_store.get_snapshot()
+    except Exception as e:
+        st.error(f"❌ Could not load ledger data: {e}")
+        return
 
     # UI block for ledger selection
 
-    if 'LedgerName' in df.columns and 'Date' in df.columns:
-        # Convert 'Date' column to datetime if not already
-        df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-
-        # Get unique ledger names
-        #st.session_state.username = "Manoj Enterprise Jio Phone"
-        selected_ledger = st.session_state.username
+    # Get unique ledger names
+    #st.session_state.username = "Manoj Enterprise Jio Phone"
+    selected_ledger = st.session_state.username
 
-        # Default date range: last 2 months
-        today = datetime.today()
-        default_from_date = today - timedelta(days=60)
-        default_to_date = today
+    # Default date range: last 2 months
+    today = datetime.today()
+    default_from_date = today - timedelta(days=60)
+    default_to_date = today
 
-        # Date inputs (shown to user)
-        col1, col2=st.columns(2)
-        with col1:
-            from_date = st.date_input("🗓️From Date", default_from_date)
-        with col2:
-            to_date = st.date_input("🗓️To Date", default_to_date)
-        st.markdown(f"🗓️ Showing ledger from **{from_date.strftime('%d-%m-%y')}** to **{to_date.strftime('%d-%m-%y')}**")
-        #   st.divider()
-
-        # Filter dataframe
-        filtered_df = df[
-            (df['LedgerName'] == selected_ledger) &
-            (df['Date'] >= pd.to_datetime(from_date)) &
-            (df['Date'] <= pd.to_datetime(to_date))
-        ].drop(columns=['LedgerName'])
-
-        # 👉 Format 'Date' for display as dd-mm-yy
-        if 'Date' in filtered_df.columns:
-            filtered_df['Date'] = filtered_df['Date'].dt.strftime('%d-%m-%y')
-
-        st.subheader(f"📑 _Ledger Details_ : `{st.session_state.username}`")
-        st.dataframe(filtered_df, use_container_width=True, hide_index=True)
+    # Date inputs (shown to user)
+    col1, col2=st.columns(2)
+    with col1:
+        from_date = st.date_input("🗓️From Date", default_from_date)
+    with col2:
+        to_date = st.date_input("🗓️To Date", default_to_date)
+    st.markdown(f"🗓️ Showing ledger from **{from_date.strftime('%d-%m-%y')}** to **{to_date.strftime('%d-%m-%y')}**")
+    #   st.divider()
 
-    else:
-        st.error("❌ 'LedgerName' or 'Date' column not found in the main ledger data.")
+    show_ledger_details(snap, selected_ledger, from_date, to_date, key="lp_ledger",
+                        title=f"📑 _Ledger Details_ : `{st.session_state.username}`")
 
     # Show closing balance
-    if 'Ledger Name' in bal_df.columns:
-        filtered_bal_df = bal_df[bal_df['Ledger Name'] == selected_ledger]
-        if not filtered_bal_df.empty:
-            closing_balance = filtered_bal_df['Closing Balance'].values[0]
-            st.markdown(f"💰 **Closing Balance**")
-            if closing_balance < 0:
-                st.error(f"Closing Balance for **{selected_ledger}** is:   ₹ {closing_balance:,.2f} Dr.")
-            else:
-                st.success(f"Closing Balance for **{selected_ledger}** is:   ₹ {closing_balance:,.2f} Cr.")
+    closing_balance = snap.closing_balance(selected_ledger)
+    if closing_balance is not None:
+        st.markdown(f"💰 **Closing Balance**")
+        if closing_balance < 0:
+            st.error(f"Closing Balance for **{selected_ledger}** is:   ₹ {inr(closing_balance)} Dr.")
         else:
-            st.warning("No balance information found for the selected ledger.")
+            st.success(f"Closing Balance for **{selected_ledger}** is:   ₹ {inr(closing_balance)} Cr.")
     else:
-        st.error("❌ 'Ledger Name' column not found in the balance data.")
+        st.warning("No balance information found for the selected ledger.")
 
 
 def ledgers_page():
@@ -1971,225 +2244,160 @@ def ledgers_page():
         unsafe_allow_html=True
     )
 
-    # Google Drive file IDs
-    file_id = '1Qt_dcHn8YNeVL6s7m7647YssIoukdNoB'
-    bal_file_id = '1F39ERDJAiRTOYnNTnThtF-sIl_-zX3j5'
-
-    # Construct direct download URLs
-    csv_url = f'https://drive.google.com/uc?id={file_id}'
-    bal_csv_url = f'https://drive.google.com/uc?id={bal_file_id}'
+    username = st.session_state.get("username")  # 👈 Get logged-in user
 
-    # Load CSVs
-    df = pd.read_csv(csv_url)
-    bal_df = pd.read_csv(bal_csv_url)
+    # Load the user's partition of the shared ledger snapshot: only the
+    # ledgers assigned to them (downloaded once per refresh interval)
+    try:
+        snap = ledger_store.get_snapshot()
+        if username:
+            snap = ledger_reports.partition(snap, dist_collection, assigned_to=username)
+    except Exception as e:
+        st.error(f"❌ Could not load ledger data: {e}")
+        return
 
-    tab1, tab2, tab3=st.tabs(["💰 Ledger Balance", "📖 Daybook", "📘 Ledger & Voucher"])
+    tab1, tab2, tab3, tab4=st.tabs(["💰 Ledger Balance", "📖 Daybook", "📘 Ledger & Voucher", "🔎 Search"])
 
 
     with tab1:
         st.info("Tab Selected : 💰 Ledger Balance")
 
-        username = st.session_state.get("username")  # 👈 Get logged-in user
         if not username:
             st.warning("No user logged in.")
         else:
-            colb, colc = st.columns(2, border=True)
-            with colb:
-                # --- UI Filters: Company (Brand) ---
-                brand_cursor = dist_collection.find({"assigned_to": username}, {"_id": 0, "brand": 1})
-                brand_list = sorted({doc["brand"] for doc in brand_cursor if "brand" in doc and doc["brand"]})
-                selected_brand = st.selectbox("Select Brand :", brand_list, index=None, placeholder="- Select brand - ")
-
-            with colc:
-                filter_location_check = st.checkbox("Filter location")
-
-                if filter_location_check and selected_brand:
-                    location_cursor = dist_collection.find(
-                        {"brand": selected_brand, "assigned_to": username},
-                        {"_id": 0, "location": 1}
-                    )
-                    location_list = sorted({doc["location"] for doc in location_cursor if "location" in doc and doc["location"]})
-                    selected_location = st.selectbox("Select Location :", location_list, index=None, placeholder="- Select location - ")
-
-                    if selected_location:
-                        filtered_ledgers = dist_collection.find(
-                            {"brand": selected_brand, "location": selected_location, "assigned_to": username},
-                            {"_id": 0, "name": 1}
-                        )
-                        final_ledgers = [doc["name"] for doc in filtered_ledgers if "name" in doc]
-                    else:
-                        final_ledgers = []
-                else:
-                    if selected_brand:
-                        filtered_ledgers = dist_collection.find(
-                            {"brand": selected_brand, "assigned_to": username},
-                            {"_id": 0, "name": 1}
-                        )
-                        final_ledgers = [doc["name"] for doc in filtered_ledgers if "name" in doc]
-                    else:
-                        final_ledgers = []
-
-            search_button = st.button("🔍 Search")
-            if search_button:
-                st.divider()
-                
-                # Load balance data from Drive
-                df_bal = pd.read_csv(bal_csv_url)
-
-                # Filter ledgers
-                df_bal_filtered = df_bal[df_bal["Ledger Name"].isin(final_ledgers)]
-                df_bal_filtered["Closing Balance"] = df_bal_filtered["Closing Balance"].astype(str)
-
-                def parse_balance(val):
-                    val = val.replace("Cr", "").replace("Dr", "").replace(",", "").strip()
-                    try:
-                        return float(val)
-                    except:
-                        return 0.0
-
-                df_bal_filtered["BalanceValue"] = df_bal_filtered["Closing Balance"].apply(parse_balance)
-
-                # Cr/Dr split
-                df_dr = df_bal_filtered[df_bal_filtered["BalanceValue"] < 0][["Ledger Name", "Closing Balance"]].reset_index(drop=True)
-                df_cr = df_bal_filtered[df_bal_filtered["BalanceValue"] >= 0][["Ledger Name", "Closing Balance"]].reset_index(drop=True)
-
-                # Totals
-                total_cr = df_cr["Closing Balance"].apply(parse_balance).sum()
-                total_dr = df_dr["Closing Balance"].apply(parse_balance).sum()
-
-                col1, col2 = st.columns(2, border=True)
-                with col1:
-                    st.markdown("### 💚 Cr. Balance")
-                    st.dataframe(df_cr)
-                    st.success(f"**Total Cr: ₹ {total_cr:,.2f}**")
-
-                with col2:
-                    st.markdown("### 🔴 Dr. Balance (Outstanding)")
-                    st.dataframe(df_dr)
-                    st.error(f"**Total Dr: ₹ {abs(total_dr):,.2f}**")
+            show_brand_balances(snap, key="ls_balance", assigned_to=username)
 
     with tab2:
         st.info("Tab Selected : 📖 Daybook")
 
-        username = st.session_state.get("username")
         if not username:
             st.warning("No user logged in.")
         else:
-            # Get ledgers assigned to user
-            user_ledgers_cursor = dist_collection.find({"assigned_to": username}, {"_id": 0, "name": 1})
-            user_ledgers = sorted({doc["name"] for doc in user_ledgers_cursor if "name" in doc})
-
-            required_columns = {'Date', 'LedgerName', 'Ledger', 'Type', 'VoucherNo', 'DrAmt', 'CrAmt'}
-            if required_columns.issubset(df.columns):
-                df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-
-                # Filter by assigned ledgers
-                df = df[df["LedgerName"].isin(user_ledgers)]
-
-                type_options = sorted(df['Type'].dropna().unique())
-                selected_types = st.multiselect("📌 Select Ledger Type(s)", type_options, default=type_options)
-
-                today = datetime.today()
-                default_from = today - timedelta(days=1)
-                default_to = today
-
-                col1, col2 = st.columns(2)
-                with col1:
-                    from_date = st.date_input("🗓️ From Date", default_from)
-                with col2:
-                    to_date = st.date_input("🗓️ To Date", default_to)
-
-                st.markdown(f"🗓️ Showing entries from **{from_date.strftime('%d-%m-%y')}** to **{to_date.strftime('%d-%m-%y')}**")
+            type_options = snap.daily.types
+            selected_types = st.multiselect("📌 Select Ledger Type(s)", type_options, default=type_options)
 
-                filtered_df = df[
-                    (df['Date'] >= pd.to_datetime(from_date)) &
-                    (df['Date'] <= pd.to_datetime(to_date)) &
-                    (df['Type'].isin(selected_types))
-                ]
+            today = datetime.today()
+            default_from = today - timedelta(days=1)
+            default_to = today
 
-                if not filtered_df.empty:
-                    filtered_df['Date'] = filtered_df['Date'].dt.strftime('%d-%m-%y')
-                    display_cols = ['Date', 'LedgerName', 'Ledger', 'Type', 'VoucherNo', 'DrAmt', 'CrAmt']
-                    filtered_df = filtered_df[display_cols]
+            col1, col2 = st.columns(2)
+            with col1:
+                from_date = st.date_input("🗓️ From Date", default_from)
+            with col2:
+                to_date = st.date_input("🗓️ To Date", default_to)
 
-                    st.subheader("📄 Daybook Entries")
-                    st.dataframe(filtered_df, use_container_width=True, hide_index=True)
+            st.markdown(f"🗓️ Showing entries from **{from_date.strftime('%d-%m-%y')}** to **{to_date.strftime('%d-%m-%y')}**")
 
-                    total_dr = filtered_df['DrAmt'].sum()
-                    total_cr = filtered_df['CrAmt'].sum()
-                    st.success(f"**Total Dr: ₹ {total_dr:,.2f} | Total Cr: ₹ {total_cr:,.2f}**")
-                else:
-                    st.warning("⚠️ No matching entries found.")
-            else:
-                st.error("❌ Required columns not found. Expected: Date, LedgerName, Ledger, Type, VoucherNo, DrAmt, CrAmt")
+            show_daybook(snap, from_date, to_date, selected_types, key="ls_daybook")
 
     with tab3:
         st.info("Tab Selected : 📘 Ledger & Voucher")
 
-        username = st.session_state.get("username")
         if not username:
             st.warning("No user logged in.")
         else:
-            # Get ledgers assigned to user
-            user_ledgers_cursor = dist_collection.find({"assigned_to": username}, {"_id": 0, "name": 1})
-            user_ledgers = sorted({doc["name"] for doc in user_ledgers_cursor if "name" in doc})
-
-            if 'LedgerName' in df.columns and 'Date' in df.columns:
-                df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-
-                # Filter ledger options by user
-                ledger_options = sorted(set(df['LedgerName'].dropna()) & set(user_ledgers))
+            # the partition only holds the user's ledgers
+            ledger_options = snap.ledger_names()
 
-                selected_ledger = st.selectbox("🔍 Select Ledger", ledger_options, index=None, placeholder="- Select Ledger - ")
-
-                today = datetime.today()
-                default_from_date = today - timedelta(days=60)
-                default_to_date = today
-
-                col1, col2 = st.columns(2)
-                with col1:
-                    from_date = st.date_input("🗓️From Date", default_from_date)
-                with col2:
-                    to_date = st.date_input("🗓️To Date", default_to_date)
-
-                st.markdown(f"🗓️ Showing ledger from **{from_date.strftime('%d-%m-%y')}** to **{to_date.strftime('%d-%m-%y')}**")
-                st.divider()
+            selected_ledger = st.selectbox("🔍 Select Ledger", ledger_options, index=None, placeholder="- Select Ledger - ")
 
-                # Filter dataframe
-                filtered_df = df[
-                    (df['LedgerName'] == selected_ledger) &
-                    (df['Date'] >= pd.to_datetime(from_date)) &
-                    (df['Date'] <= pd.to_datetime(to_date))
-                ].drop(columns=['LedgerName'])
+            today = datetime.today()
+            default_from_date = today - timedelta(days=60)
+            default_to_date = today
 
-                # 👉 Format 'Date' for display as dd-mm-yy
-                if 'Date' in filtered_df.columns:
-                    filtered_df['Date'] = filtered_df['Date'].dt.strftime('%d-%m-%y')
+            col1, col2 = st.columns(2)
+            with col1:
+                from_date = st.date_input("🗓️From Date", default_from_date)
+            with col2:
+                to_date = st.date_input("🗓️To Date", default_to_date)
 
-                st.subheader("📑 Ledger Details")
-                st.dataframe(filtered_df, use_container_width=True, hide_index=True)
+            st.markdown(f"🗓️ Showing ledger from **{from_date.strftime('%d-%m-%y')}** to **{to_date.strftime('%d-%m-%y')}**")
+            st.divider()
 
-            else:
-                st.error("❌ 'LedgerName' or 'Date' column not found in the main ledger data.")
+            show_ledger_details(snap, selected_ledger, from_date, to_date, key="ls_ledger")
 
             # Show closing balance
-            if 'Ledger Name' in bal_df.columns:
-                filtered_bal_df = bal_df[bal_df['Ledger Name'] == selected_ledger]
-                if not filtered_bal_df.empty:
-                    closing_balance = filtered_bal_df['Closing Balance'].values[0]
-                    st.markdown(f"💰 **Closing Balance**")
-                    if closing_balance<0:
-                        st.error(f"Closing Balance for **{selected_ledger}** is:   ₹ {closing_balance}")
-                    else:
-                        st.success(f"Closing Balance for **{selected_ledger}** is:   ₹ {closing_balance}")
+            closing_balance = snap.closing_balance(selected_ledger)
+            if closing_balance is not None:
+                st.markdown(f"💰 **Closing Balance**")
+                if closing_balance<0:
+                    st.error(f"Closing Balance for **{selected_ledger}** is:   ₹ {inr(closing_balance)} Dr.")
                 else:
-                    st.warning("No balance information found for the selected ledger.")
+                    st.success(f"Closing Balance for **{selected_ledger}** is:   ₹ {inr(closing_balance)} Cr.")
             else:
-                st.error("❌ 'Ledger Name' column not found in the balance data.")
+                st.warning("No balance information found for the selected ledger.")
+
+    with tab4:
+        st.info("Tab Selected : 🔎 Search")
+
+        if not username:
+            st.warning("No user logged in.")
+        else:
+            # searches only the user's partition
+            show_voucher_search(snap, key="ls_search")
 
 
 def logs():
 
+    # --- Ledger snapshot health (background refresh) ---
+    stats = ledger_store.get_store().stats()
+    st.subheader("📒 Ledger Snapshot")
+    col_age, col_dur, col_fail, col_ver = st.columns(4, border=True)
+    with col_age:
+        age = stats["age_seconds"]
+        st.metric("Snapshot age", f"{int(age // 60)}m {int(age % 60)}s" if age is not None else "-")
+    with col_dur:
+        duration = stats["last_duration"]
+        st.metric("Last refresh", f"{duration:.2f}s" if duration is not None else "-")
+    with col_fail:
+        st.metric("Failures", stats["failure_count"], delta=f"{stats['consecutive_failures']} in a row", delta_color="inverse")
+    with col_ver:
+        st.metric("Version", stats["version"] or "-", delta=f"{stats['rows']:,} rows", delta_color="off")
+    if stats["last_error"]:
+        st.error(f"Last refresh error: {stats['last_error']}")
+    if stats["cache_error"]:
+        st.warning(f"Snapshot cache not written: {stats['cache_error']}")
+    ingest = stats["last_ingest"]
+    ingest_text = f"{ingest['mode']} ({ingest['rows']:,} rows, {ingest['seconds']}s)" if ingest else "-"
+    checked_text = stats["last_checked"].strftime("%d-%m-%y %H:%M:%S") if stats["last_checked"] else "-"
+    changed_text = stats["changed_at"].strftime("%d-%m-%y %H:%M:%S") if stats["changed_at"] else "-"
+    st.caption(
+        f"Background refresh: {'on' if stats['background'] else 'off'} ({stats['role']}) · refreshes: {stats['refresh_count']} · "
+        f"last checked: {checked_text} · last changed: {changed_text} · last ingest: {ingest_text}"
+    )
+    st.divider()
+
+    # --- MongoDB connection pool (shared client) ---
+    pool = mongo_db.get_client().stats()
+    st.subheader("🍃 MongoDB Pool")
+    col_open, col_use, col_created, col_out = st.columns(4, border=True)
+    with col_open:
+        st.metric("Open connections", pool["open"], delta=f"max {pool['max_pool_size']}", delta_color="off")
+    with col_use:
+        st.metric("In use", pool["in_use"])
+    with col_created:
+        st.metric("Connections created", pool["created"], delta=f"{pool['closed']} closed", delta_color="off")
+    with col_out:
+        st.metric("Checkouts", f"{pool['checked_out']:,}", delta=f"{pool['checkout_failed']} failed", delta_color="inverse")
+    if pool["last_error"]:
+        st.error(f"Warm-up error: {pool['last_error']}")
+    warmup_text = f"{pool['warmup_seconds']:.2f}s" if pool["warmup_seconds"] is not None else "-"
+    st.caption(f"Client created: {pool['created_at']:%d-%m-%y %H:%M:%S} · warm-up ping: {warmup_text} · pool cleared: {pool['pool_cleared']}")
+
+    # --- Indexes (mongo_migrations) ---
+    with st.expander("🗂️ Indexes & Query Plans"):
+        if mongo_migrations.last_run["error"]:
+            st.error(f"Last migration error: {mongo_migrations.last_run['error']}")
+        st.dataframe(pd.DataFrame(mongo_migrations.status(db)), use_container_width=True, hide_index=True)
+        if st.button("🔍 Explain hot queries"):
+            plans = pd.DataFrame(mongo_migrations.explain_hot_queries(db))
+            scans = plans[plans["Scan"] == True]
+            if scans.empty:
+                st.success("✅ Every hot query is served by an index.")
+            else:
+                st.warning(f"⚠️ Collection scans: {', '.join(scans['Query'])}")
+            st.dataframe(plans, use_container_width=True, hide_index=True)
+    st.divider()
 
     logs = list(log_collection.find().sort("timestamp", -1).limit(10))
     
@@ -2391,6 +2599,9 @@ def main():
     elif page == "Distributors Ledgers":
         log_event("distributors_ledgers_page", st.session_state.username)
         distributors_ledgers_page()
+    elif page == "Reports":
+        log_event("reports_page", st.session_state.username)
+        reports_page()
     elif page == "Ledger":
         log_event("ledger_page", st.session_state.username)
         ledger_page()
@@ -0,0 +1,85 @@
+import argparse
+import email.utils
+import hashlib
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# -------------------------------
+# 🧪 LOCAL GOOGLE DRIVE STAND-IN
+# -------------------------------
+# Serves the ledger / balance CSVs from disk with ETag and Last-Modified so the
+# ledger_store refresh path can be exercised without Drive:
+#
+#   python fake_drive.py ledger.csv balance.csv --port 8765
+#   LEDGER_CSV_URL=http://localhost:8765/ledger.csv \
+#   BALANCE_CSV_URL=http://localhost:8765/balance.csv streamlit run dms-swiftcom.py
+#
+# Files are re-read on every request, so overwriting one simulates a new Tally export.
+# Pass --no-validators to behave like a Drive link that sends no caching headers.
+
+
+class FakeDriveHandler(BaseHTTPRequestHandler):
+    files = {}
+    validators = True
+    hits = {}
+
+    def do_GET(self):
+        name = self.path.lstrip("/").split("?")[0]
+        path = self.files.get(name)
+        if path is None or not os.path.exists(path):
+            self.send_error(404)
+            return
+        self.hits[name] = self.hits.get(name, 0) + 1
+
+        with open(path, "rb") as f:
+            body = f.read()
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        last_modified = email.utils.formatdate(os.path.getmtime(path), usegmt=True)
+
+        if self.validators and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv")
+        self.send_header("Content-Length", str(len(body)))
+        if self.validators:
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", last_modified)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(paths, port=0, validators=True):
+    # Start the stand-in on a background thread; returns (server, base_url)
+    handler = type("Handler", (FakeDriveHandler,), {
+        "files": {os.path.basename(p): p for p in paths},
+        "validators": validators,
+        "hits": {},
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve CSV exports like a Google Drive download link")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--no-validators", action="store_true")
+    args = parser.parse_args()
+
+    server, base_url = serve(args.files, args.port, validators=not args.no_validators)
+    for path in args.files:
+        print(f"{base_url}/{os.path.basename(path)}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
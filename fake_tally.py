@@ -0,0 +1,147 @@
+import argparse
+import os
+import random
+import threading
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from xml.sax.saxutils import escape, quoteattr
+
+import requests
+
+
+# -------------------------------
+# 🧪 LOCAL TALLY XML SERVER STAND-IN
+# -------------------------------
+# Answers Tally XML export requests with recorded responses, so the tally://
+# ledger sources can be exercised without Tally running:
+#
+#   python fake_tally.py --port 9000
+#   LEDGER_CSV_URL=tally://localhost:9000/daybook \
+#   BALANCE_CSV_URL=tally://localhost:9000/balances streamlit run dms-swiftcom.py
+#
+# Recordings live in tally_recordings/ (daybook.xml, balances.xml) and are
+# re-read on every request, so replacing one simulates new vouchers.
+#   --record http://tally-pc:9000   capture fresh recordings from a real Tally
+#   --generate 200000               write a synthetic Day Book for benchmarks
+
+RECORDINGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tally_recordings")
+
+
+def recording_for(body):
+    # which recording answers this request
+    if b"LedgerBalances" in body:
+        return "balances.xml"
+    if b"Day Book" in body:
+        return "daybook.xml"
+    return None
+
+
+class FakeTallyHandler(BaseHTTPRequestHandler):
+    directory = RECORDINGS_DIR
+    hits = {}
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        name = recording_for(body)
+        path = os.path.join(self.directory, name) if name else None
+        if path is None or not os.path.exists(path):
+            self.send_error(404)
+            return
+        self.hits[name] = self.hits.get(name, 0) + 1
+
+        # Tally sends no caching headers; stream the file like a long export
+        self.send_response(200)
+        self.send_header("Content-Type", "text/xml; charset=utf-8")
+        self.send_header("Content-Length", str(os.path.getsize(path)))
+        self.end_headers()
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(64 * 1024)
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(directory=RECORDINGS_DIR, port=0):
+    # Start the stand-in on a background thread; returns (server, base_url)
+    handler = type("Handler", (FakeTallyHandler,), {"directory": directory, "hits": {}})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"tally://127.0.0.1:{server.server_address[1]}"
+
+
+def record(tally_url, directory=RECORDINGS_DIR):
+    # Save the real Tally responses to the requests tally_xml sends
+    import tally_xml
+
+    os.makedirs(directory, exist_ok=True)
+    for name, build_request in (("daybook.xml", tally_xml.daybook_request), ("balances.xml", tally_xml.balances_request)):
+        response = requests.post(tally_url, data=build_request().encode("utf-8"), stream=True, timeout=600)
+        response.raise_for_status()
+        with open(os.path.join(directory, name), "wb") as f:
+            for chunk in response.iter_content(64 * 1024):
+                f.write(chunk)
+        print(f"recorded {name}")
+
+
+def generate(vouchers, directory=RECORDINGS_DIR, ledgers=500, seed=1):
+    # Synthetic Day Book + balances in Tally's XML layout
+    rng = random.Random(seed)
+    names = [f"DIST {i:04d}" for i in range(ledgers)]
+    types = [("Sales", "Sales Account"), ("Receipt", "Bank"), ("Payment", "Bank"), ("Journal", "Discount"), ("Credit Note", "Sales Return")]
+    start = date.today() - timedelta(days=365)
+    closing = dict.fromkeys(names, 0.0)
+
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "daybook.xml"), "w", encoding="utf-8") as f:
+        f.write("<ENVELOPE><HEADER><VERSION>1</VERSION><STATUS>1</STATUS></HEADER><BODY><IMPORTDATA>"
+                "<REQUESTDESC><REPORTNAME>Vouchers</REPORTNAME></REQUESTDESC><REQUESTDATA>\n")
+        for i in range(vouchers):
+            day = start + timedelta(days=i * 365 // max(vouchers, 1))
+            party = rng.choice(names)
+            vtype, other = rng.choice(types)
+            amount = round(rng.uniform(500, 50000), 2)
+            # party is debited on Sales / Payment, credited otherwise
+            party_amount = -amount if vtype in ("Sales", "Payment") else amount
+            closing[party] += party_amount
+            f.write(
+                f"<TALLYMESSAGE><VOUCHER VCHTYPE={quoteattr(vtype)} ACTION=\"Create\">"
+                f"<DATE>{day:%Y%m%d}</DATE><VOUCHERTYPENAME>{escape(vtype)}</VOUCHERTYPENAME>"
+                f"<VOUCHERNUMBER>{vtype[:2].upper()}/{i + 1}</VOUCHERNUMBER>"
+                f"<PARTYLEDGERNAME>{escape(party)}</PARTYLEDGERNAME>"
+                f"<ALLLEDGERENTRIES.LIST><LEDGERNAME>{escape(party)}</LEDGERNAME><AMOUNT>{party_amount:.2f}</AMOUNT></ALLLEDGERENTRIES.LIST>"
+                f"<ALLLEDGERENTRIES.LIST><LEDGERNAME>{escape(other)}</LEDGERNAME><AMOUNT>{-party_amount:.2f}</AMOUNT></ALLLEDGERENTRIES.LIST>"
+                "</VOUCHER></TALLYMESSAGE>\n"
+            )
+        f.write("</REQUESTDATA></IMPORTDATA></BODY></ENVELOPE>\n")
+
+    with open(os.path.join(directory, "balances.xml"), "w", encoding="utf-8") as f:
+        f.write("<ENVELOPE><HEADER><VERSION>1</VERSION><STATUS>1</STATUS></HEADER><BODY><DESC></DESC><DATA><COLLECTION>\n")
+        for name in names:
+            f.write(f"<LEDGER NAME={quoteattr(name)}><CLOSINGBALANCE TYPE=\"Amount\">{closing[name]:.2f}</CLOSINGBALANCE></LEDGER>\n")
+        f.write("</COLLECTION></DATA></BODY></ENVELOPE>\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer Tally XML export requests from recordings")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--dir", default=RECORDINGS_DIR)
+    parser.add_argument("--record", metavar="TALLY_URL")
+    parser.add_argument("--generate", type=int, metavar="VOUCHERS")
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.record, args.dir)
+    elif args.generate:
+        generate(args.generate, args.dir)
+    else:
+        server, base_url = serve(args.dir, args.port)
+        print(f"{base_url}/daybook")
+        print(f"{base_url}/balances")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
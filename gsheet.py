@@ -1,21 +1,16 @@
 import streamlit as st
-import pandas as pd
+
+import ledger_schema
+import ledger_store
 
 st.set_page_config(page_title="Ledger Viewer", layout="centered")
 
 st.title("📒 Ledger Viewer")
 
-# Google Drive file IDs
-file_id = '1Qt_dcHn8YNeVL6s7m7647YssIoukdNoB'
-bal_file_id = '1F39ERDJAiRTOYnNTnThtF-sIl_-zX3j5'
-
-# Construct direct download URLs
-csv_url = f'https://drive.google.com/uc?id={file_id}'
-bal_csv_url = f'https://drive.google.com/uc?id={bal_file_id}'
-
-# Load CSVs
-df = pd.read_csv(csv_url)
-bal_df = pd.read_csv(bal_csv_url)
+# Load the shared ledger snapshot
+snap = ledger_store.get_snapshot()
+df = snap.ledger
+bal_df = snap.balances
 
 # UI block for ledger selection
 st.subheader("🔍 Select Ledger")
@@ -29,6 +24,12 @@ if 'LedgerName' in df.columns:
 
     # Filter and display ledger data
     filtered_df = df[df['LedgerName'] == selected_ledger].drop(columns=['LedgerName'])
+    # snapshot rows hold day numbers and paise: dates and rupees for display
+    filtered_df = filtered_df.assign(
+        Date=ledger_schema.days_to_dates(filtered_df['Date']).strftime('%d-%m-%y'),
+        DrAmt=(filtered_df['DrAmt'] / 100).where(filtered_df['DrAmt'] != 0),
+        CrAmt=(filtered_df['CrAmt'] / 100).where(filtered_df['CrAmt'] != 0),
+    )
     st.subheader("📑 Ledger Details")
     st.dataframe(filtered_df, use_container_width=True, hide_index=True)
 else:
@@ -36,11 +37,10 @@ else:
 
 # Show closing balance
 if 'Ledger Name' in bal_df.columns:
-    filtered_bal_df = bal_df[bal_df['Ledger Name'] == selected_ledger]
-    if not filtered_bal_df.empty:
-        closing_balance = filtered_bal_df['Closing Balance'].values[0]
+    closing_balance = snap.closing_balance(selected_ledger)
+    if closing_balance is not None:
         st.subheader("💰 Closing Balance")
-        st.success(f"Closing Balance for **{selected_ledger}** is:   ₹ {closing_balance:,.2f}")
+        st.success(f"Closing Balance for **{selected_ledger}** is:   ₹ {closing_balance / 100:,.2f}")
     else:
         st.warning("No balance information found for the selected ledger.")
 else:
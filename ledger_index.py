@@ -0,0 +1,369 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from ledger_schema import days_to_months, to_day
+
+
+# -------------------------------
+# 🗂️ PER-LEDGER INDEX
+# -------------------------------
+# Built once per snapshot. Every ledger owns one date-sorted block of row
+# positions, so a ledger + date range lookup is two binary searches inside that
+# block and a slice, independent of how many rows the whole company ledger has.
+# When new vouchers are appended only the blocks of the ledgers they touch are
+# rebuilt; everything else is shared with the previous snapshot.
+
+
+class LedgerIndex:
+    def __init__(self, blocks):
+        # name -> (row positions, their dates), both sorted by date
+        self.blocks = blocks
+        self.names = sorted(blocks)
+
+    @classmethod
+    def build(cls, ledger, offset=0):
+        names = ledger["LedgerName"]
+        if not isinstance(names.dtype, pd.CategoricalDtype):
+            names = names.astype("category")
+        codes = names.cat.codes.to_numpy()
+        dates = ledger["Date"].to_numpy()
+
+        # stable sort by ledger code, then day (NO_DAY rows sort to the end of their block)
+        order = np.lexsort((dates, codes))
+        sorted_codes = codes[order]
+        sorted_dates = dates[order]
+        positions = order + offset
+        categories = names.cat.categories
+        starts = np.searchsorted(sorted_codes, np.arange(len(categories)), side="left")
+        stops = np.searchsorted(sorted_codes, np.arange(len(categories)), side="right")
+
+        return cls({
+            name: (positions[start:stop], sorted_dates[start:stop])
+            for name, start, stop in zip(categories, starts, stops)
+            if stop > start
+        })
+
+    def extend(self, tail, offset):
+        # New index for `tail` appended at row `offset`; untouched blocks are shared
+        added = LedgerIndex.build(tail, offset)
+        blocks = dict(self.blocks)
+        for name, (new_positions, new_dates) in added.blocks.items():
+            if name in blocks:
+                old_positions, old_dates = blocks[name]
+                positions = np.concatenate([old_positions, new_positions])
+                dates = np.concatenate([old_dates, new_dates])
+                # backdated voucher (or NO_DAY at the end of the old block): re-sort this block only
+                if not old_dates[-1] <= new_dates[0]:
+                    order = np.argsort(dates, kind="stable")
+                    positions, dates = positions[order], dates[order]
+                blocks[name] = (positions, dates)
+            else:
+                blocks[name] = (new_positions, new_dates)
+        return LedgerIndex(blocks)
+
+    def to_arrays(self):
+        # the blocks laid end to end in name order, plus (name, start, stop) of
+        # each, so they can be written to the shared cache as flat columns
+        sizes = np.array([len(self.blocks[name][0]) for name in self.names], dtype="int64")
+        stops = np.cumsum(sizes)
+        if self.names:
+            positions = np.concatenate([self.blocks[name][0] for name in self.names]).astype("int64")
+            dates = np.concatenate([self.blocks[name][1] for name in self.names])
+        else:
+            positions, dates = np.empty(0, dtype="int64"), np.empty(0, dtype="int32")
+        bounds = pd.DataFrame({"Name": self.names, "Start": stops - sizes, "Stop": stops})
+        return positions, dates, bounds
+
+    @classmethod
+    def from_arrays(cls, positions, dates, bounds):
+        # blocks are slices (views) of the flat columns, nothing is copied
+        return cls({
+            name: (positions[start:stop], dates[start:stop])
+            for name, start, stop in zip(bounds["Name"], bounds["Start"].tolist(), bounds["Stop"].tolist())
+        })
+
+    def __contains__(self, name):
+        return name in self.blocks
+
+    def positions(self, name, from_date=None, to_date=None):
+        # Row positions of `name` with from_date <= Date <= to_date, in date order
+        if name not in self.blocks:
+            return np.empty(0, dtype=np.intp)
+        positions, dates = self.blocks[name]
+        lo, hi = 0, len(positions)
+        if from_date is not None:
+            lo = int(np.searchsorted(dates, to_day(from_date), side="left"))
+        if to_date is not None:
+            hi = int(np.searchsorted(dates, to_day(to_date), side="right"))
+        return positions[lo:max(lo, hi)]
+
+
+# -------------------------------
+# 📅 DATE INDEX
+# -------------------------------
+# All row positions sorted by Date, for range scans across ledgers (Daybook).
+# Only the rows of the visible page are ever materialised from it.
+
+class DateIndex:
+    def __init__(self, positions, dates):
+        self.positions = positions
+        self.dates = dates
+
+    @classmethod
+    def build(cls, ledger, offset=0):
+        dates = ledger["Date"].to_numpy()
+        order = np.argsort(dates, kind="stable")
+        return cls(order + offset, dates[order])
+
+    def extend(self, tail, offset):
+        added = DateIndex.build(tail, offset)
+        if len(self.dates) == 0:
+            return added
+        positions = np.concatenate([self.positions, added.positions])
+        dates = np.concatenate([self.dates, added.dates])
+        if len(added.dates) and not self.dates[-1] <= added.dates[0]:
+            order = np.argsort(dates, kind="stable")
+            positions, dates = positions[order], dates[order]
+        return DateIndex(positions, dates)
+
+    def between(self, from_date, to_date):
+        # positions with from_date <= Date <= to_date, in date order
+        lo = int(np.searchsorted(self.dates, to_day(from_date), side="left"))
+        hi = int(np.searchsorted(self.dates, to_day(to_date), side="right"))
+        return self.positions[lo:max(lo, hi)]
+
+
+# -------------------------------
+# 📅 DAYBOOK AGGREGATES
+# -------------------------------
+# Dr / Cr totals and voucher counts per (day, Type, LedgerName), sorted by day.
+# Daybook totals and summaries for any date range are a binary search plus a
+# sum over this table instead of a scan of the raw ledger.
+
+AGG_KEYS = ["Date", "Type", "LedgerName"]
+
+
+class DailyTotals:
+    def __init__(self, table):
+        self.table = table
+        self._dates = table["Date"].to_numpy()
+        self.types = sorted(table["Type"].unique())
+
+    @classmethod
+    def build(cls, ledger):
+        keys = [
+            ledger["Date"],
+            ledger["Type"].astype(str).where(ledger["Type"].notna()),
+            ledger["LedgerName"].astype(str).where(ledger["LedgerName"].notna()),
+        ]
+        table = (
+            ledger.groupby(keys)
+            .agg(DrAmt=("DrAmt", "sum"), CrAmt=("CrAmt", "sum"), Count=("DrAmt", "size"))
+            .reset_index()
+            .sort_values("Date", kind="stable", ignore_index=True)
+        )
+        return cls(table)
+
+    def extend(self, tail):
+        table = (
+            pd.concat([self.table, DailyTotals.build(tail).table], ignore_index=True)
+            .groupby(AGG_KEYS, as_index=False)
+            .sum()
+            .sort_values("Date", kind="stable", ignore_index=True)
+        )
+        return DailyTotals(table)
+
+    def rows(self, from_date, to_date, types=None, ledgers=None):
+        # aggregate rows for from_date <= day <= to_date, optionally narrowed to types / ledgers
+        lo = int(np.searchsorted(self._dates, to_day(from_date), side="left"))
+        hi = int(np.searchsorted(self._dates, to_day(to_date), side="right"))
+        rows = self.table.iloc[lo:max(lo, hi)]
+        if types is not None:
+            rows = rows[rows["Type"].isin(list(types))]
+        if ledgers is not None:
+            rows = rows[rows["LedgerName"].isin(list(ledgers))]
+        return rows
+
+    def totals(self, from_date, to_date, types=None, ledgers=None):
+        # (total Dr paise, total Cr paise, voucher count)
+        rows = self.rows(from_date, to_date, types, ledgers)
+        return int(rows["DrAmt"].sum()), int(rows["CrAmt"].sum()), int(rows["Count"].sum())
+
+    def summary(self, from_date, to_date, types=None, ledgers=None, by="Type"):
+        # Dr / Cr / voucher count per `by` value ("Type", "LedgerName" or "Date")
+        rows = self.rows(from_date, to_date, types, ledgers)
+        return rows.groupby(by, as_index=False)[["DrAmt", "CrAmt", "Count"]].sum()
+
+
+# -------------------------------
+# 🗓️ MONTHLY AGGREGATES
+# -------------------------------
+# The same totals per (month, Type, LedgerName), for period-over-period
+# reports. Months are numbered like datetime64[M] (0 = Jan 1970). Appended
+# vouchers are folded into the existing table, never re-aggregated from scratch.
+
+MONTH_KEYS = ["Month", "Type", "LedgerName"]
+
+
+class MonthlyTotals:
+    def __init__(self, table):
+        self.table = table
+
+    @classmethod
+    def build(cls, ledger):
+        keys = [
+            pd.Series(days_to_months(ledger["Date"]), index=ledger.index, name="Month"),
+            ledger["Type"].astype(str).where(ledger["Type"].notna()),
+            ledger["LedgerName"].astype(str).where(ledger["LedgerName"].notna()),
+        ]
+        table = (
+            ledger.groupby(keys)
+            .agg(DrAmt=("DrAmt", "sum"), CrAmt=("CrAmt", "sum"), Count=("DrAmt", "size"))
+            .reset_index()
+        )
+        return cls(table)
+
+    def extend(self, tail):
+        table = (
+            pd.concat([self.table, MonthlyTotals.build(tail).table], ignore_index=True)
+            .groupby(MONTH_KEYS, as_index=False)
+            .sum()
+        )
+        return MonthlyTotals(table)
+
+
+# -------------------------------
+# 💰 RUNNING BALANCES
+# -------------------------------
+# Balance after every voucher in paise, Cr positive / Dr negative like the
+# balance file. One grouped cumulative sum over the per-ledger blocks, anchored
+# so the last voucher of each ledger lands on that ledger's closing balance
+# (ledgers missing from the balance file start from zero).
+
+class RunningBalances:
+    def __init__(self, index, running, net):
+        self.index = index
+        self.running = running
+        self.net = net
+
+    @classmethod
+    def build(cls, ledger, index, closing):
+        net = (ledger["CrAmt"] - ledger["DrAmt"]).to_numpy(dtype="int64")
+        running = np.zeros(len(ledger), dtype="int64")
+        if not index.blocks:
+            return cls(index, running, net)
+
+        names = index.names
+        order = np.concatenate([index.blocks[name][0] for name in names])
+        sizes = np.array([len(index.blocks[name][0]) for name in names])
+        ends = np.cumsum(sizes)
+        starts = ends - sizes
+
+        cumulative = np.cumsum(net[order])
+        # cumulative sum restarted at the start of each block
+        before_block = np.repeat(cumulative[starts] - net[order][starts], sizes)
+        within = cumulative - before_block
+        block_total = within[ends - 1]
+        anchor = np.array([closing.get(name, 0) for name in names], dtype="int64")
+        anchored = np.array([name in closing for name in names])
+        opening = np.where(anchored, anchor - block_total, 0)
+        running[order] = within + np.repeat(opening, sizes)
+        return cls(index, running, net)
+
+    def opening_closing(self, name, from_date, to_date):
+        # (balance before from_date, balance at the end of to_date) in paise, None for unknown ledgers
+        if name not in self.index.blocks:
+            return None
+        positions, dates = self.index.blocks[name]
+        lo = int(np.searchsorted(dates, to_day(from_date), side="left"))
+        hi = int(np.searchsorted(dates, to_day(to_date), side="right"))
+        first = positions[0]
+        opening = self.running[positions[lo - 1]] if lo > 0 else self.running[first] - self.net[first]
+        closing = self.running[positions[hi - 1]] if hi > lo else opening
+        return int(opening), int(closing)
+
+
+# -------------------------------
+# 🔎 VOUCHER SEARCH
+# -------------------------------
+# Inverted index from lower-cased alphanumeric tokens of VoucherNo, Ledger,
+# LedgerName, Type (and Narration when the export has it) to row positions.
+# The vocabulary is sorted, so every term starting with a prefix is one
+# contiguous slice: "sa 12" finds SA/123, SA/1204, ... A query matches rows
+# containing a prefix match for each of its words.
+
+SEARCH_COLUMNS = ["VoucherNo", "Ledger", "LedgerName", "Type", "Narration"]
+TOKEN_PATTERN = r"[0-9a-z]+"
+
+
+def tokenize(text):
+    return re.findall(TOKEN_PATTERN, str(text).lower())
+
+
+class SearchIndex:
+    def __init__(self, terms, offsets, postings):
+        # terms[i] owns postings[offsets[i]:offsets[i + 1]] (sorted row positions)
+        self.terms = terms
+        self.offsets = offsets
+        self.postings = postings
+
+    @classmethod
+    def build(cls, ledger):
+        term_parts, row_parts = [], []
+        for col in SEARCH_COLUMNS:
+            if col not in ledger.columns:
+                continue
+            values = ledger[col]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                # tokenize each category once, then expand through the codes
+                codes = values.cat.codes.to_numpy()
+                order = np.argsort(codes, kind="stable")
+                bounds = np.searchsorted(codes[order], np.arange(len(values.cat.categories) + 1))
+                for code, category in enumerate(values.cat.categories):
+                    rows = order[bounds[code]:bounds[code + 1]]
+                    for token in set(tokenize(category)):
+                        term_parts.append(np.full(len(rows), token, dtype=object))
+                        row_parts.append(rows)
+            else:
+                tokens = values.astype(str).str.lower().str.findall(TOKEN_PATTERN).explode().dropna()
+                term_parts.append(tokens.to_numpy(dtype=object))
+                row_parts.append(tokens.index.to_numpy())
+        if not term_parts:
+            return cls(np.array([], dtype=object), np.zeros(1, dtype=np.int64), np.empty(0, dtype=np.intp))
+
+        # hash the tokens to ids, then sort only the (much smaller) vocabulary
+        codes, uniques = pd.factorize(np.concatenate(term_parts))
+        uniques = np.asarray(uniques, dtype=str)
+        order = np.argsort(uniques)
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+
+        # (term, row) pairs as single int64 keys: one integer sort orders and dedups them
+        n_rows = max(len(ledger), 1)
+        keys = np.unique(rank[codes] * n_rows + np.concatenate(row_parts))
+        offsets = np.searchsorted(keys // n_rows, np.arange(len(order) + 1))
+        return cls(uniques[order], offsets, (keys % n_rows).astype(np.intp))
+
+    def _prefix(self, token):
+        # postings of every term starting with `token` (may repeat a row)
+        lo = int(np.searchsorted(self.terms, token, side="left"))
+        hi = int(np.searchsorted(self.terms, token + "\uffff", side="left"))
+        return self.postings[self.offsets[lo]:self.offsets[max(lo, hi)]]
+
+    def search(self, query, n_rows):
+        # row positions (ascending) matching every word of the query by prefix
+        tokens = set(tokenize(query))
+        if not tokens:
+            return np.empty(0, dtype=np.intp)
+        # most selective word first; the others only filter its candidates
+        matches = sorted((self._prefix(token) for token in tokens), key=len)
+        result = np.unique(matches[0])
+        for postings in matches[1:]:
+            if len(result) == 0:
+                break
+            seen = np.zeros(n_rows, dtype=bool)
+            seen[postings] = True
+            result = result[seen[result]]
+        return result
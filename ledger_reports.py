@@ -0,0 +1,399 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from ledger_schema import NO_DAY, to_day
+
+
+# -------------------------------
+# ⏳ RECEIVABLES AGEING
+# -------------------------------
+# Outstanding Dr balance of every ledger on the as-of date, split by the age
+# of the debits that make it up. Credits settle the oldest debits first
+# (FIFO), so whatever is still outstanding is the most recent debits adding up
+# to that balance. Vouchers dated after the as-of date are taken back out of
+# the closing balance and otherwise ignored. This is computed for all ledgers
+# at once from the per-ledger blocks of the snapshot. The part of a balance
+# not covered by any debit in the export predates the export, so it goes in
+# the oldest bucket.
+
+AGEING_LIMITS = (30, 60, 90)
+AGEING_BUCKETS = ["0-30", "31-60", "61-90", "90+"]
+
+# (snapshot version, partition, as-of date) -> ageing table; the most recently
+# used few only, as every as-of date picked on the page is a new entry
+AGEING_CACHE_SIZE = 16
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def compute_ageing(snap, as_of):
+    # Amounts in paise
+    index = snap.index
+    names = index.names
+    ledger = snap.ledger
+    n_buckets = len(AGEING_BUCKETS)
+    table = np.zeros((len(names), n_buckets), dtype="int64")
+
+    if names:
+        order = np.concatenate([index.blocks[name][0] for name in names])
+        sizes = np.array([len(index.blocks[name][0]) for name in names])
+        ends = np.cumsum(sizes)
+
+        as_of_day = to_day(as_of)
+        days = ledger["Date"].to_numpy()[order]
+        after = (days > as_of_day) & (days != NO_DAY)
+        debits = np.where(after, 0, ledger["DrAmt"].to_numpy(dtype="int64")[order])
+
+        # Dr balance of each ledger on the as-of date: the anchored closing
+        # balance less the vouchers booked after it
+        closing = snap.running_balances.running[order[ends - 1]]
+        net_after = np.add.reduceat(np.where(after, snap.running_balances.net[order], 0), ends - sizes)
+        due = np.maximum(net_after - closing, 0)
+
+        # debits booked after each row within its ledger
+        cumulative = np.cumsum(debits)
+        later = np.repeat(cumulative[ends - 1], sizes) - cumulative
+        outstanding = np.clip(np.repeat(due, sizes) - later, 0, debits)
+
+        # age in days; undated rows fall into the oldest bucket
+        age = as_of_day - days.astype("int64")
+        age[days == NO_DAY] = AGEING_LIMITS[-1] + 1
+        bucket = np.searchsorted(np.array(AGEING_LIMITS), age, side="left")
+        ledger_id = np.repeat(np.arange(len(names)), sizes)
+        # float sums of whole paise are exact well beyond any ledger total
+        table = np.bincount(ledger_id * n_buckets + bucket, weights=outstanding,
+                            minlength=len(names) * n_buckets).reshape(len(names), n_buckets)
+        table = table.round().astype("int64")
+
+        block_debits = np.diff(cumulative[ends - 1], prepend=0)
+        table[:, -1] += np.maximum(due - block_debits, 0)
+
+    ageing = pd.DataFrame(table, columns=AGEING_BUCKETS)
+    ageing.insert(0, "Ledger Name", names)
+
+    # ledgers with a Dr balance but no vouchers in the export
+    known = set(names)
+    extra = [(name, -value) for name, value in snap.balance_map.items() if name not in known and value < 0]
+    if extra:
+        rows = pd.DataFrame(0, index=range(len(extra)), columns=AGEING_BUCKETS, dtype="int64")
+        rows["90+"] = [amount for _, amount in extra]
+        rows.insert(0, "Ledger Name", [name for name, _ in extra])
+        ageing = pd.concat([ageing, rows], ignore_index=True)
+
+    ageing["Total"] = ageing[AGEING_BUCKETS].sum(axis=1)
+    ageing = ageing[ageing["Total"] > 0]
+    return ageing.sort_values("Total", ascending=False, ignore_index=True)
+
+
+def receivables_ageing(snap, as_of):
+    # Cached per snapshot version; computing it is one vectorised pass over the ledger
+    key = (snap.version, snap.partition_key, pd.Timestamp(as_of).date())
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    ageing = compute_ageing(snap, as_of)
+    with _cache_lock:
+        for old in [k for k in _cache if k[0] != snap.version]:
+            del _cache[old]
+        _cache[key] = ageing
+        while len(_cache) > AGEING_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return ageing
+
+
+# -------------------------------
+# 🧮 LEDGER VS BALANCE FILE
+# -------------------------------
+# The vouchers and the closing balances come from separate exports. For every
+# ledger the net of its vouchers (Cr - Dr) should equal its closing balance in
+# the balance file; the per-ledger totals are one reduceat over the index
+# blocks, then a single outer join with the balance file. Run for every new
+# snapshot (store listener), so a disagreement shows up at the next refresh.
+
+# paise; both exports have two decimals, so anything above this is a real gap
+RECONCILE_TOLERANCE = 0
+RECONCILE_STATUSES = ["Balance differs", "Not in balance file", "No vouchers"]
+
+_reconcile_cache = {}
+
+
+def reconcile(snap):
+    # One row per ledger in either export; amounts in paise
+    index = snap.index
+    names = index.names
+    ledger = snap.ledger
+    if names:
+        order = np.concatenate([index.blocks[name][0] for name in names])
+        sizes = np.array([len(index.blocks[name][0]) for name in names])
+        starts = np.cumsum(sizes) - sizes
+        dr = np.add.reduceat(ledger["DrAmt"].to_numpy(dtype="int64")[order], starts)
+        cr = np.add.reduceat(ledger["CrAmt"].to_numpy(dtype="int64")[order], starts)
+    else:
+        sizes = dr = cr = np.zeros(0, dtype="int64")
+    # explicit dtypes: with no vouchers an empty name column would be float64 and not merge with the balances
+    vouchers = pd.DataFrame({
+        "Ledger Name": pd.Series(names, dtype=object),
+        "Vouchers": pd.Series(sizes, dtype="int64"),
+        "DrAmt": pd.Series(dr, dtype="int64"),
+        "CrAmt": pd.Series(cr, dtype="int64"),
+    })
+    balances = snap.balances[["Ledger Name", "BalancePaise"]].drop_duplicates("Ledger Name")
+
+    table = vouchers.merge(balances, how="outer", on="Ledger Name", indicator=True)
+    table[["Vouchers", "DrAmt", "CrAmt"]] = table[["Vouchers", "DrAmt", "CrAmt"]].fillna(0).astype("int64")
+    table["Ledger Net"] = table["CrAmt"] - table["DrAmt"]
+    table["Closing Balance"] = table["BalancePaise"].fillna(0).astype("int64")
+    table["Difference"] = table["Closing Balance"] - table["Ledger Net"]
+
+    status = np.select(
+        [table["_merge"] == "left_only", table["_merge"] == "right_only", table["Difference"].abs() > RECONCILE_TOLERANCE],
+        ["Not in balance file", "No vouchers", "Balance differs"],
+        default="OK",
+    )
+    table["Status"] = status
+    # a ledger with no vouchers and a zero balance has nothing to disagree about
+    table = table[~((table["Status"] == "No vouchers") & (table["Closing Balance"] == 0))]
+    table = table.drop(columns=["BalancePaise", "_merge"])
+    return table.sort_values("Difference", key=lambda d: d.abs(), ascending=False, ignore_index=True)
+
+
+def reconciliation(snap):
+    # (full table, mismatches, summary per status); cached per snapshot version
+    key = (snap.version, snap.partition_key)
+    with _cache_lock:
+        if key in _reconcile_cache:
+            return _reconcile_cache[key]
+    table = reconcile(snap)
+    mismatches = table[table["Status"] != "OK"].reset_index(drop=True)
+    summary = (
+        mismatches.groupby("Status")
+        .agg(Ledgers=("Ledger Name", "size"), Difference=("Difference", lambda d: d.abs().sum()))
+        .reindex(RECONCILE_STATUSES, fill_value=0)
+        .reset_index()
+    )
+    result = (table, mismatches, summary)
+    with _cache_lock:
+        for old in [k for k in _reconcile_cache if k[0] != snap.version]:
+            del _reconcile_cache[old]
+        _reconcile_cache[key] = result
+    return result
+
+
+# -------------------------------
+# 🏷️ DISTRIBUTOR BALANCES
+# -------------------------------
+# The Dist collection (name, brand, location, assigned_to, company) joined with
+# the balance snapshot once, indexed by (brand, location). A brand / location /
+# assignee selection is then an index lookup on this frame instead of a Mongo
+# query plus an isin() over the balances. The join is rebuilt when the snapshot
+# version changes or the Dist copy is reloaded (writes from the distributor
+# pages, or DIST_TTL seconds for edits made elsewhere).
+
+DIST_FIELDS = ["name", "brand", "location", "assigned_to", "company"]
+DIST_TTL = 60
+
+_dist = {"frame": None, "version": 0, "loaded_at": 0.0}
+_dist_lock = threading.Lock()
+_join_cache = {}
+
+
+def invalidate_dist():
+    # call after writing to the Dist collection
+    with _dist_lock:
+        _dist["frame"] = None
+
+
+def dist_frame(collection):
+    # (Dist rows as a DataFrame, version of that copy)
+    with _dist_lock:
+        if _dist["frame"] is None or time.monotonic() - _dist["loaded_at"] >= DIST_TTL:
+            docs = list(collection.find({}, {"_id": 0, **{field: 1 for field in DIST_FIELDS}}))
+            frame = pd.DataFrame(docs).reindex(columns=DIST_FIELDS)
+            if _dist["frame"] is None or not frame.equals(_dist["frame"]):
+                _dist["version"] += 1
+            _dist["frame"] = frame
+            _dist["loaded_at"] = time.monotonic()
+        return _dist["frame"], _dist["version"]
+
+
+class DistBalances:
+    def __init__(self, frame):
+        # one row per distributor, indexed by (brand, location) and sorted
+        self.frame = frame
+
+    @classmethod
+    def build(cls, dist, balances):
+        joined = dist.merge(
+            balances[["Ledger Name", "Closing Balance", "BalancePaise"]],
+            how="left", left_on="name", right_on="Ledger Name",
+        )
+        joined[["brand", "location"]] = joined[["brand", "location"]].fillna("").astype(str)
+        # paise; distributors without a balance row count as zero
+        values = joined["BalancePaise"].fillna(0).astype("int64")
+        joined["Dr"] = (-values).clip(lower=0)
+        joined["Cr"] = values.clip(lower=0)
+        return cls(joined.set_index(["brand", "location"]).sort_index())
+
+    def _scope(self, assigned_to=None):
+        if assigned_to is None:
+            return self.frame
+        return self.frame[self.frame["assigned_to"] == assigned_to]
+
+    def brands(self, assigned_to=None):
+        return sorted(b for b in self._scope(assigned_to).index.unique(level="brand") if b)
+
+    def locations(self, brand, assigned_to=None):
+        rows = self.select(brand, assigned_to=assigned_to)
+        return sorted(loc for loc in rows.index.unique(level="location") if loc)
+
+    def select(self, brand, location=None, assigned_to=None):
+        # distributors of a brand (and location), with their balance columns
+        key = (brand, location) if location else brand
+        frame = self._scope(assigned_to)
+        if not brand or key not in frame.index:
+            return frame.iloc[0:0]
+        return frame.loc[[key]]
+
+    def balances(self, brand, location=None, assigned_to=None):
+        # the selected distributors that have a row in the balance file
+        rows = self.select(brand, location, assigned_to)
+        return rows[rows["Ledger Name"].notna()]
+
+    def subtotals(self, by=("brand", "location"), assigned_to=None):
+        # Dr / Cr totals (paise) per brand and / or location in one groupby
+        frame = self._scope(assigned_to)
+        totals = frame.groupby(level=list(by))[["Dr", "Cr"]].sum()
+        totals["Distributors"] = frame.groupby(level=list(by)).size()
+        return totals.reset_index()
+
+
+def dist_balances(snap, collection):
+    # Cached per (snapshot version, Dist version)
+    dist, dist_version = dist_frame(collection)
+    key = (snap.version, snap.partition_key, dist_version)
+    with _cache_lock:
+        if key in _join_cache:
+            return _join_cache[key]
+    joined = DistBalances.build(dist, snap.balances)
+    with _cache_lock:
+        for old in [k for k in _join_cache if k[0] != snap.version or k[2] != dist_version]:
+            del _join_cache[old]
+        _join_cache[key] = joined
+    return joined
+
+
+# -------------------------------
+# 📊 MONTHLY CUBE
+# -------------------------------
+# Dr / Cr / voucher count per (month, brand, location, Type). Built from the
+# snapshot's monthly per-ledger totals (which are extended, not rebuilt, when
+# vouchers are appended) joined to the Dist copy, so a rebuild only touches
+# months x ledgers x types rows. Every slice or pivot is a filter plus a
+# groupby on this small table.
+
+CUBE_KEYS = ["Month", "Brand", "Location", "Type"]
+CUBE_MEASURES = ["DrAmt", "CrAmt", "Count"]
+UNASSIGNED = "(unassigned)"
+
+_cube_cache = {}
+
+
+class MonthlyCube:
+    def __init__(self, table):
+        self.table = table
+
+    @classmethod
+    def build(cls, monthly, dist):
+        dist = dist.dropna(subset=["name"]).drop_duplicates("name").set_index("name")
+        table = monthly[monthly["Month"] != NO_DAY]
+        for col, field in (("Brand", "brand"), ("Location", "location")):
+            values = table["LedgerName"].map(dist[field]).fillna("").astype(str)
+            table = table.assign(**{col: values.where(values != "", UNASSIGNED)})
+        table = table.groupby(CUBE_KEYS, as_index=False)[CUBE_MEASURES].sum()
+        for col in CUBE_KEYS[1:]:
+            table[col] = table[col].astype("category")
+        return cls(table.sort_values("Month", ignore_index=True))
+
+    def months(self):
+        return sorted(self.table["Month"].unique().tolist())
+
+    def values(self, dimension):
+        return sorted(self.table[dimension].unique().tolist())
+
+    def slice(self, from_month=None, to_month=None, brands=None, locations=None, types=None):
+        rows = self.table
+        if from_month is not None:
+            rows = rows[rows["Month"] >= from_month]
+        if to_month is not None:
+            rows = rows[rows["Month"] <= to_month]
+        for col, selected in (("Brand", brands), ("Location", locations), ("Type", types)):
+            if selected:
+                rows = rows[rows[col].isin(selected)]
+        return rows
+
+    @staticmethod
+    def pivot(rows, index, measure):
+        # `index` (a dimension) down, months across; measure "Net" is Cr - Dr
+        rows = rows.assign(Net=rows["CrAmt"] - rows["DrAmt"])
+        table = rows.pivot_table(index=index, columns="Month", values=measure, aggfunc="sum", fill_value=0, observed=True)
+        return table.loc[table.abs().sum(axis=1) > 0]
+
+
+def monthly_cube(snap, collection):
+    # Cached per (snapshot version, Dist version)
+    dist, dist_version = dist_frame(collection)
+    key = (snap.version, snap.partition_key, dist_version)
+    with _cache_lock:
+        if key in _cube_cache:
+            return _cube_cache[key]
+    cube = MonthlyCube.build(snap.monthly.table, dist)
+    with _cache_lock:
+        for old in [k for k in _cube_cache if k[0] != snap.version or k[2] != dist_version]:
+            del _cube_cache[old]
+        _cube_cache[key] = cube
+    return cube
+
+
+# -------------------------------
+# 👥 PARTITIONED SNAPSHOTS
+# -------------------------------
+# A Standard user only ever looks at the distributors assigned to them, so
+# their session works on a snapshot of just those ledgers (per assignee, or per
+# brand). Partitions are views over the shared snapshot (LedgerSnapshot.partition),
+# built once per (snapshot version, Dist version) and shared by every session;
+# warm_partitions builds every assignee and brand partition as soon as a new
+# snapshot is ingested.
+
+_partitions = {}
+_partitions_version = None
+
+
+def partition(snap, collection, assigned_to=None, brand=None):
+    global _partitions_version
+    dist, dist_version = dist_frame(collection)
+    key = ("assigned_to", assigned_to) if assigned_to is not None else ("brand", brand)
+    with _cache_lock:
+        if _partitions_version != (snap.version, dist_version):
+            _partitions.clear()
+            _partitions_version = (snap.version, dist_version)
+        if key in _partitions:
+            return _partitions[key]
+    names = dist.loc[dist[key[0]] == key[1], "name"].dropna().unique()
+    part = snap.partition(names, key)
+    with _cache_lock:
+        if _partitions_version == (snap.version, dist_version):
+            _partitions[key] = part
+    return part
+
+
+def warm_partitions(snap, collection):
+    dist, _ = dist_frame(collection)
+    for assignee in dist["assigned_to"].dropna().unique():
+        partition(snap, collection, assigned_to=assignee)
+    for brand in dist["brand"].dropna().unique():
+        partition(snap, collection, brand=brand)
@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+
+
+# -------------------------------
+# 📐 LEDGER SCHEMA REGISTRY
+# -------------------------------
+# Column types of the Tally exports. Every file is checked and typed once here
+# at ingest, so the pages can rely on the columns being present and typed.
+#
+#   day       -> int32 day number (days since 1970-01-01); unparseable dates
+#                become NO_DAY, which sorts after every real day
+#   money     -> int64 paise (missing amounts are 0), so sums are exact
+#   category  -> pandas categorical (dictionary-encoded names)
+#   string    -> pandas string dtype
+#   balance   -> kept as read for display, plus a signed int64 "BalancePaise"
+#                column (Cr positive, Dr negative)
+#   raw       -> required, kept as read
+#
+# Amounts and dates stay in these compact forms everywhere in the snapshot;
+# they are turned back into rupees / dates only for the rows being rendered.
+
+# bump when a type below changes so stale on-disk caches are ignored
+SCHEMA_VERSION = 3
+
+NO_DAY = np.iinfo(np.int32).max
+
+SCHEMAS = {
+    "ledger": {
+        "Date": "day",
+        "LedgerName": "category",
+        "Ledger": "category",
+        "Type": "category",
+        "VoucherNo": "string",
+        "DrAmt": "money",
+        "CrAmt": "money",
+    },
+    "balances": {
+        "Ledger Name": "raw",
+        "Closing Balance": "balance",
+    },
+}
+
+
+class SchemaError(ValueError):
+    pass
+
+
+def required_columns(name):
+    return list(SCHEMAS[name])
+
+
+# -------------------------------
+# Days and paise
+# -------------------------------
+
+def to_day(value):
+    # date / datetime / Timestamp / string -> day number
+    return int(pd.Timestamp(value).to_datetime64().astype("datetime64[D]").astype("int64"))
+
+
+def parse_days(values):
+    dates = pd.to_datetime(values, errors="coerce").to_numpy().astype("datetime64[D]")
+    days = dates.astype("int64")
+    days[np.isnat(dates)] = NO_DAY
+    return pd.Series(days.astype("int32"), index=values.index)
+
+
+def days_to_dates(days):
+    # day numbers -> datetime64 (NO_DAY -> NaT), for rendering
+    days = np.asarray(days, dtype="int64")
+    dates = days.astype("datetime64[D]")
+    dates[days == NO_DAY] = np.datetime64("NaT")
+    return pd.to_datetime(dates)
+
+
+def days_to_months(days):
+    # day numbers -> month numbers (months since 1970-01; NO_DAY stays NO_DAY)
+    days = np.asarray(days, dtype="int64")
+    months = days.astype("datetime64[D]").astype("datetime64[M]").astype("int64")
+    months[days == NO_DAY] = NO_DAY
+    return months.astype("int32")
+
+
+def months_to_dates(months):
+    # month numbers -> first day of the month as datetime64, for rendering
+    return pd.to_datetime(np.asarray(months, dtype="int64").astype("datetime64[M]"))
+
+
+def to_paise(values):
+    # rupee floats -> int64 paise, missing -> 0
+    return (pd.to_numeric(values, errors="coerce").fillna(0.0) * 100).round().astype("int64")
+
+
+def parse_balances(values):
+    # "1,23,456.00 Dr" / "5,000 Cr" / -1200.5  ->  signed rupees, unparseable -> 0.0
+    text = values.astype(str).str.strip()
+    is_dr = text.str.contains("dr", case=False, regex=False)
+    is_cr = text.str.contains("cr", case=False, regex=False)
+    number = text.str.replace(r"(?i)cr|dr|[,₹\s]", "", regex=True)
+    number = pd.to_numeric(number, errors="coerce").fillna(0.0).astype("float64")
+    number = number.where(~is_dr, -number.abs())
+    number = number.where(~is_cr, number.abs())
+    return number
+
+
+def apply_schema(name, df):
+    schema = SCHEMAS[name]
+    missing = [col for col in schema if col not in df.columns]
+    if missing:
+        raise SchemaError(f"{name} file is missing required columns: {', '.join(missing)}")
+
+    for col, kind in schema.items():
+        if kind == "day":
+            df[col] = parse_days(df[col])
+        elif kind == "money":
+            df[col] = to_paise(df[col])
+        elif kind == "category":
+            df[col] = df[col].astype("category")
+        elif kind == "string":
+            df[col] = df[col].astype("string")
+        elif kind == "balance":
+            df["BalancePaise"] = to_paise(parse_balances(df[col]))
+    return df
+
+
+def append_rows(name, df, tail):
+    # Concatenate a typed tail onto a typed frame, keeping categoricals categorical
+    head_cols = {}
+    tail = tail.copy()
+    for col, kind in SCHEMAS[name].items():
+        if kind == "category":
+            new = tail[col].cat.categories.difference(df[col].cat.categories)
+            dtype = pd.CategoricalDtype(df[col].cat.categories.append(new))
+            head_cols[col] = df[col].astype(dtype)
+            tail[col] = tail[col].astype(dtype)
+    head = df.assign(**head_cols) if head_cols else df
+    return pd.concat([head, tail], ignore_index=True)
@@ -0,0 +1,251 @@
+import io
+import multiprocessing
+import os
+import re
+import time
+import zipfile
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from ledger_schema import days_to_dates
+
+try:
+    import openpyxl
+except ImportError:
+    # XLSX statements need openpyxl; PDF is written without any extra package
+    openpyxl = None
+
+
+# -------------------------------
+# 🧾 BULK STATEMENTS OF ACCOUNT
+# -------------------------------
+# Month-end statements (opening, entries with running balance, closing) for
+# many ledgers at once. The parent process slices every ledger out of the
+# shared snapshot through the per-ledger index, which is cheap; the slow part,
+# laying the statement out as PDF / XLSX, runs on a process pool. Finished
+# files are written into the zip as they come back, and at most a few jobs
+# per worker are in flight, so memory does not grow with the number of
+# ledgers.
+
+STATEMENT_WORKERS = int(os.environ.get("STATEMENT_WORKERS", "0")) or os.cpu_count() or 1
+# below this many ledgers the pool start-up costs more than it saves
+SERIAL_LIMIT = 8
+JOBS_PER_WORKER = 4
+FORMATS = ["PDF", "XLSX"] if openpyxl else ["PDF"]
+
+
+def statement_job(snap, name, from_date, to_date, stem=None):
+    # Everything a worker needs for one ledger, as plain arrays (paise, day numbers)
+    if name in snap.index:
+        positions = snap.index.positions(name, from_date, to_date)
+        opening, closing = snap.opening_closing(name, from_date, to_date)
+    else:
+        # in the balance file but no vouchers in the export
+        positions = np.empty(0, dtype=np.intp)
+        opening = closing = snap.closing_balance(name) or 0
+    rows = snap.rows(positions, running_balance=True)
+    entries = {col: rows[col].to_numpy() for col in ("Date", "DrAmt", "CrAmt", "Balance")}
+    for col in ("Ledger", "Type", "VoucherNo"):
+        entries[col] = rows[col].astype(object).fillna("").to_numpy()
+    period = (pd.Timestamp(from_date).date(), pd.Timestamp(to_date).date())
+    return {"name": name, "stem": stem or file_stem(name), "period": period, "opening": opening, "closing": closing, "entries": entries}
+
+
+def file_stem(name):
+    return re.sub(r"[^\w\- .]+", "_", str(name)).strip() or "ledger"
+
+
+def file_stems(names):
+    # name -> file stem, unique within one zip: ledgers that clean up to the same
+    # stem (e.g. "A/B" and "A:B", or differing only in case) get " (2)", " (3)", ...
+    stems, used = {}, set()
+    for name in names:
+        stem = base = file_stem(name)
+        n = 1
+        while stem.lower() in used:
+            n += 1
+            stem = f"{base} ({n})"
+        used.add(stem.lower())
+        stems[name] = stem
+    return stems
+
+
+def _balance_text(paise):
+    return f"{abs(paise) / 100:,.2f} {'Dr' if paise < 0 else 'Cr'}"
+
+
+def _amount_text(paise):
+    return f"{paise / 100:,.2f}" if paise else ""
+
+
+# --- PDF ---
+# A plain A4 text statement in Courier (one of the 14 standard PDF fonts), so
+# no font files or PDF package are needed.
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+MARGIN = 36
+FONT_SIZE = 7.5
+LEADING = 10
+LINES_PER_PAGE = int((PAGE_HEIGHT - 2 * MARGIN) // LEADING)
+
+
+def _pdf_text(text):
+    text = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return text.encode("latin-1", "replace")
+
+
+def pdf_document(pages):
+    # pages: list of lists of text lines -> PDF bytes
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier >>"]
+    kids = []
+    for lines in pages:
+        content = b"BT /F1 %.1f Tf %d TL %d %d Td " % (FONT_SIZE, LEADING, MARGIN, PAGE_HEIGHT - MARGIN)
+        content += b"".join(b"(" + _pdf_text(line) + b") Tj T* " for line in lines) + b"ET"
+        stream = zlib.compress(content)
+        objects.append(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R "
+                       b"/Resources << /Font << /F1 3 0 R >> >> >>" % (PAGE_WIDTH, PAGE_HEIGHT, len(objects)))
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [" + b" ".join(kids) + b"] /Count %d >>" % len(kids)
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    out.write(b"".join(b"%010d 00000 n \n" % offset for offset in offsets))
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def render_pdf(job):
+    entries = job["entries"]
+    start, end = job["period"]
+    header = [
+        "STATEMENT OF ACCOUNT",
+        f"Ledger : {job['name']}",
+        f"Period : {start:%d-%m-%Y} to {end:%d-%m-%Y}",
+        f"Opening Balance : Rs. {_balance_text(job['opening'])}",
+        "",
+    ]
+    table_head = f"{'Date':<8} {'Particulars':<26} {'Type':<12} {'Vch No':<14} {'Debit':>14} {'Credit':>14} {'Balance':>17}"
+    rule = "-" * len(table_head)
+
+    dates = days_to_dates(entries["Date"]).strftime("%d-%m-%y")
+    rows = [
+        f"{str(date):<8} {str(other)[:26]:<26} {str(vtype)[:12]:<12} {str(number)[:14]:<14} "
+        f"{_amount_text(dr):>14} {_amount_text(cr):>14} {_balance_text(balance):>17}"
+        for date, other, vtype, number, dr, cr, balance in zip(
+            dates, entries["Ledger"], entries["Type"], entries["VoucherNo"],
+            entries["DrAmt"].tolist(), entries["CrAmt"].tolist(), entries["Balance"].tolist())
+    ]
+    footer = [
+        rule,
+        f"{'Total':<63} {_amount_text(int(entries['DrAmt'].sum())):>14} {_amount_text(int(entries['CrAmt'].sum())):>14}",
+        "",
+        f"Closing Balance : Rs. {_balance_text(job['closing'])}",
+    ]
+    if not rows:
+        rows = ["No entries in this period."]
+
+    # table header repeated on every page
+    body_lines = LINES_PER_PAGE - len(header) - 2
+    pages = []
+    for i in range(0, len(rows), body_lines):
+        pages.append((header if not pages else [job["name"], ""]) + [table_head, rule] + rows[i:i + body_lines])
+    if len(pages[-1]) + len(footer) > LINES_PER_PAGE:
+        pages.append([job["name"], ""])
+    pages[-1] += footer
+    return pdf_document(pages)
+
+
+# --- XLSX ---
+
+def render_xlsx(job):
+    # write-only workbook: rows are streamed out instead of kept as cell objects
+    entries = job["entries"]
+    start, end = job["period"]
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet("Statement")
+    sheet.append(["Ledger", job["name"]])
+    sheet.append(["Period", f"{start:%d-%m-%Y} to {end:%d-%m-%Y}"])
+    sheet.append(["Opening Balance", _balance_text(job["opening"])])
+    sheet.append(["Closing Balance", _balance_text(job["closing"])])
+    sheet.append([])
+    sheet.append(["Date", "Particulars", "Type", "Vch No", "Debit", "Credit", "Balance", "Dr/Cr"])
+    dates = days_to_dates(entries["Date"]).to_pydatetime()
+    balance = entries["Balance"]
+    for row in zip(dates, entries["Ledger"].tolist(), entries["Type"].tolist(), entries["VoucherNo"].tolist(),
+                   (entries["DrAmt"] / 100).tolist(), (entries["CrAmt"] / 100).tolist(),
+                   (np.abs(balance) / 100).tolist(), np.where(balance < 0, "Dr", "Cr").tolist()):
+        sheet.append(row)
+    out = io.BytesIO()
+    workbook.save(out)
+    return out.getvalue()
+
+
+RENDERERS = {"PDF": (render_pdf, "pdf"), "XLSX": (render_xlsx, "xlsx")}
+
+
+def render_statement(job, formats):
+    # runs in a worker: one ledger -> [(file name, bytes), ...]
+    files = []
+    for fmt in formats:
+        render, extension = RENDERERS[fmt]
+        files.append((f"{job['stem']}.{extension}", render(job)))
+    return files
+
+
+def build_statement_zip(snap, names, from_date, to_date, formats=("PDF",), workers=None, progress=None):
+    # -> (zip bytes, stats). progress(done, total, elapsed_seconds) is called as statements finish.
+    names = list(dict.fromkeys(names))
+    formats = [fmt for fmt in formats if fmt in FORMATS]
+    workers = workers or STATEMENT_WORKERS
+    total = len(names)
+    started = time.monotonic()
+    out = io.BytesIO()
+    done = 0
+
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as archive:
+        def add(files):
+            nonlocal done
+            for filename, data in files:
+                archive.writestr(filename, data)
+            done += 1
+            if progress:
+                progress(done, total, time.monotonic() - started)
+
+        stems = file_stems(names)
+        jobs = (statement_job(snap, name, from_date, to_date, stems[name]) for name in names)
+        if workers <= 1 or total <= SERIAL_LIMIT:
+            for job in jobs:
+                add(render_statement(job, formats))
+        else:
+            # spawned workers: forking a process with live server threads is not safe
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=min(workers, total), mp_context=context) as pool:
+                pending = set()
+                for job in jobs:
+                    pending.add(pool.submit(render_statement, job, formats))
+                    if len(pending) >= workers * JOBS_PER_WORKER:
+                        finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in finished:
+                            add(future.result())
+                for future in wait(pending).done:
+                    add(future.result())
+
+    elapsed = time.monotonic() - started
+    stats = {
+        "statements": done,
+        "files": done * len(formats),
+        "seconds": elapsed,
+        "per_second": done / elapsed if elapsed else 0.0,
+        "bytes": out.tell(),
+    }
+    return out.getvalue(), stats
@@ -0,0 +1,771 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import requests
+
+try:
+    import fcntl
+except ImportError:
+    # no flock on Windows: every process refreshes for itself
+    fcntl = None
+
+from ledger_index import DailyTotals, DateIndex, LedgerIndex, MonthlyTotals, RunningBalances, SearchIndex
+from ledger_schema import NO_DAY, SCHEMA_VERSION, append_rows, apply_schema, to_day
+import tally_xml
+
+
+# -------------------------------
+# 📒 LEDGER SNAPSHOT SERVICE
+# -------------------------------
+# The Tally ledger and balance exports are checked on Google Drive once per
+# refresh interval (ETag / Last-Modified + content hash) and only re-parsed when
+# they changed. The parsed DataFrames are shared by every session / worker
+# thread of the process; pages only read them, never modify them.
+# tally:// URLs read the same exports straight from Tally's XML server (tally_xml).
+
+# Google Drive file IDs
+LEDGER_FILE_ID = '1Qt_dcHn8YNeVL6s7m7647YssIoukdNoB'
+BALANCE_FILE_ID = '1F39ERDJAiRTOYnNTnThtF-sIl_-zX3j5'
+
+# Direct download URLs (can be pointed somewhere else through the environment)
+LEDGER_CSV_URL = os.environ.get("LEDGER_CSV_URL", f"https://drive.google.com/uc?id={LEDGER_FILE_ID}")
+BALANCE_CSV_URL = os.environ.get("BALANCE_CSV_URL", f"https://drive.google.com/uc?id={BALANCE_FILE_ID}")
+
+# Seconds a snapshot is served before the files are checked again
+REFRESH_INTERVAL = int(os.environ.get("LEDGER_REFRESH_INTERVAL", "300"))
+FETCH_TIMEOUT = int(os.environ.get("LEDGER_FETCH_TIMEOUT", "60"))
+
+# Background refresh: a thread in the app process keeps the snapshot fresh, so
+# user requests never wait on Drive. Inside the warm-up window (before business
+# hours) it checks more often so the first partners of the day get fresh data.
+BACKGROUND_REFRESH = os.environ.get("LEDGER_BACKGROUND_REFRESH", "1") != "0"
+WARMUP_WINDOW = os.environ.get("LEDGER_WARMUP_WINDOW", "08:00-10:00")
+WARMUP_INTERVAL = int(os.environ.get("LEDGER_WARMUP_INTERVAL", "60"))
+
+# Typed Arrow copy of the last snapshot. A cold start loads it instead of
+# re-downloading / re-parsing, and when run.sh starts several Streamlit
+# processes they all memory-map the same files: one process (holding the
+# leader lock) downloads and publishes, the others follow.
+CACHE_DIR = os.environ.get("LEDGER_CACHE_DIR", ".ledger_cache")
+FOLLOW_INTERVAL = int(os.environ.get("LEDGER_FOLLOW_INTERVAL", "5"))
+
+# Rows per page offered by the ledger / daybook tables. Only the visible page
+# is materialised and sent to the browser; totals always cover the whole range.
+PAGE_SIZES = (50, 100, 200, 500)
+
+
+def write_shared_frame(frame, path):
+    # uncompressed Arrow IPC (Feather v2) so readers can map it without decoding; one
+    # record batch, since pandas has to copy a column that is split over several
+    tmp = path + ".tmp"
+    feather.write_feather(frame, tmp, compression="uncompressed", chunksize=max(len(frame), 1))
+    os.replace(tmp, path)
+
+
+def read_shared_frame(path):
+    # memory-mapped: column buffers stay in the shared OS page cache where pandas can use them as is
+    table = feather.read_table(path, memory_map=True)
+    return table.to_pandas(split_blocks=True)
+
+
+def write_shared_arrays(arrays, path):
+    # equal-length numpy columns in a single record batch, so each reads back as one buffer
+    table = pa.table(arrays)
+    tmp = path + ".tmp"
+    feather.write_feather(table, tmp, compression="uncompressed", chunksize=max(table.num_rows, 1))
+    os.replace(tmp, path)
+
+
+def read_shared_arrays(path):
+    # {column: numpy array} viewing the mapped file (read-only, no copy)
+    table = feather.read_table(path, memory_map=True)
+    arrays = {}
+    for name in table.column_names:
+        column = table.column(name)
+        arrays[name] = column.chunk(0).to_numpy(zero_copy_only=True) if column.num_chunks == 1 else column.to_numpy()
+    return arrays
+
+
+class SourceState:
+    # What we know about one remote file: HTTP validators + hash of the last parsed body
+    def __init__(self, url):
+        self.url = url
+        self.etag = None
+        self.last_modified = None
+        self.sha256 = None
+        self.size = 0
+        self.checked_at = None
+        self.changed_at = None
+
+    def to_dict(self):
+        return {
+            "url": self.url,
+            "etag": self.etag,
+            "last_modified": self.last_modified,
+            "sha256": self.sha256,
+            "size": self.size,
+            "checked_at": self.checked_at.isoformat() if self.checked_at else None,
+            "changed_at": self.changed_at.isoformat() if self.changed_at else None,
+        }
+
+    def load_dict(self, data):
+        self.etag = data.get("etag")
+        self.last_modified = data.get("last_modified")
+        self.sha256 = data.get("sha256")
+        self.size = data.get("size", 0)
+        self.checked_at = datetime.fromisoformat(data["checked_at"]) if data.get("checked_at") else None
+        self.changed_at = datetime.fromisoformat(data["changed_at"]) if data.get("changed_at") else None
+
+
+class FetchResult:
+    def __init__(self, content, etag, last_modified, sha256, frame=None):
+        self.content = content
+        self.etag = etag
+        self.last_modified = last_modified
+        self.sha256 = sha256
+        # already parsed rows for sources that are parsed while streaming (Tally XML)
+        self.frame = frame
+
+    def read_frame(self):
+        if self.frame is not None:
+            return self.frame
+        return pd.read_csv(io.BytesIO(self.content))
+
+
+def fetch_if_changed(state, timeout=FETCH_TIMEOUT):
+    # Returns None when the file has not changed since the state was last committed
+    if state.url.startswith("tally://"):
+        # Tally sends no validators: the export is hashed as it downloads and parsed only if it changed
+        frame, sha256 = tally_xml.fetch_report(state.url, timeout, known_sha256=state.sha256)
+        if frame is None:
+            return None
+        return FetchResult(None, None, None, sha256, frame=frame)
+    if state.url.startswith(("http://", "https://")):
+        headers = {}
+        if state.etag:
+            headers["If-None-Match"] = state.etag
+        if state.last_modified:
+            headers["If-Modified-Since"] = state.last_modified
+        response = requests.get(state.url, headers=headers, timeout=timeout)
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+        content = response.content
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+    else:
+        # local path, handy for running against a copied export
+        with open(state.url, "rb") as f:
+            content = f.read()
+        etag = last_modified = None
+
+    # Drive does not always send validators, so the content hash is the real check
+    sha256 = hashlib.sha256(content).hexdigest()
+    if sha256 == state.sha256:
+        return None
+    return FetchResult(content, etag, last_modified, sha256)
+
+
+def commit_fetch(state, result, checked_at):
+    state.checked_at = checked_at
+    if result is not None:
+        state.etag = result.etag
+        state.last_modified = result.last_modified
+        state.sha256 = result.sha256
+        state.size = len(result.content) if result.content is not None else 0
+        state.changed_at = checked_at
+
+
+def appended_tail(state, content):
+    # The new rows when `content` is the last committed file plus extra lines, else None
+    if not state.sha256 or len(content) <= state.size or content[state.size - 1:state.size] != b"\n":
+        return None
+    if hashlib.sha256(content[:state.size]).hexdigest() != state.sha256:
+        return None
+    # re-use the header line so the tail parses with the same column names
+    header = content[:content.index(b"\n") + 1]
+    return header + content[state.size:]
+
+
+def high_water_mark(ledger):
+    # (Date, VoucherNo) of the last voucher in the export
+    if ledger.empty:
+        return None
+    last = ledger.iloc[-1]
+    return last["Date"], last["VoucherNo"]
+
+
+def count_backdated(tail, mark):
+    # new vouchers dated before the previous export's last voucher
+    if mark is None or mark[0] == NO_DAY:
+        return 0
+    return int((tail["Date"] < mark[0]).sum())
+
+
+class LedgerSnapshot:
+    def __init__(self, ledger, balances, version, changed_at=None, index=None, by_date=None, daily=None, monthly=None,
+                 running_balances=None, partition_key=None):
+        self.ledger = ledger
+        self.balances = balances
+        self.version = version
+        # None for the whole company, else e.g. ("assigned_to", "ravi")
+        self.partition_key = partition_key
+        self.loaded_at = datetime.now()
+        self.changed_at = changed_at or self.loaded_at
+        self.index = index if index is not None else LedgerIndex.build(ledger)
+        self.by_date = by_date if by_date is not None else DateIndex.build(ledger)
+        self.daily = daily if daily is not None else DailyTotals.build(ledger)
+        self.monthly = monthly if monthly is not None else MonthlyTotals.build(ledger)
+        self.balance_map = dict(zip(balances["Ledger Name"], balances["BalancePaise"].tolist()))
+        self.running_balances = running_balances if running_balances is not None else RunningBalances.build(ledger, self.index, self.balance_map)
+        self.high_water_mark = high_water_mark(ledger)
+        self._search = None
+        self._search_lock = threading.Lock()
+        # partitions: the whole-company snapshot they view, and their ledgers' category codes
+        self._parent = None
+        self._codes = None
+
+    def extended(self, tail, balances, version, changed_at=None):
+        # New snapshot with `tail` appended; derived structures are updated, not rebuilt
+        offset = len(self.ledger)
+        ledger = append_rows("ledger", self.ledger, tail)
+        return LedgerSnapshot(
+            ledger, balances, version, changed_at,
+            index=self.index.extend(tail, offset),
+            by_date=self.by_date.extend(tail, offset),
+            daily=self.daily.extend(tail),
+            monthly=self.monthly.extend(tail),
+        )
+
+    def partition(self, names, key):
+        # Snapshot of just these ledgers, so a session working on one portfolio
+        # never scans the company's rows. It is a view: the ledger frame, the
+        # per-ledger blocks and the running balances are this snapshot's own
+        # (row positions stay company-wide); only the date order of its rows and
+        # its share of the daily / monthly totals are new, and those are small.
+        names = [name for name in dict.fromkeys(names) if name in self.index.blocks]
+        index = LedgerIndex({name: self.index.blocks[name] for name in names})
+        codes = np.flatnonzero(self.ledger["LedgerName"].cat.categories.isin(names))
+        in_part = np.isin(self.ledger["LedgerName"].cat.codes.to_numpy()[self.by_date.positions], codes)
+        part = LedgerSnapshot(
+            self.ledger,
+            self.balances[self.balances["Ledger Name"].isin(names)].reset_index(drop=True),
+            self.version, self.changed_at,
+            index=index,
+            by_date=DateIndex(self.by_date.positions[in_part], self.by_date.dates[in_part]),
+            daily=DailyTotals(self.daily.table[self.daily.table["LedgerName"].isin(names)].reset_index(drop=True)),
+            monthly=MonthlyTotals(self.monthly.table[self.monthly.table["LedgerName"].isin(names)].reset_index(drop=True)),
+            running_balances=RunningBalances(index, self.running_balances.running, self.running_balances.net),
+            partition_key=key,
+        )
+        part._parent = self._parent or self
+        part._codes = codes
+        return part
+
+    def build_search(self):
+        # The token index behind search(); the store builds it when the snapshot
+        # is published, so the first search of a version does not pay for it.
+        if self._parent is not None:
+            return self._parent.build_search()
+        if self._search is None:
+            with self._search_lock:
+                if self._search is None:
+                    self._search = SearchIndex.build(self.ledger)
+        return self._search
+
+    def search(self, query, limit=None):
+        # Row positions of vouchers matching `query`, in date order
+        if self._parent is not None:
+            # the company-wide index, narrowed to this partition's ledgers
+            positions = self._parent.search(query)
+            positions = positions[np.isin(self.ledger["LedgerName"].cat.codes.to_numpy()[positions], self._codes)]
+            return positions[:limit] if limit else positions
+        positions = self.build_search().search(query, len(self.ledger))
+        positions = positions[np.argsort(self.ledger["Date"].to_numpy()[positions], kind="stable")]
+        return positions[:limit] if limit else positions
+
+    def daybook_positions(self, from_date, to_date, types=None, ledgers=None):
+        # Row positions of the Daybook for a date range; only this slice is ever scanned
+        positions = self.by_date.between(from_date, to_date)
+        if types is not None:
+            positions = positions[self.ledger["Type"].take(positions).isin(list(types)).to_numpy()]
+        if ledgers is not None:
+            positions = positions[self.ledger["LedgerName"].take(positions).isin(list(ledgers)).to_numpy()]
+        return positions
+
+    def rows(self, positions, running_balance=False):
+        rows = self.ledger.iloc[positions]
+        if running_balance:
+            rows = rows.assign(Balance=self.running_balances.running[positions])
+        return rows
+
+    def closing_balance(self, name):
+        # Signed closing balance in paise (Cr positive, Dr negative), None when the ledger has no balance row
+        return self.balance_map.get(name)
+
+    def opening_closing(self, name, from_date, to_date):
+        # Running balance before from_date and at the end of to_date
+        return self.running_balances.opening_closing(name, from_date, to_date)
+
+    def ledger_names(self):
+        return self.index.names
+
+    def ledger_rows(self, name, from_date=None, to_date=None):
+        # One ledger's entries in a date range, via the per-ledger index
+        return self.ledger.iloc[self.index.positions(name, from_date, to_date)]
+
+    def first_on_or_after(self, positions, date):
+        # Offset within date-ordered `positions` of the first row dated >= date
+        dates = self.ledger["Date"].to_numpy()[positions]
+        return int(np.searchsorted(dates, to_day(date), side="left"))
+
+
+# --- derived structures in the shared cache ---
+# Besides the two frames, each version publishes the per-ledger index, the
+# date order, the running balances and the daily / monthly totals. A worker
+# that maps the cache views these columns instead of rebuilding a private copy
+# of every structure, so N workers hold roughly one copy of all of it.
+SHARED_PARTS = ["ledger", "balances", "index", "blocks", "running", "daily", "monthly"]
+
+
+def shared_parts(snapshot):
+    # file key -> (object whose identity means "unchanged since the last version", writer)
+    flat = {}
+
+    def index_arrays():
+        if not flat:
+            flat["positions"], flat["dates"], flat["bounds"] = snapshot.index.to_arrays()
+        return flat
+
+    def write_index(path):
+        arrays = index_arrays()
+        write_shared_arrays({
+            "IndexPositions": arrays["positions"],
+            "IndexDates": arrays["dates"],
+            "DatePositions": snapshot.by_date.positions.astype("int64", copy=False),
+            "DateDates": snapshot.by_date.dates,
+        }, path)
+
+    running = snapshot.running_balances
+    return {
+        "ledger": (snapshot.ledger, lambda path: write_shared_frame(snapshot.ledger, path)),
+        "balances": (snapshot.balances, lambda path: write_shared_frame(snapshot.balances, path)),
+        "index": (snapshot.index, write_index),
+        "blocks": (snapshot.index, lambda path: write_shared_frame(index_arrays()["bounds"], path)),
+        "running": (running, lambda path: write_shared_arrays({"Running": running.running, "Net": running.net}, path)),
+        "daily": (snapshot.daily, lambda path: write_shared_frame(snapshot.daily.table, path)),
+        "monthly": (snapshot.monthly, lambda path: write_shared_frame(snapshot.monthly.table, path)),
+    }
+
+
+def load_shared_snapshot(path_of, files, version, changed_at=None):
+    # LedgerSnapshot over the mapped files; built locally only for parts an older cache lacks
+    ledger = read_shared_frame(path_of(files["ledger"]))
+    balances = read_shared_frame(path_of(files["balances"]))
+    if not all(key in files for key in SHARED_PARTS):
+        return LedgerSnapshot(ledger, balances, version, changed_at=changed_at)
+    arrays = read_shared_arrays(path_of(files["index"]))
+    running = read_shared_arrays(path_of(files["running"]))
+    index = LedgerIndex.from_arrays(arrays["IndexPositions"], arrays["IndexDates"], read_shared_frame(path_of(files["blocks"])))
+    return LedgerSnapshot(
+        ledger, balances, version, changed_at=changed_at,
+        index=index,
+        by_date=DateIndex(arrays["DatePositions"], arrays["DateDates"]),
+        daily=DailyTotals(read_shared_frame(path_of(files["daily"]))),
+        monthly=MonthlyTotals(read_shared_frame(path_of(files["monthly"]))),
+        running_balances=RunningBalances(index, running["Running"], running["Net"]),
+    )
+
+
+class LedgerStore:
+    def __init__(self, ledger_url=LEDGER_CSV_URL, balance_url=BALANCE_CSV_URL, refresh_interval=REFRESH_INTERVAL, cache_dir=CACHE_DIR):
+        self.ledger_source = SourceState(ledger_url)
+        self.balance_source = SourceState(balance_url)
+        self.refresh_interval = refresh_interval
+        self.cache_dir = cache_dir
+        self.last_checked = None
+        self.last_ingest = None
+        self.parse_count = 0
+        self.refresh_count = 0
+        self.failure_count = 0
+        self.consecutive_failures = 0
+        self.last_error = None
+        self.cache_error = None
+        self.last_duration = None
+        self.scheduler = None
+        self._snapshot = None
+        self._fetched_at = 0.0
+        self._version = 0
+        self._files = None
+        self._meta_mtime = None
+        self._leader_file = None
+        self._lock = threading.Lock()
+        self._listeners = {"search": LedgerSnapshot.build_search}
+        if cache_dir:
+            self._load_cache()
+
+    # --- new-snapshot listeners ---
+    # Called (on the refreshing thread) with every new snapshot, so work derived
+    # from it (e.g. per-user partitions) is done at ingest, not on a page load.
+    # The store's own "search" listener, registered first, builds the search index.
+    # A listener added after a snapshot was already published (the store loads
+    # its cache when it is created) is called with that snapshot right away.
+    def add_listener(self, name, callback):
+        # registering the same name again replaces the callback (Streamlit reruns)
+        replaced = self._listeners.get(name)
+        self._listeners[name] = callback
+        snapshot = self._snapshot
+        if snapshot is not None and replaced is None:
+            self._notify(name, callback, snapshot)
+
+    def _notify(self, name, callback, snapshot):
+        try:
+            callback(snapshot)
+        except Exception as e:
+            self.last_error = f"{datetime.now():%d-%m-%y %H:%M:%S} listener {name}: {type(e).__name__}: {e}"
+
+    def _publish(self, snapshot):
+        previous, self._snapshot = self._snapshot, snapshot
+        if snapshot is previous:
+            return
+        for name, callback in list(self._listeners.items()):
+            self._notify(name, callback, snapshot)
+
+    # --- on-disk snapshot shared by worker processes ---
+    # Each version is written once as <part>-<v>.arrow (SHARED_PARTS) and
+    # published by atomically replacing meta.json, so a reader never sees a
+    # half-written version. Files of older versions are removed after the next
+    # publish; workers that still map them keep a valid mapping until they switch.
+    def _cache_path(self, name):
+        return os.path.join(self.cache_dir, name)
+
+    def _load_cache(self):
+        try:
+            meta_path = self._cache_path("meta.json")
+            meta_mtime = os.stat(meta_path).st_mtime_ns
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta.get("schema_version") != SCHEMA_VERSION:
+                return False
+            if meta["ledger"]["url"] != self.ledger_source.url or meta["balances"]["url"] != self.balance_source.url:
+                return False
+            files = meta["files"]
+            # the leader rewrites meta.json after every check; same version and
+            # files means nothing changed upstream, so keep the current snapshot
+            unchanged = self._snapshot is not None and meta.get("version", 1) == self._version and files == self._files
+            if not unchanged:
+                changed_at = max(filter(None, [
+                    datetime.fromisoformat(meta[key]["changed_at"]) if meta[key].get("changed_at") else None
+                    for key in ("ledger", "balances")
+                ]), default=None)
+                snapshot = load_shared_snapshot(self._cache_path, files, meta.get("version", 1), changed_at)
+        except (OSError, ValueError, KeyError, ImportError, pa.ArrowException):
+            return False
+
+        self.ledger_source.load_dict(meta["ledger"])
+        self.balance_source.load_dict(meta["balances"])
+        self.last_checked = self.ledger_source.checked_at
+        self._version = meta.get("version", 1)
+        self._files = files
+        self._meta_mtime = meta_mtime
+        if not unchanged:
+            self._publish(snapshot)
+        # not stale until refresh_interval after the check recorded on disk
+        if self.last_checked:
+            age = (datetime.now() - self.last_checked).total_seconds()
+            self._fetched_at = time.monotonic() - max(age, 0)
+        return True
+
+    def _save_cache(self, snapshot, previous):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            files = dict(self._files or {})
+            previous_parts = shared_parts(previous) if previous is not None else {}
+            for key, (source, write) in shared_parts(snapshot).items():
+                # a part carried over unchanged keeps its already published file
+                if key in files and key in previous_parts and source is previous_parts[key][0]:
+                    continue
+                files[key] = f"{key}-{snapshot.version}.arrow"
+                write(self._cache_path(files[key]))
+            old_files = self._files or {}
+            self._files = files
+            self._save_meta()
+            self._remove_stale_files(set(files.values()) | set(old_files.values()))
+        except (OSError, pa.ArrowException, ImportError) as e:
+            # the cache is an optimisation only (read-only disk, pyarrow missing, odd column
+            # types): keep serving from memory, but show why on the Logs page
+            self.cache_error = f"{datetime.now():%d-%m-%y %H:%M:%S} {type(e).__name__}: {e}"
+
+    def _save_meta(self):
+        meta = {
+            "schema_version": SCHEMA_VERSION,
+            "version": self._version,
+            "files": self._files,
+            "ledger": self.ledger_source.to_dict(),
+            "balances": self.balance_source.to_dict(),
+        }
+        tmp = self._cache_path("meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._cache_path("meta.json"))
+        self._meta_mtime = os.stat(self._cache_path("meta.json")).st_mtime_ns
+
+    def _remove_stale_files(self, keep):
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".arrow") and name not in keep:
+                try:
+                    os.remove(self._cache_path(name))
+                except OSError:
+                    pass
+
+    def is_leader(self):
+        # Only the process holding the lock on leader.lock downloads and publishes
+        if not self.cache_dir or fcntl is None:
+            return True
+        if self._leader_file is not None:
+            return True
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            lock_file = open(self._cache_path("leader.lock"), "w")
+        except OSError:
+            return True
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        # held for the life of the process; released by the OS if it dies
+        self._leader_file = lock_file
+        return True
+
+    def follow(self):
+        # Pick up a snapshot another worker published; cheap stat when nothing changed
+        try:
+            meta_mtime = os.stat(self._cache_path("meta.json")).st_mtime_ns
+        except OSError:
+            return False
+        if meta_mtime == self._meta_mtime:
+            return False
+        return self._load_cache()
+
+    def _download(self):
+        checked_at = datetime.now()
+        ledger_result = fetch_if_changed(self.ledger_source)
+        balance_result = fetch_if_changed(self.balance_source)
+        previous = self._snapshot
+
+        if previous is not None and ledger_result is None and balance_result is None:
+            # nothing changed upstream: no parsing, same snapshot
+            commit_fetch(self.ledger_source, None, checked_at)
+            commit_fetch(self.balance_source, None, checked_at)
+            self.last_checked = checked_at
+            if self.cache_dir and self.is_leader():
+                try:
+                    self._save_meta()
+                except OSError:
+                    pass
+            return previous
+
+        # parse only the file(s) that changed
+        started = time.perf_counter()
+        if balance_result is not None:
+            balances = apply_schema("balances", balance_result.read_frame())
+            self.parse_count += 1
+        else:
+            balances = previous.balances
+
+        self._version += 1
+        if ledger_result is None:
+            # balances only: the ledger and everything derived from it is reused as is
+            snapshot = LedgerSnapshot(previous.ledger, balances, self._version, checked_at,
+                                      index=previous.index, by_date=previous.by_date, daily=previous.daily,
+                                      monthly=previous.monthly)
+            ingest = {"mode": "balances", "rows": 0, "backdated": 0}
+        else:
+            tail = None
+            if previous is not None and ledger_result.content is not None:
+                tail = appended_tail(self.ledger_source, ledger_result.content)
+            if tail is not None:
+                # Tally appends new vouchers at the end: parse and merge just the new lines
+                tail_df = apply_schema("ledger", pd.read_csv(io.BytesIO(tail)))
+                snapshot = previous.extended(tail_df, balances, self._version, checked_at)
+                ingest = {"mode": "append", "rows": len(tail_df), "backdated": count_backdated(tail_df, previous.high_water_mark)}
+            else:
+                ledger = apply_schema("ledger", ledger_result.read_frame())
+                snapshot = LedgerSnapshot(ledger, balances, self._version, checked_at)
+                ingest = {"mode": "full", "rows": len(ledger), "backdated": 0}
+            self.parse_count += 1
+        ingest["seconds"] = round(time.perf_counter() - started, 3)
+        ingest["at"] = checked_at
+        self.last_ingest = ingest
+
+        # validators are committed only once parsing succeeded
+        commit_fetch(self.ledger_source, ledger_result, checked_at)
+        commit_fetch(self.balance_source, balance_result, checked_at)
+        self.last_checked = checked_at
+        if self.cache_dir and self.is_leader():
+            self._save_cache(snapshot, previous)
+        return snapshot
+
+    def _is_stale(self):
+        return time.monotonic() - self._fetched_at >= self.refresh_interval
+
+    def _reload(self):
+        started = time.perf_counter()
+        self.refresh_count += 1
+        try:
+            snapshot = self._download()
+        except Exception as e:
+            # keep serving the previous snapshot if Drive is unreachable or the file is broken
+            self.failure_count += 1
+            self.consecutive_failures += 1
+            self.last_error = f"{datetime.now():%d-%m-%y %H:%M:%S} {type(e).__name__}: {e}"
+            if self._snapshot is None:
+                raise
+        else:
+            # readers pick up the new snapshot with a single reference swap
+            self._publish(snapshot)
+            self.consecutive_failures = 0
+        finally:
+            self.last_duration = time.perf_counter() - started
+            self._fetched_at = time.monotonic()
+
+    def refresh(self, force=False):
+        with self._lock:
+            if self._snapshot is None and not self.is_leader():
+                # the leader may already have published a snapshot
+                self.follow()
+            if force or self._snapshot is None or self._is_stale():
+                self._reload()
+        return self._snapshot
+
+    def snapshot(self):
+        if self._snapshot is None:
+            return self.refresh()
+        if self.scheduler is not None and self.scheduler.is_running():
+            # the background thread refreshes; requests never touch the network
+            return self._snapshot
+        if self._is_stale() and self._lock.acquire(blocking=False):
+            # one thread downloads, the others keep reading the current snapshot
+            try:
+                if self._is_stale():
+                    if self.is_leader():
+                        self._reload()
+                    else:
+                        self.follow()
+                        self._fetched_at = time.monotonic()
+            finally:
+                self._lock.release()
+        return self._snapshot
+
+    def stats(self):
+        snap = self._snapshot
+        return {
+            "version": snap.version if snap else None,
+            "rows": len(snap.ledger) if snap else 0,
+            "loaded_at": snap.loaded_at if snap else None,
+            "changed_at": snap.changed_at if snap else None,
+            "age_seconds": (datetime.now() - snap.loaded_at).total_seconds() if snap else None,
+            "last_checked": self.last_checked,
+            "last_duration": self.last_duration,
+            "last_ingest": self.last_ingest,
+            "refresh_count": self.refresh_count,
+            "failure_count": self.failure_count,
+            "consecutive_failures": self.consecutive_failures,
+            "last_error": self.last_error,
+            "cache_error": self.cache_error,
+            "background": self.scheduler is not None and self.scheduler.is_running(),
+            "role": "leader" if self._leader_file is not None or fcntl is None or not self.cache_dir else "follower",
+        }
+
+
+def parse_window(window):
+    # "08:00-10:00" -> (time(8, 0), time(10, 0)); empty -> None
+    if not window:
+        return None
+    start, end = window.split("-")
+    return (datetime.strptime(start.strip(), "%H:%M").time(), datetime.strptime(end.strip(), "%H:%M").time())
+
+
+class RefreshScheduler:
+    def __init__(self, store, interval=REFRESH_INTERVAL, warmup_window=WARMUP_WINDOW, warmup_interval=WARMUP_INTERVAL):
+        self.store = store
+        self.interval = interval
+        self.warmup_window = parse_window(warmup_window)
+        self.warmup_interval = warmup_interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def in_warmup(self, now=None):
+        if self.warmup_window is None:
+            return False
+        now = (now or datetime.now()).time()
+        start, end = self.warmup_window
+        return start <= now < end
+
+    def next_delay(self):
+        if not self.store.is_leader():
+            return FOLLOW_INTERVAL
+        return self.warmup_interval if self.in_warmup() else self.interval
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if not self.is_running():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="ledger-refresh", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self.store.is_leader():
+                    self.store.refresh(force=True)
+                else:
+                    self.store.follow()
+            except Exception:
+                # already counted in the store stats, try again next round
+                pass
+            self._stop.wait(self.next_delay())
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store = LedgerStore()
+                if BACKGROUND_REFRESH:
+                    store.scheduler = RefreshScheduler(store)
+                    store.scheduler.start()
+                _store = store
+    return _store
+
+
+def get_snapshot():
+    return get_store().snapshot()
+
+
+def get_ledger():
+    return get_snapshot().ledger
+
+
+def get_balances():
+    return get_snapshot().balances
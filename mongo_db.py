@@ -0,0 +1,148 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+from pymongo.monitoring import ConnectionPoolListener
+
+
+# -------------------------------
+# 🍃 SHARED MONGODB CLIENT
+# -------------------------------
+# One MongoClient per process, created on first use and pinged straight away
+# so server discovery and the first pooled connections are done before a page
+# needs them. Streamlit reruns the app script on every interaction; the client
+# lives here, in an imported module, so reruns and sessions all share the same
+# connection pool instead of opening a new one each time.
+#
+#   db = mongo_db.get_db(uri, db_name)
+#   mongo_db.get_client().stats()   # pool counters for the Logs page
+
+MAX_POOL_SIZE = int(os.environ.get("MONGODB_MAX_POOL_SIZE", "20"))
+MIN_POOL_SIZE = int(os.environ.get("MONGODB_MIN_POOL_SIZE", "2"))
+# idle connections are closed after this long (Atlas drops them anyway)
+MAX_IDLE_TIME_MS = int(os.environ.get("MONGODB_MAX_IDLE_TIME_MS", "300000"))
+SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "10000"))
+CONNECT_TIMEOUT_MS = int(os.environ.get("MONGODB_CONNECT_TIMEOUT_MS", "10000"))
+SOCKET_TIMEOUT_MS = int(os.environ.get("MONGODB_SOCKET_TIMEOUT_MS", "30000"))
+# how long a request waits for a free pooled connection
+WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get("MONGODB_WAIT_QUEUE_TIMEOUT_MS", "10000"))
+
+
+class PoolStats(ConnectionPoolListener):
+    # Counts pool events; called by pymongo on its own threads
+    COUNTERS = ["created", "closed", "checked_out", "checked_in", "checkout_failed", "pool_cleared"]
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = dict.fromkeys(self.COUNTERS, 0)
+
+    def _add(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._add("pool_cleared")
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._add("created")
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._add("closed")
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._add("checkout_failed")
+
+    def connection_checked_out(self, event):
+        self._add("checked_out")
+
+    def connection_checked_in(self, event):
+        self._add("checked_in")
+
+    def snapshot(self):
+        with self._lock:
+            counts = dict(self.counts)
+        counts["open"] = counts["created"] - counts["closed"]
+        counts["in_use"] = counts["checked_out"] - counts["checked_in"]
+        return counts
+
+
+class MongoResource:
+    def __init__(self, uri):
+        self.pool_stats = PoolStats()
+        self.created_at = datetime.now()
+        self.warmup_seconds = None
+        self.last_error = None
+        self.client = MongoClient(
+            uri,
+            maxPoolSize=MAX_POOL_SIZE,
+            minPoolSize=MIN_POOL_SIZE,
+            maxIdleTimeMS=MAX_IDLE_TIME_MS,
+            serverSelectionTimeoutMS=SERVER_SELECTION_TIMEOUT_MS,
+            connectTimeoutMS=CONNECT_TIMEOUT_MS,
+            socketTimeoutMS=SOCKET_TIMEOUT_MS,
+            waitQueueTimeoutMS=WAIT_QUEUE_TIMEOUT_MS,
+            retryWrites=True,
+            retryReads=True,
+            appname="swiftcom-dms",
+            event_listeners=[self.pool_stats],
+        )
+
+    def warm(self):
+        # Server discovery + one round trip. A failure is recorded, not raised:
+        # the pages report their own errors when they query.
+        started = time.monotonic()
+        try:
+            self.client.admin.command("ping")
+            self.warmup_seconds = time.monotonic() - started
+        except PyMongoError as e:
+            self.last_error = f"{datetime.now():%d-%m-%y %H:%M:%S} {type(e).__name__}: {e}"
+
+    def stats(self):
+        return {
+            **self.pool_stats.snapshot(),
+            "max_pool_size": MAX_POOL_SIZE,
+            "min_pool_size": MIN_POOL_SIZE,
+            "created_at": self.created_at,
+            "warmup_seconds": self.warmup_seconds,
+            "last_error": self.last_error,
+        }
+
+
+_resource = None
+_resource_lock = threading.Lock()
+
+
+def get_client(uri=None):
+    # The process-wide resource; `uri` is only needed by the first call
+    global _resource
+    if _resource is None:
+        with _resource_lock:
+            if _resource is None:
+                if uri is None:
+                    raise RuntimeError("mongo_db.get_client() needs the MongoDB URI on first use")
+                resource = MongoResource(uri)
+                resource.warm()
+                _resource = resource
+    return _resource
+
+
+def get_db(uri, db_name):
+    return get_client(uri).client[db_name]
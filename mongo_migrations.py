@@ -0,0 +1,245 @@
+import base64
+import threading
+import time
+from datetime import datetime
+
+from pymongo import ASCENDING, DESCENDING, IndexModel, UpdateOne
+from pymongo.errors import DuplicateKeyError, OperationFailure, PyMongoError
+
+import photo_store
+
+
+# -------------------------------
+# 🗂️ INDEXES & MIGRATIONS
+# -------------------------------
+# Indexes (and data fixes) for the DMS collections, declared here and applied
+# as numbered migrations. Applied versions are recorded in the `_migrations` collection,
+# so each runs once per database; create_index is idempotent anyway, so two
+# processes starting together are harmless. A migration that fails (e.g. a
+# unique index over existing duplicates) is recorded with its error and is
+# retried on the next start; the ones after it still run, so a blocked index
+# does not hold back a data fix.
+#
+#   mongo_migrations.apply_once(db)      # at startup
+#   mongo_migrations.status(db)          # applied / pending / failed
+#   mongo_migrations.explain_hot_queries(db)   # plans of the app's queries
+
+MIGRATIONS_COLLECTION = "_migrations"
+
+
+DIST_IDS_VERSION = 4
+
+
+def canonical_dist_id(value):
+    # Dist login ids are stored as upper-case strings; all-digit ids without
+    # leading zeros, so "0123", "123", 123 and 123.0 are the same id
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    text = str(value).strip().upper()
+    return str(int(text)) if text.isascii() and text.isdigit() else text
+
+
+def normalize_dist_ids(db):
+    # bulk CSV uploads stored ids as strings, the Add form as whatever was typed, older code as ints
+    # missing / null / NaN ids are left alone rather than rewritten as "NONE" / "NAN"
+    updates = [
+        UpdateOne({"_id": doc["_id"]}, {"$set": {"id": canonical_dist_id(doc["id"])}})
+        for doc in db["Dist"].find({"id": {"$ne": None}}, {"id": 1})
+        if doc["id"] == doc["id"] and doc["id"] != canonical_dist_id(doc["id"])
+    ]
+    if updates:
+        db["Dist"].bulk_write(updates, ordered=False)
+
+
+def move_user_photos(db):
+    # base64 photos inside user documents -> GridFS original + thumbnail, by reference
+    files = db[f"{photo_store.BUCKET}.files"]
+    files.create_index([("metadata.sha256", ASCENDING), ("metadata.kind", ASCENDING)], name="photo_sha256_kind")
+    users = db["users"]
+    for doc in users.find({"image_b64": {"$exists": True}}, {"_id": 1}):
+        # one photo in memory at a time
+        image_b64 = (users.find_one({"_id": doc["_id"]}, {"image_b64": 1}) or {}).get("image_b64")
+        update = {"$unset": {"image_b64": ""}}
+        if image_b64:
+            try:
+                update["$set"] = {"photo": photo_store.save_photo(db, base64.b64decode(image_b64))}
+            except (OSError, ValueError):
+                # not a readable image: left in place rather than lost
+                continue
+        users.update_one({"_id": doc["_id"]}, update)
+
+
+MIGRATIONS = [
+    (1, "Lookup indexes for login, distributors and logs", {
+        "Dist": [
+            IndexModel([("id", ASCENDING)], name="dist_id"),
+            IndexModel([("name", ASCENDING)], name="dist_name"),
+            IndexModel([("brand", ASCENDING), ("location", ASCENDING)], name="dist_brand_location"),
+            IndexModel([("assigned_to", ASCENDING), ("brand", ASCENDING)], name="dist_assigned_brand"),
+        ],
+        "logs": [
+            IndexModel([("timestamp", DESCENDING)], name="logs_timestamp"),
+        ],
+        "devices": [
+            IndexModel([("type", ASCENDING), ("model", ASCENDING)], name="devices_type_model"),
+        ],
+    }),
+    (2, "Unique user names", {
+        "users": [IndexModel([("name", ASCENDING)], name="users_name_unique", unique=True)],
+    }),
+    (3, "Unique devices per brand / type / model", {
+        "devices": [
+            IndexModel([("brand", ASCENDING), ("type", ASCENDING), ("model", ASCENDING)],
+                       name="devices_brand_type_model_unique", unique=True),
+        ],
+    }),
+    (DIST_IDS_VERSION, "Distributor ids as canonical strings", normalize_dist_ids),
+    (5, "User photos to GridFS with thumbnails", move_user_photos),
+]
+
+_applied = False
+_apply_lock = threading.Lock()
+last_run = {"at": None, "applied": [], "done": set(), "error": None}
+
+
+def _duplicates(collection, keys):
+    # groups of documents that would break a unique index on `keys`
+    group = {key: f"${key}" for key, _ in keys}
+    pipeline = [
+        {"$group": {"_id": group, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$limit": 5},
+    ]
+    return list(collection.aggregate(pipeline))
+
+
+def apply_migration(db, version, description, step):
+    # `step` is {collection: [IndexModel, ...]} or a function of the database
+    indexes = {} if callable(step) else step
+    if callable(step):
+        step(db)
+    for name, models in indexes.items():
+        collection = db[name]
+        for model in models:
+            spec = model.document
+            if spec.get("unique"):
+                duplicates = _duplicates(collection, spec["key"].items())
+                if duplicates:
+                    sample = ", ".join(str(dup["_id"]) for dup in duplicates)
+                    raise ValueError(f"{name}.{spec['name']}: duplicate documents, e.g. {sample}")
+        collection.create_indexes(models)
+    try:
+        db[MIGRATIONS_COLLECTION].insert_one({"_id": version, "description": description, "applied_at": datetime.now()})
+    except DuplicateKeyError:
+        # applied by another process at the same time
+        pass
+
+
+def migrate(db):
+    # Apply pending migrations in order; returns the versions applied now.
+    # A failed one stays pending and the rest still run.
+    done = {doc["_id"] for doc in db[MIGRATIONS_COLLECTION].find({}, {"_id": 1})}
+    applied = []
+    errors = []
+    for version, description, step in MIGRATIONS:
+        if version in done:
+            continue
+        try:
+            apply_migration(db, version, description, step)
+        except (PyMongoError, ValueError) as e:
+            errors.append(f"migration {version}: {e}")
+            continue
+        applied.append(version)
+    last_run["at"] = datetime.now()
+    last_run["applied"] = applied
+    last_run["done"] = done | set(applied)
+    last_run["error"] = f"{datetime.now():%d-%m-%y %H:%M:%S} " + "; ".join(errors) if errors else None
+    return applied
+
+
+def is_applied(version):
+    # as of this process's startup run (apply_once)
+    return version in last_run["done"]
+
+
+def apply_once(db):
+    # Once per process (Streamlit reruns the app script on every interaction)
+    global _applied
+    if not _applied:
+        with _apply_lock:
+            if not _applied:
+                try:
+                    migrate(db)
+                except PyMongoError as e:
+                    last_run["error"] = f"{datetime.now():%d-%m-%y %H:%M:%S} {type(e).__name__}: {e}"
+                _applied = True
+
+
+def status(db):
+    # One row per declared migration
+    applied = {doc["_id"]: doc for doc in db[MIGRATIONS_COLLECTION].find()}
+    return [
+        {
+            "Version": version,
+            "Migration": description,
+            "Changes": step.__name__ if callable(step) else ", ".join(model.document["name"] for models in step.values() for model in models),
+            "Applied": applied[version]["applied_at"].strftime("%d-%m-%y %H:%M:%S") if version in applied else "pending",
+        }
+        for version, description, step in MIGRATIONS
+    ]
+
+
+# --- query plans ---
+# The app's hot queries with placeholder values; explain() shows whether each
+# one is served by an index or falls back to a collection scan.
+
+HOT_QUERIES = [
+    ("Login (user)", "users", {"name": "", "pass": ""}, None),
+    ("Login (distributor)", "Dist", {"id": "", "pwd": ""}, None),
+    ("Distributor by name", "Dist", {"name": ""}, None),
+    ("Distributors by brand / location", "Dist", {"brand": "", "location": ""}, None),
+    ("Distributors by assignee", "Dist", {"assigned_to": "", "brand": ""}, None),
+    ("Distributor names (sorted)", "Dist", {}, [("name", ASCENDING)]),
+    ("Latest logs", "logs", {}, [("timestamp", DESCENDING)]),
+    ("Device by brand / type / model", "devices", {"brand": "", "type": "", "model": ""}, None),
+    ("Devices by type", "devices", {"type": ""}, None),
+]
+
+
+def _plan_stages(plan):
+    # every "stage" in a (possibly nested) explain plan
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"], plan.get("indexName")
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _plan_stages(value)
+
+
+def explain_hot_queries(db):
+    rows = []
+    for label, name, query, sort in HOT_QUERIES:
+        cursor = db[name].find(query).limit(10)
+        if sort:
+            cursor = cursor.sort(sort)
+        started = time.monotonic()
+        try:
+            explain = cursor.explain()
+        except OperationFailure as e:
+            rows.append({"Query": label, "Collection": name, "Plan": f"error: {e}", "Index": "", "Scan": None})
+            continue
+        stages = list(_plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {})))
+        execution = explain.get("executionStats", {})
+        rows.append({
+            "Query": label,
+            "Collection": name,
+            "Plan": " > ".join(stage for stage, _ in stages),
+            "Index": ", ".join(index for _, index in stages if index),
+            "Scan": any(stage == "COLLSCAN" for stage, _ in stages),
+            "Docs examined": execution.get("totalDocsExamined"),
+            "Keys examined": execution.get("totalKeysExamined"),
+            "ms": round((time.monotonic() - started) * 1000, 1),
+        })
+    return rows
@@ -0,0 +1,117 @@
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+import gridfs
+from gridfs.errors import NoFile
+from PIL import Image, ImageOps
+
+
+# -------------------------------
+# 🖼️ USER PHOTOS (GridFS)
+# -------------------------------
+# Photos live in GridFS (bucket "user_photos"), not inside the user documents.
+# An upload is stored once as sent, plus a small JPEG thumbnail made at upload
+# time; both are keyed by the SHA-256 of the uploaded bytes, so the same
+# picture uploaded twice is stored once. The user document only keeps a
+# reference:
+#
+#   "photo": {"sha256": ..., "original_id": ObjectId, "thumb_id": ObjectId,
+#             "width": 1200, "height": 900, "content_type": "image/png"}
+#
+# Pages show the thumbnail. Its encoded bytes are cached by hash and handed to
+# st.image as they are, so a photo is never decoded again after the upload.
+
+BUCKET = "user_photos"
+THUMB_SIZE = (160, 160)
+THUMB_QUALITY = 85
+THUMB_CACHE_SIZE = 256
+
+_thumbs = OrderedDict()
+_thumbs_lock = threading.Lock()
+
+
+def _bucket(db):
+    return gridfs.GridFSBucket(db, bucket_name=BUCKET)
+
+
+def make_thumbnail(image):
+    thumb = ImageOps.exif_transpose(image)
+    thumb.thumbnail(THUMB_SIZE)
+    if thumb.mode != "RGB":
+        # JPEG has no alpha: flatten onto white
+        background = Image.new("RGB", thumb.size, "white")
+        background.paste(thumb, mask=thumb.convert("RGBA").getchannel("A"))
+        thumb = background
+    out = io.BytesIO()
+    thumb.save(out, format="JPEG", quality=THUMB_QUALITY, optimize=True)
+    return out.getvalue()
+
+
+def save_photo(db, data):
+    # Upload bytes (or a file-like) -> reference dict for the user document
+    if hasattr(data, "getvalue"):
+        data = data.getvalue()
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    sha256 = hashlib.sha256(data).hexdigest()
+    ref = {
+        "sha256": sha256,
+        "width": image.width,
+        "height": image.height,
+        "content_type": Image.MIME.get(image.format, "application/octet-stream"),
+    }
+
+    files = db[f"{BUCKET}.files"]
+    stored = {doc["metadata"]["kind"]: doc["_id"] for doc in files.find({"metadata.sha256": sha256}, {"metadata.kind": 1})}
+    bucket = _bucket(db)
+    if "original" not in stored:
+        stored["original"] = bucket.upload_from_stream(
+            f"{sha256}", data, metadata={"sha256": sha256, "kind": "original", "content_type": ref["content_type"]})
+    if "thumb" not in stored:
+        stored["thumb"] = bucket.upload_from_stream(
+            f"{sha256}.thumb.jpg", make_thumbnail(image), metadata={"sha256": sha256, "kind": "thumb", "content_type": "image/jpeg"})
+    ref["original_id"] = stored["original"]
+    ref["thumb_id"] = stored["thumb"]
+    return ref
+
+
+def thumbnail(db, ref):
+    # JPEG bytes of the thumbnail, cached by content hash
+    sha256 = ref["sha256"]
+    with _thumbs_lock:
+        if sha256 in _thumbs:
+            _thumbs.move_to_end(sha256)
+            return _thumbs[sha256]
+    try:
+        data = _bucket(db).open_download_stream(ref["thumb_id"]).read()
+    except NoFile:
+        return None
+    with _thumbs_lock:
+        _thumbs[sha256] = data
+        while len(_thumbs) > THUMB_CACHE_SIZE:
+            _thumbs.popitem(last=False)
+    return data
+
+
+def original(db, ref):
+    # the photo as uploaded
+    try:
+        return _bucket(db).open_download_stream(ref["original_id"]).read()
+    except NoFile:
+        return None
+
+
+def release_photo(db, ref, users="users"):
+    # Delete a photo's files once no user document references its hash
+    if not ref or db[users].count_documents({"photo.sha256": ref["sha256"]}, limit=1):
+        return
+    bucket = _bucket(db)
+    for doc in db[f"{BUCKET}.files"].find({"metadata.sha256": ref["sha256"]}, {"_id": 1}):
+        try:
+            bucket.delete(doc["_id"])
+        except NoFile:
+            pass
+    with _thumbs_lock:
+        _thumbs.pop(ref["sha256"], None)
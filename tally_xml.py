@@ -0,0 +1,249 @@
+import hashlib
+import os
+import re
+import tempfile
+import xml.etree.ElementTree as ET
+from datetime import date
+from urllib.parse import urlsplit
+
+import pandas as pd
+import requests
+
+
+# -------------------------------
+# 🧾 TALLY XML EXPORTS
+# -------------------------------
+# Pulls the Day Book and the ledger closing balances straight from Tally's XML
+# server (port 9000, see example/tally.py) instead of the CSV on Drive. The
+# ledger_store treats these URLs like any other source:
+#
+#   LEDGER_CSV_URL=tally://localhost:9000/daybook
+#   BALANCE_CSV_URL=tally://localhost:9000/balances
+#
+# A response is spooled to a temporary file while it is hashed, and only
+# parsed when the hash differs from the last export's, so an unchanged export
+# costs a download but no parse. Parsing streams from that file: each voucher /
+# ledger element is turned into a row and dropped from the tree once it has
+# been read, so memory stays bounded by one record no matter how long the
+# export is.
+
+TALLY_COMPANY = os.environ.get("TALLY_COMPANY", "")
+# Day Book start (YYYYMMDD); defaults to the start of the financial year
+TALLY_FROM_DATE = os.environ.get("TALLY_FROM_DATE", "")
+CHUNK_SIZE = 64 * 1024
+# parsed rows are moved from Python lists into a DataFrame every this many rows
+ROWS_PER_FRAME = 50_000
+
+DAYBOOK_COLUMNS = ["Date", "LedgerName", "Ledger", "Type", "VoucherNo", "DrAmt", "CrAmt"]
+BALANCE_COLUMNS = ["Ledger Name", "Closing Balance"]
+
+
+def financial_year_start(today=None):
+    today = today or date.today()
+    year = today.year if today.month >= 4 else today.year - 1
+    return date(year, 4, 1)
+
+
+def _static_variables(extra=""):
+    company = f"<SVCURRENTCOMPANY>{TALLY_COMPANY}</SVCURRENTCOMPANY>" if TALLY_COMPANY else ""
+    return f"<STATICVARIABLES><SVEXPORTFORMAT>$$SysName:XML</SVEXPORTFORMAT>{company}{extra}</STATICVARIABLES>"
+
+
+def daybook_request(from_date=None, to_date=None):
+    from_date = from_date or TALLY_FROM_DATE or financial_year_start().strftime("%Y%m%d")
+    to_date = to_date or date.today().strftime("%Y%m%d")
+    dates = f"<SVFROMDATE>{from_date}</SVFROMDATE><SVTODATE>{to_date}</SVTODATE>"
+    return (
+        "<ENVELOPE><HEADER><TALLYREQUEST>Export Data</TALLYREQUEST></HEADER>"
+        "<BODY><EXPORTDATA><REQUESTDESC><REPORTNAME>Day Book</REPORTNAME>"
+        f"{_static_variables(dates)}"
+        "</REQUESTDESC></EXPORTDATA></BODY></ENVELOPE>"
+    )
+
+
+def balances_request():
+    return (
+        "<ENVELOPE><HEADER><VERSION>1</VERSION><TALLYREQUEST>Export</TALLYREQUEST>"
+        "<TYPE>Collection</TYPE><ID>LedgerBalances</ID></HEADER>"
+        f"<BODY><DESC>{_static_variables()}"
+        "<TDL><TDLMESSAGE><COLLECTION NAME=\"LedgerBalances\"><TYPE>Ledger</TYPE>"
+        "<FETCH>Name, ClosingBalance</FETCH></COLLECTION></TDLMESSAGE></TDL>"
+        "</DESC></BODY></ENVELOPE>"
+    )
+
+
+# -------------------------------
+# Streaming input
+# -------------------------------
+# Tally writes control characters (raw or as &#4; style references) into names,
+# which XML does not allow. They are dropped on the way into the parser.
+
+_BAD_BYTES = re.compile(rb"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_BAD_REFS = re.compile(rb"&#(?:x0*[0-8bcefBCEF]|x0*1[0-9a-fA-F]|0*(?:[0-8]|1[124-9]|2[0-9]|3[01]));")
+
+
+class CleanStream:
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._held = b""
+        self._done = False
+
+    def read(self, size=-1):
+        # returns b"" only at the end of the stream, as iterparse expects
+        while not self._done:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self._done = True
+                data, self._held = self._held, b""
+            else:
+                if not chunk:
+                    continue
+                data = self._held + chunk
+                # keep a possibly cut "&#..;" reference for the next chunk
+                cut = data.rfind(b"&")
+                if cut >= 0 and b";" not in data[cut:]:
+                    data, self._held = data[:cut], data[cut:]
+                else:
+                    self._held = b""
+            data = _BAD_REFS.sub(b"", _BAD_BYTES.sub(b"", data))
+            if data:
+                return data
+        return b""
+
+
+def iter_records(stream, tag):
+    # Yield each complete <tag> element, then detach it (and anything read
+    # between records) so the tree never holds more than the current record
+    stack = []
+    open_records = 0
+    for event, elem in ET.iterparse(stream, events=("start", "end")):
+        if event == "start":
+            stack.append(elem)
+            if elem.tag == tag:
+                open_records += 1
+            continue
+        stack.pop()
+        if elem.tag == tag:
+            open_records -= 1
+            yield elem
+        if open_records == 0 and stack:
+            stack[-1].remove(elem)
+
+
+def _text(elem, tag):
+    value = elem.findtext(tag)
+    return value.strip() if value else ""
+
+
+def _amount(text):
+    try:
+        return float(text.replace(",", ""))
+    except ValueError:
+        return 0.0
+
+
+class FrameBuilder:
+    # Collects rows column-wise and turns them into DataFrame pieces as it goes
+    def __init__(self, columns, numeric=()):
+        self.columns = columns
+        self.numeric = numeric
+        self.frames = []
+        self._reset()
+
+    def _reset(self):
+        self.values = {col: [] for col in self.columns}
+
+    def flush(self):
+        if self.values[self.columns[0]]:
+            frame = pd.DataFrame(self.values, columns=self.columns)
+            for col in self.numeric:
+                frame[col] = frame[col].astype("float64")
+            self.frames.append(frame)
+            self._reset()
+
+    def check(self):
+        if len(self.values[self.columns[0]]) >= ROWS_PER_FRAME:
+            self.flush()
+
+    def frame(self):
+        self.flush()
+        if not self.frames:
+            return pd.DataFrame(columns=self.columns)
+        return pd.concat(self.frames, ignore_index=True)
+
+
+def parse_daybook(stream):
+    # One row per ledger entry of every voucher. Tally amounts are negative for
+    # Dr and positive for Cr; "Ledger" is the other side of the voucher.
+    builder = FrameBuilder(DAYBOOK_COLUMNS, numeric=("DrAmt", "CrAmt"))
+    columns = builder.values
+    for voucher in iter_records(stream, "VOUCHER"):
+        raw_date = _text(voucher, "DATE")
+        voucher_date = f"{raw_date[:4]}-{raw_date[4:6]}-{raw_date[6:8]}" if len(raw_date) == 8 else raw_date
+        voucher_type = _text(voucher, "VOUCHERTYPENAME") or voucher.get("VCHTYPE", "")
+        voucher_no = _text(voucher, "VOUCHERNUMBER")
+        entries = [
+            (_text(entry, "LEDGERNAME"), _amount(_text(entry, "AMOUNT")))
+            for entry in voucher
+            if entry.tag.endswith("LEDGERENTRIES.LIST") and _text(entry, "LEDGERNAME")
+        ]
+        for name, amount in entries:
+            other = next((n for n, _ in entries if n != name), "")
+            columns["Date"].append(voucher_date)
+            columns["LedgerName"].append(name)
+            columns["Ledger"].append(other)
+            columns["Type"].append(voucher_type)
+            columns["VoucherNo"].append(voucher_no)
+            columns["DrAmt"].append(-amount if amount < 0 else None)
+            columns["CrAmt"].append(amount if amount > 0 else None)
+        builder.check()
+        columns = builder.values
+    return builder.frame()
+
+
+def parse_balances(stream):
+    # Closing balances stay signed numbers (Dr negative), as ledger_schema expects
+    builder = FrameBuilder(BALANCE_COLUMNS)
+    for ledger in iter_records(stream, "LEDGER"):
+        name = ledger.get("NAME") or _text(ledger, "NAME.LIST/NAME") or _text(ledger, "NAME")
+        if not name:
+            continue
+        builder.values["Ledger Name"].append(name)
+        builder.values["Closing Balance"].append(_text(ledger, "CLOSINGBALANCE") or "0")
+        builder.check()
+    return builder.frame()
+
+
+REPORTS = {
+    "daybook": (daybook_request, parse_daybook),
+    "balances": (balances_request, parse_balances),
+}
+
+
+def fetch_report(url, timeout=60, known_sha256=None):
+    # tally://host:port/<report>  ->  (raw DataFrame, sha256 of the response);
+    # the frame is None when the response hashes to known_sha256
+    parts = urlsplit(url)
+    report = parts.path.strip("/")
+    if report not in REPORTS:
+        raise ValueError(f"Unknown Tally report '{report}' in {url}")
+    build_request, parse = REPORTS[report]
+
+    response = requests.post(
+        f"http://{parts.netloc}",
+        data=build_request().encode("utf-8"),
+        headers={"Content-Type": "text/xml"},
+        stream=True,
+        timeout=timeout,
+    )
+    response.raise_for_status()
+    with response, tempfile.TemporaryFile() as spool:
+        sha256 = hashlib.sha256()
+        for chunk in response.iter_content(CHUNK_SIZE):
+            sha256.update(chunk)
+            spool.write(chunk)
+        if sha256.hexdigest() == known_sha256:
+            return None, known_sha256
+        spool.seek(0)
+        frame = parse(CleanStream(iter(lambda: spool.read(CHUNK_SIZE), b"")))
+    return frame, sha256.hexdigest()
@@ -0,0 +1,171 @@
+import copy
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+# the app's modules live at the top of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fake_drive  # noqa: E402
+from ledger_schema import apply_schema  # noqa: E402
+from ledger_store import LedgerSnapshot  # noqa: E402
+
+LEDGER_COLUMNS = ["Date", "LedgerName", "Ledger", "Type", "VoucherNo", "DrAmt", "CrAmt"]
+BALANCE_COLUMNS = ["Ledger Name", "Closing Balance"]
+
+
+def make_snapshot(ledger_rows, balance_rows, version=1):
+    # LedgerSnapshot from plain rows, typed the way ingest types them
+    ledger = apply_schema("ledger", pd.DataFrame(ledger_rows, columns=LEDGER_COLUMNS))
+    balances = apply_schema("balances", pd.DataFrame(balance_rows, columns=BALANCE_COLUMNS))
+    return LedgerSnapshot(ledger, balances, version)
+
+
+def daybook_rows(n, start="2025-04-01", days=90, seed=0, names=("DIST A", "DIST B", "DIST C", "DIST D")):
+    # n Day Book rows in date order, like a Tally CSV export
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp(start) + pd.to_timedelta(np.sort(rng.integers(0, days, n)), unit="D")
+    rows = []
+    for i, day in enumerate(dates):
+        sale = rng.random() < 0.6
+        amount = round(float(rng.integers(100, 500_000)) / 100, 2)
+        rows.append([
+            day.strftime("%Y-%m-%d"),
+            names[rng.integers(len(names))],
+            "Sales" if sale else "Bank",
+            "Sales" if sale else "Receipt",
+            f"{'S' if sale else 'R'}/{seed}/{i}",
+            amount if sale else None,
+            None if sale else amount,
+        ])
+    return rows
+
+
+def write_csv(path, rows, columns, mode="w"):
+    pd.DataFrame(rows, columns=columns).to_csv(path, index=False, header=mode == "w", mode=mode, lineterminator="\n")
+
+
+@pytest.fixture
+def drive(tmp_path):
+    # fake_drive serving ledger.csv / balance.csv from tmp_path -> (ledger path, balance path, base url, server)
+    ledger_path = tmp_path / "ledger.csv"
+    balance_path = tmp_path / "balance.csv"
+    write_csv(ledger_path, daybook_rows(300), LEDGER_COLUMNS)
+    write_csv(balance_path, [["DIST A", "1,000.00 Dr"], ["DIST B", "250.50 Cr"], ["DIST C", "0"]], BALANCE_COLUMNS)
+    server, base_url = fake_drive.serve([str(ledger_path), str(balance_path)])
+    yield ledger_path, balance_path, base_url, server
+    server.shutdown()
+    server.server_close()
+
+
+# --- in-memory MongoDB stand-in ---
+# Just the pymongo calls the DMS helper modules make: equality filters on
+# (dotted) fields plus $exists / $ne / $nin, and inclusion or exclusion projections.
+
+_MISSING = object()
+
+
+def _get(doc, path):
+    for key in path.split("."):
+        if not isinstance(doc, dict) or key not in doc:
+            return _MISSING
+        doc = doc[key]
+    return doc
+
+
+def _matches(doc, query):
+    for path, cond in query.items():
+        value = _get(doc, path)
+        if isinstance(cond, dict) and any(key.startswith("$") for key in cond):
+            for op, arg in cond.items():
+                if op == "$exists" and (value is not _MISSING) != arg:
+                    return False
+                if op == "$ne" and (None if value is _MISSING else value) == arg:
+                    return False
+                if op == "$nin" and (None if value is _MISSING else value) in arg:
+                    return False
+        elif value != cond:
+            return False
+    return True
+
+
+def _project(doc, projection):
+    if not projection:
+        return copy.deepcopy(doc)
+    include = [path.split(".")[0] for path, on in projection.items() if on and path != "_id"]
+    if include:
+        out = {key: copy.deepcopy(doc[key]) for key in include if key in doc}
+        if projection.get("_id", 1) and "_id" in doc:
+            out["_id"] = doc["_id"]
+        return out
+    return {key: copy.deepcopy(value) for key, value in doc.items() if projection.get(key, 1)}
+
+
+class FakeCursor(list):
+    def sort(self, key, direction=1):
+        super().sort(key=lambda doc: doc.get(key), reverse=direction < 0)
+        return self
+
+
+class FakeCollection:
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+        self.docs = []
+        self.finds = 0
+
+    def find(self, query=None, projection=None):
+        self.finds += 1
+        return FakeCursor(_project(doc, projection) for doc in self.docs if _matches(doc, query or {}))
+
+    def find_one(self, query=None, projection=None):
+        found = self.find(query, projection)
+        return found[0] if found else None
+
+    def count_documents(self, query, limit=0):
+        count = sum(1 for doc in self.docs if _matches(doc, query))
+        return min(count, limit) if limit else count
+
+    def insert_one(self, doc):
+        doc = dict(doc)
+        doc.setdefault("_id", len(self.docs) + 1)
+        if any(other["_id"] == doc["_id"] for other in self.docs):
+            raise DuplicateKeyError(f"duplicate _id {doc['_id']}")
+        self.docs.append(doc)
+
+    def create_index(self, keys, **kwargs):
+        return kwargs.get("name")
+
+    def update_one(self, query, update):
+        for doc in self.docs:
+            if _matches(doc, query):
+                doc.update(update.get("$set", {}))
+                for key in update.get("$unset", {}):
+                    doc.pop(key, None)
+                return
+
+    def bulk_write(self, requests, ordered=True):
+        # UpdateOne only
+        for request in requests:
+            self.update_one(request._filter, request._doc)
+
+    def delete_one(self, query):
+        for doc in self.docs:
+            if _matches(doc, query):
+                self.docs.remove(doc)
+                return
+
+
+class FakeDatabase(dict):
+    def __missing__(self, name):
+        self[name] = FakeCollection(self, name)
+        return self[name]
+
+
+@pytest.fixture
+def mongo():
+    return FakeDatabase()
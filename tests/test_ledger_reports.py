@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+
+import ledger_reports
+from conftest import make_snapshot
+
+
+def test_reconcile_matches_ledger_and_balance_file():
+    snap = make_snapshot(
+        [
+            ["2025-04-01", "DIST A", "Sales", "Sales", "S/1", 1000.00, 0],
+            ["2025-04-02", "DIST A", "Bank", "Receipt", "R/1", 0, 400.00],
+            ["2025-04-03", "DIST B", "Sales", "Sales", "S/2", 250.00, 0],
+        ],
+        [
+            ["DIST A", "600.00 Dr"],
+            ["DIST B", "200.00 Dr"],
+            ["DIST C", "75.00 Cr"],
+        ],
+    )
+    table = ledger_reports.reconcile(snap).set_index("Ledger Name")
+    assert table.loc["DIST A", "Status"] == "OK"
+    assert table.loc["DIST B", "Status"] == "Balance differs"
+    assert table.loc["DIST B", "Difference"] == 5000
+    assert table.loc["DIST C", "Status"] == "No vouchers"
+
+
+def test_reconcile_without_vouchers():
+    # header-only Day Book, e.g. at the start of a financial year
+    snap = make_snapshot([], [["DIST A", "600.00 Dr"], ["DIST B", "0.00 Cr"]])
+    table = ledger_reports.reconcile(snap)
+    assert table["Ledger Name"].tolist() == ["DIST A"]
+    assert table["Status"].tolist() == ["No vouchers"]
+    assert table["Closing Balance"].tolist() == [-60000]
+    assert table["Ledger Name"].dtype.kind != "f"
+    assert str(table["Vouchers"].dtype) == "int64"
+
+    _, mismatches, summary = ledger_reports.reconciliation(snap)
+    assert len(mismatches) == 1
+    assert summary.set_index("Status").loc["No vouchers", "Ledgers"] == 1
+
+
+def ageing_of(snap, as_of):
+    table = ledger_reports.compute_ageing(snap, as_of).set_index("Ledger Name")
+    return {name: row[ledger_reports.AGEING_BUCKETS].tolist() for name, row in table.iterrows()}
+
+
+def test_ageing_matches_credits_to_the_oldest_debits():
+    snap = make_snapshot(
+        [
+            # partly settled: the 100 from March is paid, 40 of April's 100 as well
+            ["2025-03-01", "PARTIAL", "Sales", "Sales", "S/1", 100.00, None],
+            ["2025-04-10", "PARTIAL", "Sales", "Sales", "S/2", 100.00, None],
+            ["2025-05-01", "PARTIAL", "Bank", "Receipt", "R/1", None, 140.00],
+            ["2025-05-20", "PARTIAL", "Sales", "Sales", "S/3", 30.00, None],
+            # overpaid: a Cr balance, nothing outstanding
+            ["2025-04-01", "OVERPAID", "Sales", "Sales", "S/4", 50.00, None],
+            ["2025-04-15", "OVERPAID", "Bank", "Receipt", "R/2", None, 80.00],
+            # opened in credit: the advance settles the first debits
+            ["2025-04-01", "ADVANCE", "Sales", "Sales", "S/5", 70.00, None],
+            ["2025-05-25", "ADVANCE", "Sales", "Sales", "S/6", 60.00, None],
+        ],
+        [
+            ["PARTIAL", "90.00 Dr"],
+            ["OVERPAID", "30.00 Cr"],
+            # opening 100 Cr, less 130 of sales
+            ["ADVANCE", "30.00 Dr"],
+            # no vouchers in the export at all: all of it is old
+            ["OLD", "12.00 Dr"],
+        ],
+    )
+    ageing = ageing_of(snap, "2025-05-31")
+    assert ageing == {
+        "PARTIAL": [3000, 6000, 0, 0],
+        "ADVANCE": [3000, 0, 0, 0],
+        "OLD": [0, 0, 0, 1200],
+    }
+
+    # a month earlier: S/3 and S/6 are not booked yet and R/1 not received
+    assert ageing_of(snap, "2025-04-30") == {
+        "PARTIAL": [10000, 10000, 0, 0],
+        "OLD": [0, 0, 0, 1200],
+    }
+
+
+def test_ageing_cache_is_bounded():
+    snap = make_snapshot([["2025-04-01", "A", "Sales", "Sales", "S/1", 10.00, None]], [["A", "10.00 Dr"]], version=99)
+    for day in range(1, 31):
+        ledger_reports.receivables_ageing(snap, f"2025-05-{day:02d}")
+    assert len(ledger_reports._cache) == ledger_reports.AGEING_CACHE_SIZE
+
+
+class DistRows:
+    # just enough of a pymongo collection for dist_frame
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, query, projection):
+        return [{field: doc[field] for field in projection if field in doc} for doc in self.docs]
+
+
+def test_warm_partitions_builds_assignee_and_brand_partitions(monkeypatch):
+    monkeypatch.setattr(ledger_reports, "_dist", {"frame": None, "loaded_at": 0.0, "version": 0})
+    monkeypatch.setattr(ledger_reports, "_partitions", {})
+    dist = DistRows([
+        {"name": "DIST A", "assigned_to": "ravi", "brand": "Vivo"},
+        {"name": "DIST B", "assigned_to": "ravi", "brand": "Oppo"},
+        {"name": "DIST C", "assigned_to": "sita", "brand": "Vivo"},
+    ])
+    snap = make_snapshot(
+        [
+            ["2025-04-01", "DIST A", "Sales", "Sales", "S/1", 100.00, 0],
+            ["2025-04-01", "DIST B", "Sales", "Sales", "S/2", 200.00, 0],
+            ["2025-04-02", "DIST C", "Sales", "Sales", "S/3", 300.00, 0],
+        ],
+        [["DIST A", "100.00 Dr"], ["DIST B", "200.00 Dr"], ["DIST C", "300.00 Dr"]],
+    )
+    ledger_reports.warm_partitions(snap, dist)
+    assert set(ledger_reports._partitions) == {("assigned_to", "ravi"), ("assigned_to", "sita"),
+                                               ("brand", "Vivo"), ("brand", "Oppo")}
+    vivo = ledger_reports.partition(snap, dist, brand="Vivo")
+    assert vivo is ledger_reports._partitions[("brand", "Vivo")]
+    assert vivo.ledger_names() == ["DIST A", "DIST C"]
+    assert vivo.ledger is snap.ledger
+
+
+def test_monthly_cube_pivots_brand_by_month():
+    snap = make_snapshot(
+        [
+            ["2025-04-01", "DIST A", "Sales", "Sales", "S/1", 1000.00, 0],
+            ["2025-04-20", "DIST A", "Bank", "Receipt", "R/1", 0, 400.00],
+            ["2025-04-21", "DIST B", "Sales", "Sales", "S/2", 250.00, 0],
+            ["2025-05-02", "DIST A", "Sales", "Sales", "S/3", 100.00, 0],
+            ["2025-05-03", "DIST C", "Sales", "Sales", "S/4", 50.00, 0],
+        ],
+        [["DIST A", "700.00 Dr"], ["DIST B", "250.00 Dr"], ["DIST C", "50.00 Dr"]],
+    )
+    dist = pd.DataFrame({
+        "name": ["DIST A", "DIST B", "DIST B"],
+        "brand": ["Vivo", "Oppo", "Oppo"],
+        "location": ["Patna", "", "Gaya"],
+    })
+    cube = ledger_reports.MonthlyCube.build(snap.monthly.table, dist)
+    april, may = np.datetime64("2025-04", "M").astype(int), np.datetime64("2025-05", "M").astype(int)
+    assert cube.months() == [april, may]
+    # DIST C is not in Dist; DIST B's blank location counts as unassigned too
+    assert cube.values("Brand") == ["(unassigned)", "Oppo", "Vivo"]
+    assert cube.values("Location") == ["(unassigned)", "Patna"]
+
+    billed = ledger_reports.MonthlyCube.pivot(cube.slice(types=["Sales"]), "Brand", "DrAmt")
+    assert billed.loc["Vivo"].tolist() == [100000, 10000]
+    assert billed.loc["Oppo"].tolist() == [25000, 0]
+    assert billed.loc["(unassigned)"].tolist() == [0, 5000]
+
+    net = ledger_reports.MonthlyCube.pivot(cube.slice(from_month=april, to_month=april, brands=["Vivo"]), "Type", "Net")
+    assert net.to_dict("index") == {"Receipt": {april: 40000}, "Sales": {april: -100000}}
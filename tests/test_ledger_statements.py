@@ -0,0 +1,32 @@
+import io
+import re
+import zipfile
+import zlib
+
+import ledger_statements
+from conftest import make_snapshot
+
+
+def page_text(pdf):
+    return zlib.decompress(re.search(rb"stream\n(.*)\nendstream", pdf, re.S).group(1))
+
+
+def test_statement_zip_names_are_unique():
+    snap = make_snapshot(
+        [
+            ["2025-04-01", "A/B Traders", "Sales", "Sales", "S/1", 100.00, 0],
+            ["2025-04-01", "A:B Traders", "Sales", "Sales", "S/2", 200.00, 0],
+            ["2025-04-02", "a_b traders", "Sales", "Sales", "S/3", 300.00, 0],
+            ["2025-04-02", "DIST C", "Sales", "Sales", "S/4", 400.00, 0],
+        ],
+        [["A/B Traders", "100.00 Dr"], ["A:B Traders", "200.00 Dr"], ["a_b traders", "300.00 Dr"],
+         ["DIST C", "400.00 Dr"]],
+    )
+    names = ["A/B Traders", "A:B Traders", "a_b traders", "DIST C"]
+    data, _ = ledger_statements.build_statement_zip(snap, names, "2025-04-01", "2025-04-30", workers=1)
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        files = archive.namelist()
+        assert files == ["A_B Traders.pdf", "A_B Traders (2).pdf", "a_b traders (3).pdf", "DIST C.pdf"]
+        # each entry is that ledger's own statement
+        assert b"A:B Traders" in page_text(archive.read("A_B Traders (2).pdf"))
+        assert b"a_b traders" in page_text(archive.read("a_b traders (3).pdf"))
@@ -0,0 +1,275 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+import fake_drive
+import ledger_store
+from conftest import BALANCE_COLUMNS, LEDGER_COLUMNS, daybook_rows, write_csv
+from ledger_schema import apply_schema
+from ledger_store import LedgerSnapshot, LedgerStore
+
+
+def make_store(base_url):
+    return LedgerStore(f"{base_url}/ledger.csv", f"{base_url}/balance.csv", cache_dir=None)
+
+
+def full_rebuild(ledger_path, balance_path):
+    # what a cold start would build from the same files
+    ledger = apply_schema("ledger", pd.read_csv(ledger_path))
+    balances = apply_schema("balances", pd.read_csv(balance_path))
+    return LedgerSnapshot(ledger, balances, 0)
+
+
+def sorted_table(table, keys):
+    return table.sort_values(keys, ignore_index=True)
+
+
+def assert_same_derived(snap, rebuilt):
+    # everything derived from the ledger matches a snapshot built from scratch
+    pd.testing.assert_frame_equal(snap.ledger.astype({"LedgerName": str, "Ledger": str, "Type": str}),
+                                  rebuilt.ledger.astype({"LedgerName": str, "Ledger": str, "Type": str}))
+    assert snap.index.names == rebuilt.index.names
+    for name in rebuilt.index.names:
+        np.testing.assert_array_equal(snap.index.blocks[name][0], rebuilt.index.blocks[name][0])
+        np.testing.assert_array_equal(snap.index.blocks[name][1], rebuilt.index.blocks[name][1])
+    np.testing.assert_array_equal(snap.by_date.dates, rebuilt.by_date.dates)
+    np.testing.assert_array_equal(np.sort(snap.by_date.positions), np.sort(rebuilt.by_date.positions))
+    pd.testing.assert_frame_equal(sorted_table(snap.daily.table, ["Date", "Type", "LedgerName"]),
+                                  sorted_table(rebuilt.daily.table, ["Date", "Type", "LedgerName"]))
+    pd.testing.assert_frame_equal(sorted_table(snap.monthly.table, ["Month", "Type", "LedgerName"]),
+                                  sorted_table(rebuilt.monthly.table, ["Month", "Type", "LedgerName"]))
+    np.testing.assert_array_equal(snap.running_balances.running, rebuilt.running_balances.running)
+
+
+def test_unchanged_files_are_not_parsed(drive):
+    ledger_path, balance_path, base_url, server = drive
+    store = make_store(base_url)
+    snap = store.refresh(force=True)
+    assert store.parse_count == 2
+    assert store.last_ingest["mode"] == "full"
+
+    again = store.refresh(force=True)
+    assert again is snap
+    assert store.parse_count == 2
+    # both files were asked for, and answered 304 through the ETag
+    assert server.RequestHandlerClass.hits == {"ledger.csv": 2, "balance.csv": 2}
+
+
+def test_unchanged_files_without_validators_are_not_parsed(tmp_path):
+    ledger_path, balance_path = tmp_path / "ledger.csv", tmp_path / "balance.csv"
+    write_csv(ledger_path, daybook_rows(50), LEDGER_COLUMNS)
+    write_csv(balance_path, [["DIST A", "10.00 Dr"]], BALANCE_COLUMNS)
+    server, base_url = fake_drive.serve([str(ledger_path), str(balance_path)], validators=False)
+    try:
+        store = make_store(base_url)
+        snap = store.refresh(force=True)
+        # full body every time: the content hash is what says "unchanged"
+        assert store.refresh(force=True) is snap
+        assert store.parse_count == 2
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_balance_file_change_keeps_the_ledger(drive):
+    ledger_path, balance_path, base_url, server = drive
+    store = make_store(base_url)
+    snap = store.refresh(force=True)
+    write_csv(balance_path, [["DIST A", "900.00 Dr"]], BALANCE_COLUMNS)
+
+    new = store.refresh(force=True)
+    assert store.parse_count == 3
+    assert store.last_ingest["mode"] == "balances"
+    assert new.ledger is snap.ledger and new.index is snap.index
+    assert new.closing_balance("DIST A") == -90000
+
+
+def test_appended_vouchers_are_ingested_incrementally(drive):
+    ledger_path, balance_path, base_url, server = drive
+    store = make_store(base_url)
+    snap = store.refresh(force=True)
+
+    # later vouchers, a backdated one, a new ledger and an undated row
+    tail = daybook_rows(40, start="2025-06-15", days=40, seed=1)
+    tail.append(["2025-04-02", "DIST B", "Sales", "Sales", "S/late", 120.00, None])
+    tail.append(["2025-07-01", "DIST E", "Sales", "Sales", "S/new", 75.25, None])
+    tail.append(["", "DIST A", "Journal", "Journal", "J/1", None, 10.00])
+    write_csv(ledger_path, tail, LEDGER_COLUMNS, mode="a")
+
+    new = store.refresh(force=True)
+    assert store.parse_count == 3
+    assert store.last_ingest["mode"] == "append"
+    assert store.last_ingest["rows"] == len(tail)
+    assert store.last_ingest["backdated"] >= 1
+    assert new.version == snap.version + 1
+    assert_same_derived(new, full_rebuild(ledger_path, balance_path))
+
+
+def test_rewritten_file_is_ingested_in_full(drive):
+    ledger_path, balance_path, base_url, server = drive
+    store = make_store(base_url)
+    store.refresh(force=True)
+
+    # an amended old voucher changes the file before its end
+    rows = daybook_rows(300)
+    rows[0][5], rows[0][6] = None, 42.00
+    write_csv(ledger_path, rows, LEDGER_COLUMNS)
+
+    new = store.refresh(force=True)
+    assert store.parse_count == 3
+    assert store.last_ingest["mode"] == "full"
+    assert_same_derived(new, full_rebuild(ledger_path, balance_path))
+
+
+def test_appended_tail_needs_the_committed_prefix():
+    state = ledger_store.SourceState("unused")
+    head = b"Date,LedgerName\n2025-04-01,A\n"
+    state.sha256 = hashlib.sha256(head).hexdigest()
+    state.size = len(head)
+    assert ledger_store.appended_tail(state, head + b"2025-04-02,B\n") == b"Date,LedgerName\n2025-04-02,B\n"
+    assert ledger_store.appended_tail(state, b"Date,LedgerName\n2025-04-01,X\n2025-04-02,B\n") is None
+    assert ledger_store.appended_tail(state, head) is None
+
+
+def test_cache_write_failure_is_recorded(drive, tmp_path):
+    ledger_path, balance_path, base_url, server = drive
+    blocked = tmp_path / "not-a-dir"
+    blocked.write_text("")
+    store = LedgerStore(f"{base_url}/ledger.csv", f"{base_url}/balance.csv", cache_dir=str(blocked))
+    snap = store.refresh(force=True)
+    # the snapshot is still served from memory
+    assert len(snap.ledger) == 300
+    assert "not-a-dir" in store.stats()["cache_error"]
+
+
+def test_follower_keeps_its_snapshot_while_nothing_changes(drive, tmp_path):
+    ledger_path, balance_path, base_url, server = drive
+    cache_dir = str(tmp_path / "cache")
+    leader = LedgerStore(f"{base_url}/ledger.csv", f"{base_url}/balance.csv", cache_dir=cache_dir)
+    leader.refresh(force=True)
+    assert leader.is_leader()
+
+    follower = LedgerStore(f"{base_url}/ledger.csv", f"{base_url}/balance.csv", cache_dir=cache_dir)
+    assert not follower.is_leader()
+    published = []
+    follower.add_listener("count", published.append)
+    snap = follower.snapshot()
+    assert snap.version == leader.snapshot().version
+    published.clear()
+
+    for _ in range(3):
+        # each check rewrites meta.json with the new checked_at
+        leader.refresh(force=True)
+        follower._meta_mtime = None
+        assert follower.follow()
+        assert follower.snapshot() is snap
+    assert published == []
+    assert follower.last_checked == leader.last_checked
+
+    write_csv(ledger_path, daybook_rows(5, start="2025-07-01", seed=2), LEDGER_COLUMNS, mode="a")
+    leader.refresh(force=True)
+    assert follower.follow()
+    assert follower.snapshot().version == snap.version + 1
+    assert len(published) == 1
+
+
+def test_follower_maps_the_leaders_derived_structures(drive, tmp_path):
+    ledger_path, balance_path, base_url, server = drive
+    cache_dir = str(tmp_path / "cache")
+    leader = LedgerStore(f"{base_url}/ledger.csv", f"{base_url}/balance.csv", cache_dir=cache_dir)
+    leader.refresh(force=True)
+    write_csv(ledger_path, daybook_rows(20, start="2025-05-01", seed=3), LEDGER_COLUMNS, mode="a")
+    leader.refresh(force=True)
+    assert leader.last_ingest["mode"] == "append"
+
+    follower = LedgerStore(f"{base_url}/ledger.csv", f"{base_url}/balance.csv", cache_dir=cache_dir)
+    snap = follower.snapshot()
+    assert_same_derived(snap, leader.snapshot())
+    # views over the mapped files, not private copies
+    for array in (snap.running_balances.running, snap.by_date.positions, snap.index.blocks["DIST A"][0]):
+        assert not array.flags.writeable
+        assert not array.flags.owndata
+
+    # a new balance file republishes the running balances only
+    files = dict(leader._files)
+    write_csv(balance_path, [["DIST A", "5.00 Cr"]], BALANCE_COLUMNS)
+    leader.refresh(force=True)
+    changed = {key for key in files if leader._files[key] != files[key]}
+    assert changed == {"balances", "running"}
+    assert follower.follow()
+    assert_same_derived(follower.snapshot(), leader.snapshot())
+
+
+def test_partition_is_a_view_with_the_same_answers(drive):
+    ledger_path, balance_path, base_url, server = drive
+    write_csv(balance_path, [["DIST A", "1,000.00 Dr"], ["DIST B", "250.50 Cr"], ["DIST C", "10.00 Dr"],
+                             ["DIST D", "5.00 Dr"]], BALANCE_COLUMNS)
+    snap = make_store(base_url).refresh(force=True)
+    names = ["DIST B", "DIST D", "NOT A LEDGER"]
+    part = snap.partition(names, ("assigned_to", "ravi"))
+
+    # shared, not copied
+    assert part.ledger is snap.ledger
+    assert part.running_balances.running is snap.running_balances.running
+    assert part.index.blocks["DIST B"][0] is snap.index.blocks["DIST B"][0]
+    assert part.ledger_names() == ["DIST B", "DIST D"]
+    assert part.partition_key == ("assigned_to", "ravi")
+
+    # the same answers as a snapshot built from just those ledgers' rows
+    ledger = snap.ledger[snap.ledger["LedgerName"].isin(names)].reset_index(drop=True)
+    own = LedgerSnapshot(ledger, snap.balances[snap.balances["Ledger Name"].isin(names)].reset_index(drop=True), 0)
+
+    def rows(s, positions):
+        return s.rows(positions, running_balance=True).reset_index(drop=True).astype({"LedgerName": str, "Ledger": str, "Type": str})
+
+    for name in ["DIST B", "DIST D"]:
+        pd.testing.assert_frame_equal(rows(part, part.index.positions(name, "2025-05-01", "2025-06-15")),
+                                      rows(own, own.index.positions(name, "2025-05-01", "2025-06-15")))
+        assert part.opening_closing(name, "2025-05-01", "2025-06-15") == own.opening_closing(name, "2025-05-01", "2025-06-15")
+    assert part.opening_closing("DIST A", "2025-05-01", "2025-06-15") is None
+    pd.testing.assert_frame_equal(rows(part, part.daybook_positions("2025-04-10", "2025-05-10", types=["Sales"])),
+                                  rows(own, own.daybook_positions("2025-04-10", "2025-05-10", types=["Sales"])))
+    assert part.daily.totals("2025-04-01", "2025-06-30") == own.daily.totals("2025-04-01", "2025-06-30")
+    assert part.monthly.table[["DrAmt", "CrAmt", "Count"]].sum().tolist() == own.monthly.table[["DrAmt", "CrAmt", "Count"]].sum().tolist()
+    pd.testing.assert_frame_equal(rows(part, part.search("s 0")), rows(own, own.search("s 0")))
+    assert len(part.search("s 0")) < len(snap.search("s 0"))
+
+
+def test_listener_added_after_the_cache_load_sees_that_snapshot(drive, tmp_path):
+    ledger_path, balance_path, base_url, server = drive
+    cache_dir = str(tmp_path / "cache")
+    LedgerStore(f"{base_url}/ledger.csv", f"{base_url}/balance.csv", cache_dir=cache_dir).refresh(force=True)
+
+    # a new worker loads the published snapshot while it is created
+    store = LedgerStore(f"{base_url}/ledger.csv", f"{base_url}/balance.csv", cache_dir=cache_dir)
+    loaded = store.snapshot()
+    seen = []
+    store.add_listener("seen", seen.append)
+    assert seen == [loaded]
+    # a Streamlit rerun registering it again does not repeat the call
+    store.add_listener("seen", seen.append)
+    assert seen == [loaded]
+
+    def broken(snap):
+        raise ValueError("no Dist rows")
+    store.add_listener("broken", broken)
+    assert "listener broken: ValueError: no Dist rows" in store.stats()["last_error"]
+
+
+def test_search_index_is_built_when_the_snapshot_is_published(drive, tmp_path):
+    ledger_path, balance_path, base_url, server = drive
+    store = make_store(base_url)
+    snap = store.refresh(force=True)
+    assert snap._search is not None
+    index = snap._search
+    part = snap.partition(["DIST B"], ("assigned_to", "ravi"))
+    assert part.build_search() is index
+    assert len(part.search("s 0")) > 0
+    assert snap._search is index
+
+    # a worker that loads a published version from the cache builds it too
+    cache_dir = str(tmp_path / "cache")
+    LedgerStore(f"{base_url}/ledger.csv", f"{base_url}/balance.csv", cache_dir=cache_dir).refresh(force=True)
+    follower = LedgerStore(f"{base_url}/ledger.csv", f"{base_url}/balance.csv", cache_dir=cache_dir)
+    assert follower.snapshot()._search is not None
@@ -0,0 +1,56 @@
+import threading
+
+import pytest
+
+import mongo_db
+
+
+@pytest.fixture
+def no_client(monkeypatch):
+    # a fresh process-wide slot; nothing listens on port 1, and give up quickly
+    monkeypatch.setattr(mongo_db, "_resource", None)
+    monkeypatch.setattr(mongo_db, "SERVER_SELECTION_TIMEOUT_MS", 200)
+    yield
+    if mongo_db._resource is not None:
+        mongo_db._resource.client.close()
+
+
+def test_one_client_per_process(no_client):
+    with pytest.raises(RuntimeError):
+        mongo_db.get_client()
+
+    resources = []
+    threads = [threading.Thread(target=lambda: resources.append(mongo_db.get_client("mongodb://127.0.0.1:1")))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    resource = resources[0]
+    assert all(r is resource for r in resources)
+    # later calls (and reruns) don't need the URI
+    assert mongo_db.get_client() is resource
+    assert mongo_db.get_db("mongodb://127.0.0.1:1", "dms").client is resource.client
+
+    # the failed ping is recorded for the Logs page, not raised
+    stats = resource.stats()
+    assert "ServerSelectionTimeoutError" in stats["last_error"]
+    assert stats["warmup_seconds"] is None
+    assert stats["max_pool_size"] == mongo_db.MAX_POOL_SIZE
+
+
+def test_pool_stats_counts_open_and_in_use():
+    stats = mongo_db.PoolStats()
+    for _ in range(3):
+        stats.connection_created(None)
+    stats.connection_closed(None)
+    for _ in range(5):
+        stats.connection_checked_out(None)
+    for _ in range(4):
+        stats.connection_checked_in(None)
+    stats.connection_check_out_failed(None)
+    counts = stats.snapshot()
+    assert counts["open"] == 2
+    assert counts["in_use"] == 1
+    assert counts["checkout_failed"] == 1
+    assert counts["pool_cleared"] == 0
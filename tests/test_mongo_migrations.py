@@ -0,0 +1,48 @@
+import mongo_migrations
+
+
+def test_failed_migration_stays_pending_and_the_rest_still_run(mongo, monkeypatch):
+    monkeypatch.setattr(mongo_migrations, "last_run", {"at": None, "applied": [], "done": set(), "error": None})
+    ran = []
+    blocked = {"users": True}
+
+    def step(version):
+        def run(db):
+            if version == 2 and blocked["users"]:
+                raise ValueError("users.users_name_unique: duplicate documents, e.g. {'name': 'ravi'}")
+            ran.append(version)
+        run.__name__ = f"step_{version}"
+        return run
+
+    monkeypatch.setattr(mongo_migrations, "MIGRATIONS", [(v, f"migration {v}", step(v)) for v in (1, 2, 3)])
+
+    assert mongo_migrations.migrate(mongo) == [1, 3]
+    assert ran == [1, 3]
+    assert mongo_migrations.is_applied(3) and not mongo_migrations.is_applied(2)
+    assert "migration 2: users.users_name_unique" in mongo_migrations.last_run["error"]
+    assert [row["Applied"] == "pending" for row in mongo_migrations.status(mongo)] == [False, True, False]
+
+    # retried on the next start once the duplicates are gone; the others don't run again
+    blocked["users"] = False
+    assert mongo_migrations.migrate(mongo) == [2]
+    assert ran == [1, 3, 2]
+    assert mongo_migrations.last_run["error"] is None
+    assert mongo_migrations.last_run["done"] == {1, 2, 3}
+
+
+def test_dist_ids_are_stored_in_one_form(mongo):
+    assert {mongo_migrations.canonical_dist_id(value) for value in ("0123", "123", 123, 123.0, " 123 ")} == {"123"}
+    assert mongo_migrations.canonical_dist_id("sw-01a") == "SW-01A"
+    assert mongo_migrations.canonical_dist_id("١٢") == "١٢"  # not an ASCII number
+
+    dist = mongo["Dist"]
+    for doc_id, value in enumerate([123, "0456", "ab1", "789", None, float("nan")], start=1):
+        dist.insert_one({"_id": doc_id, "id": value, "pwd": "x"})
+    dist.insert_one({"_id": 7, "pwd": "x"})
+    mongo_migrations.normalize_dist_ids(mongo)
+    ids = [doc.get("id", "missing") for doc in dist.find()]
+    assert ids[:5] == ["123", "456", "AB1", "789", None]
+    assert ids[5] != ids[5]  # NaN left alone
+    assert ids[6] == "missing"
+    # a login typed any way is one equality lookup
+    assert dist.find_one({"id": mongo_migrations.canonical_dist_id("00123"), "pwd": "x"})["_id"] == 1
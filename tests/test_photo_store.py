@@ -0,0 +1,96 @@
+import base64
+import io
+import itertools
+
+import pytest
+from gridfs.errors import NoFile
+from PIL import Image
+
+import mongo_migrations
+import photo_store
+
+
+class FakeBucket:
+    # GridFSBucket over the fake database: file documents in <bucket>.files, bytes in .data
+    ids = itertools.count(1)
+
+    def __init__(self, db):
+        self.files = db[f"{photo_store.BUCKET}.files"]
+        self.data = db.setdefault("_bytes", {})
+
+    def upload_from_stream(self, filename, data, metadata=None):
+        file_id = f"f{next(self.ids)}"
+        self.files.insert_one({"_id": file_id, "filename": filename, "length": len(data), "metadata": metadata})
+        self.data[file_id] = data
+        return file_id
+
+    def open_download_stream(self, file_id):
+        if file_id not in self.data:
+            raise NoFile(file_id)
+        return io.BytesIO(self.data[file_id])
+
+    def delete(self, file_id):
+        if self.data.pop(file_id, None) is None:
+            raise NoFile(file_id)
+        self.files.delete_one({"_id": file_id})
+
+
+@pytest.fixture
+def photos(mongo, monkeypatch):
+    monkeypatch.setattr(photo_store, "_bucket", FakeBucket)
+    monkeypatch.setattr(photo_store, "_thumbs", type(photo_store._thumbs)())
+    return mongo
+
+
+def png(size, color=(200, 30, 30, 128)):
+    out = io.BytesIO()
+    Image.new("RGBA", size, color).save(out, format="PNG")
+    return out.getvalue()
+
+
+def test_same_photo_is_stored_once_with_a_thumbnail(photos):
+    data = png((1200, 900))
+    ref = photo_store.save_photo(photos, data)
+    assert (ref["width"], ref["height"], ref["content_type"]) == (1200, 900, "image/png")
+    assert photo_store.save_photo(photos, io.BytesIO(data)) == ref
+    files = photos[f"{photo_store.BUCKET}.files"].find()
+    assert sorted(doc["metadata"]["kind"] for doc in files) == ["original", "thumb"]
+
+    assert photo_store.original(photos, ref) == data
+    thumb = Image.open(io.BytesIO(photo_store.thumbnail(photos, ref)))
+    # fits THUMB_SIZE, keeps the aspect ratio, alpha flattened for JPEG
+    assert (thumb.format, thumb.mode, thumb.size) == ("JPEG", "RGB", (160, 120))
+
+    # cached by hash: no second GridFS read
+    photos["_bytes"].clear()
+    assert photo_store.thumbnail(photos, ref) is not None
+
+
+def test_photo_is_released_when_no_user_refers_to_it(photos):
+    ref = photo_store.save_photo(photos, png((40, 40)))
+    photos["users"].insert_one({"name": "ravi", "photo": ref})
+    photos["users"].insert_one({"name": "sita", "photo": ref})
+    photos["users"].delete_one({"name": "ravi"})
+    photo_store.release_photo(photos, ref)
+    assert photo_store.original(photos, ref) is not None
+
+    photos["users"].delete_one({"name": "sita"})
+    photo_store.release_photo(photos, ref)
+    assert photos[f"{photo_store.BUCKET}.files"].find() == []
+    assert photo_store.thumbnail(photos, ref) is None
+
+
+def test_migration_moves_base64_photos_to_gridfs(photos):
+    data = png((64, 32))
+    users = photos["users"]
+    users.insert_one({"name": "ravi", "image_b64": base64.b64encode(data).decode()})
+    users.insert_one({"name": "sita", "image_b64": base64.b64encode(b"not an image").decode()})
+    users.insert_one({"name": "amit", "image_b64": ""})
+    mongo_migrations.move_user_photos(photos)
+
+    ravi = users.find_one({"name": "ravi"})
+    assert "image_b64" not in ravi
+    assert photo_store.original(photos, ravi["photo"]) == data
+    # an unreadable photo is kept where it was, an empty one is dropped
+    assert "image_b64" in users.find_one({"name": "sita"})
+    assert users.find_one({"name": "amit"}) == {"_id": 3, "name": "amit"}
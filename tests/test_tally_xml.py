@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+import fake_tally
+import ledger_reports
+import tally_xml
+from ledger_store import LedgerStore
+
+
+def recorded_stream(name, chunk_size):
+    # a recording read in small chunks, so control-character references are cut across reads
+    f = open(os.path.join(fake_tally.RECORDINGS_DIR, name), "rb")
+    return f, tally_xml.CleanStream(iter(lambda: f.read(chunk_size), b""))
+
+
+@pytest.mark.parametrize("chunk_size", [7, 64 * 1024])
+def test_parse_recorded_daybook(chunk_size):
+    f, stream = recorded_stream("daybook.xml", chunk_size)
+    with f:
+        frame = tally_xml.parse_daybook(stream)
+    assert list(frame.columns) == tally_xml.DAYBOOK_COLUMNS
+    assert len(frame) == 9
+    assert frame["VoucherNo"].unique().tolist() == ["SA/1", "RC/1", "SA/2", "CN/1"]
+
+    first = frame.iloc[0]
+    assert (first["Date"], first["LedgerName"], first["Ledger"], first["Type"]) == ("2025-04-01", "DIST 001", "Sales Account", "Sales")
+    assert first["DrAmt"] == 118000.0
+    # Tally amounts: negative is Dr, positive is Cr; every voucher balances
+    assert frame["DrAmt"].sum() == frame["CrAmt"].sum()
+    assert "DIST 002 & Sons" in set(frame["LedgerName"])
+
+
+def test_parse_recorded_balances():
+    f, stream = recorded_stream("balances.xml", 16)
+    with f:
+        frame = tally_xml.parse_balances(stream)
+    assert frame["Ledger Name"].tolist() == ["DIST 001", "DIST 002 & Sons", "HDFC Bank", "Sales Account"]
+    assert frame["Closing Balance"].tolist() == ["-68000.00", "-22400.00", "-50000.00", "123600.00"]
+
+
+def test_unchanged_tally_export_is_not_parsed(monkeypatch):
+    parsed = []
+
+    def counting(parse):
+        def wrapper(stream):
+            parsed.append(parse.__name__)
+            return parse(stream)
+        return wrapper
+
+    for report, (request, parse) in list(tally_xml.REPORTS.items()):
+        monkeypatch.setitem(tally_xml.REPORTS, report, (request, counting(parse)))
+
+    server, base_url = fake_tally.serve()
+    try:
+        host = base_url.split("://", 1)[1]
+        store = LedgerStore(f"tally://{host}/daybook", f"tally://{host}/balances", cache_dir=None)
+        snap = store.refresh(force=True)
+        assert sorted(parsed) == ["parse_balances", "parse_daybook"]
+        assert len(snap.ledger) == 9
+
+        assert store.refresh(force=True) is snap
+        assert len(parsed) == 2
+        assert server.RequestHandlerClass.hits == {"daybook.xml": 2, "balances.xml": 2}
+
+        # the recorded vouchers add up to the recorded closing balances
+        status = ledger_reports.reconcile(snap).set_index("Ledger Name")["Status"]
+        assert status[["DIST 001", "DIST 002 & Sons", "HDFC Bank", "Sales Account"]].eq("OK").all()
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,34 @@
+import base64
+
+import user_directory
+
+
+def test_user_list_is_a_cached_summary_projection(mongo, monkeypatch):
+    monkeypatch.setattr(user_directory, "_users", {"rows": None, "loaded_at": 0.0})
+    users = mongo["users"]
+    users.insert_one({"name": "sita", "type": "Standard", "status": "Active", "pass": "s3", "Brand": ["Vivo"],
+                      "photo": {"sha256": "ab"}, "address": "Patna"})
+    users.insert_one({"name": "ravi", "type": "Admin", "status": "Active", "pass": "r4",
+                      "image_b64": base64.b64encode(b"legacy photo").decode()})
+
+    rows = user_directory.user_summaries(users)
+    assert [row["name"] for row in rows] == ["ravi", "sita"]
+    assert all(set(row) <= set(user_directory.USER_SUMMARY_FIELDS) for row in rows)
+    assert rows[1]["Brand"] == ["Vivo"]
+
+    # served from the cache until a write invalidates it
+    users.insert_one({"name": "amit", "type": "Standard", "status": "Inactive"})
+    assert user_directory.user_summaries(users) is rows
+    assert users.finds == 1
+    user_directory.invalidate_users()
+    assert [row["name"] for row in user_directory.user_summaries(users)] == ["amit", "ravi", "sita"]
+
+    # the full record only when a user is opened, and without the photo
+    details = user_directory.user_details(users, "ravi")
+    assert details["type"] == "Admin" and "pass" not in details and "image_b64" not in details
+    assert user_directory.user_details(users, "ravi", with_password=True)["pass"] == "r4"
+    assert user_directory.user_details(users, "nobody") == {}
+
+    # a photo not yet moved to GridFS is still shown
+    assert user_directory.user_photo(users, "ravi") == b"legacy photo"
+    assert user_directory.user_photo(users, "amit") is None
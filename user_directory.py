@@ -0,0 +1,54 @@
+import base64
+import threading
+import time
+
+import photo_store
+
+
+# -------------------------------
+# 👤 USER DIRECTORY
+# -------------------------------
+# The users page lists, filters and picks users by a few short fields. Lists
+# come from a cached summary projection; the full record of a user is read
+# only when that user is opened, and photos are thumbnails from photo_store
+# (cached there by content hash). Call invalidate_users() after writing to
+# the users collection.
+
+USER_SUMMARY_FIELDS = ["id", "name", "type", "status", "Brand", "full_name"]
+USERS_TTL = 60
+
+_users = {"rows": None, "loaded_at": 0.0}
+_users_lock = threading.Lock()
+
+
+def invalidate_users():
+    with _users_lock:
+        _users["rows"] = None
+
+
+def user_summaries(collection):
+    # [{id, name, type, status, Brand, full_name}, ...] for lists and filters
+    with _users_lock:
+        if _users["rows"] is None or time.monotonic() - _users["loaded_at"] >= USERS_TTL:
+            projection = {"_id": 0, **{field: 1 for field in USER_SUMMARY_FIELDS}}
+            _users["rows"] = list(collection.find({}, projection).sort("name", 1))
+            _users["loaded_at"] = time.monotonic()
+        return _users["rows"]
+
+
+def user_details(collection, name, with_password=False):
+    # one user's record without the photo
+    projection = {"_id": 0, "image_b64": 0}
+    if not with_password:
+        projection["pass"] = 0
+    return collection.find_one({"name": name}, projection) or {}
+
+
+def user_photo(collection, name):
+    # thumbnail bytes, or None when the user has no photo
+    doc = collection.find_one({"name": name}, {"_id": 0, "photo": 1}) or {}
+    if doc.get("photo"):
+        return photo_store.thumbnail(collection.database, doc["photo"])
+    # not moved to GridFS yet (mongo_migrations step 5)
+    legacy = collection.find_one({"name": name, "image_b64": {"$nin": [None, ""]}}, {"_id": 0, "image_b64": 1})
+    return base64.b64decode(legacy["image_b64"]) if legacy else None